@@ -13,18 +13,25 @@ Usage:
   leo-dash                               # if installed via install.sh
 """
 
+import contextlib
+import functools
+import gzip
+import hashlib
 import http.server
 import json
 import os
+import queue
+import re
 import socketserver
 import sqlite3
-from collections import defaultdict
 import sys
 import threading
 import time
 import urllib.parse
 import webbrowser
-from datetime import datetime, timedelta
+from datetime import date
+
+from .db.schema import SUMMARY_DDL, _migrate_sleep_duration, finalize_indexes
 
 # ── Constants ─────────────────────────────────────────────────────────────────
 
@@ -35,12 +42,87 @@ IS_APP  = getattr(sys, "frozen", False)   # True when packaged by PyInstaller
 
 # ── DB helpers ────────────────────────────────────────────────────────────────
 
+# Idle read connections, shared across request threads. ThreadingMixIn spawns
+# a thread per request, so a pool (not a thread-local) is what actually lets
+# connections outlive a request; LIFO keeps the warmest page cache in use.
+# Sized to a browser's 6 parallel connections per host, plus summary upkeep.
+_POOL_SIZE = 8
+_pool = queue.LifoQueue(maxsize=_POOL_SIZE)
+
+# The connection holding this thread's read_txn(), if one is open.
+_txn = threading.local()
+
+
 def _conn():
-    c = sqlite3.connect(DB_PATH)
+    """This thread's read_txn() connection, else one borrowed from the pool."""
+    c = getattr(_txn, "conn", None)
+    return c if c is not None else _borrow()
+
+
+def _borrow():
+    """Borrow a connection from the pool, opening one if none are idle."""
+    try:
+        return _pool.get_nowait()
+    except queue.Empty:
+        pass
+    # Every api_* query is a fixed string, so with pooled connections repeat
+    # polls reuse the prepared statement instead of re-parsing and re-planning.
+    c = sqlite3.connect(DB_PATH, check_same_thread=False, cached_statements=256)
     c.row_factory = sqlite3.Row
+    c.execute("PRAGMA temp_store=MEMORY")
+    c.execute("PRAGMA cache_size=-65536")
+    c.execute("PRAGMA mmap_size=268435456")
     return c
 
 
+def _release(c):
+    """Return a connection to the pool; close it if the pool is already full."""
+    if c is getattr(_txn, "conn", None):
+        return                  # read_txn() releases it when the request ends
+    try:
+        _pool.put_nowait(c)
+    except queue.Full:
+        c.close()
+
+
+@contextlib.contextmanager
+def read_txn():
+    """
+    Run every query this thread issues inside one deferred read transaction
+    on one connection, so a request's queries share a single WAL snapshot and
+    lock acquisition instead of one per statement. Re-entrant; if the
+    database can't be opened the body simply runs without it.
+    """
+    if getattr(_txn, "conn", None) is not None:
+        yield
+        return
+    c = None
+    try:
+        c = _borrow()
+        c.execute("BEGIN")
+    except Exception:
+        if c is not None:
+            _release(c)
+        c = None
+    _txn.conn = c
+    try:
+        yield
+    finally:
+        _txn.conn = None
+        if c is not None:
+            try:
+                c.execute("COMMIT")     # read-only: just ends the snapshot
+            except sqlite3.Error:
+                pass
+            _release(c)
+
+
+def _in_read_txn(fn):
+    """Call fn() inside read_txn()."""
+    with read_txn():
+        return fn()
+
+
 def _startup_migrate():
     """
     Idempotent migration: remove duplicate sleep rows created by multiple
@@ -81,6 +163,11 @@ def _startup_migrate():
                 COALESCE(device, '')
             )
         """)
+        for ddl in SUMMARY_DDL:
+            c.execute(ddl)
+        # Secondary indexes added since the database was last imported
+        finalize_indexes(c)
+        _migrate_sleep_duration(c)
         c.commit()
         c.close()
     except Exception as e:
@@ -90,42 +177,205 @@ def _q(sql, params=()):
     """Run a SELECT and return list-of-dicts; returns [] on any error."""
     try:
         c = _conn()
-        rows = c.execute(sql, params).fetchall()
-        c.close()
-        return [dict(r) for r in rows]
     except Exception:
         return []
+    try:
+        # Plain tuples + one keys list from the cursor description: no
+        # sqlite3.Row per row and no per-column name lookups.
+        cur = c.cursor()
+        cur.row_factory = None
+        rows = cur.execute(sql, params).fetchall()
+        keys = [d[0] for d in cur.description]
+        return [dict(zip(keys, r)) for r in rows]
+    except Exception:
+        return []
+    finally:
+        _release(c)
+
+# Original SELECT text → the same query wrapped to return one JSON array.
+_json_sql = {}
+
+
+def _q_json(sql, params=()):
+    """
+    Run a SELECT and return its rows as a JSON array (bytes) built by SQLite's
+    json_group_array/json_object, so no Python row objects or intermediate
+    str are created. Falls
+    back to _q + json.dumps if the SQLite build lacks the JSON functions.
+    """
+    try:
+        c = _conn()
+    except Exception:
+        return b"[]"
+    try:
+        wrapped = _json_sql.get(sql)
+        if wrapped is None:
+            cols = [d[0] for d in c.execute(f"SELECT * FROM ({sql}) LIMIT 0", params).description]
+            pairs = ", ".join(f"'{n}', \"{n}\"" for n in cols)
+            # CAST AS BLOB hands back the UTF-8 bytes directly, skipping a
+            # str decode + re-encode copy of the whole body.
+            wrapped = (f"SELECT CAST(COALESCE(json_group_array(json_object({pairs})), '[]') "
+                       f"AS BLOB) FROM ({sql})")
+            _json_sql[sql] = wrapped
+        return c.execute(wrapped, params).fetchone()[0]
+    except Exception:
+        pass
+    finally:
+        _release(c)
+    return _encode(_q(sql, params))
+
+
+# Compact separators, raw UTF-8: no padding bytes and no \uXXXX escapes
+# (e.g. device names), matching what SQLite's json_object emits.
+_json_encoder = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def _encode(data):
+    """JSON-encode an API result; bytes from _q_json are already encoded."""
+    if isinstance(data, bytes):
+        return data
+    return _json_encoder.encode(data).encode()
+
 
 def _q1(sql, params=()):
     """Run a SELECT and return a single dict; returns {} on any error."""
     rows = _q(sql, params)
     return rows[0] if rows else {}
 
+@functools.lru_cache(maxsize=32)
+def _since_day(days, today):
+    return date.fromordinal(today - days).isoformat()
+
+
 def _since(days):
-    return (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
+    """YYYY-MM-DD cut-off `days` ago; memoised per (days, local calendar day)."""
+    return _since_day(days, date.today().toordinal())
 
 # ── API functions ─────────────────────────────────────────────────────────────
 
-def _sleep_avg(days):
-    """Return average total sleep hours using the properly interval-merged api_sleep()."""
-    rows = api_sleep(days)
-    if not rows:
-        return None
-    totals = [
-        (r.get("deep") or 0) + (r.get("rem") or 0) + (r.get("light") or 0)
-        for r in rows
-        if (r.get("deep") or 0) + (r.get("rem") or 0) + (r.get("light") or 0) > 0
-    ]
-    return round(sum(totals) / len(totals), 2) if totals else None
+# ── Daily summary rollup ──────────────────────────────────────────────────────
+
+# Source tables folded into daily_summary; new rows are detected by id.
+_SUMMARY_SOURCES = ("heart_rate", "hrv", "whoop_recovery", "oura_readiness", "whoop_strain")
+
+# One (day, metric, value) stream over every source, pivoted to a row per day.
+# A row's day is the YYYY-MM-DD prefix of its local recorded_at, so summing
+# the days >= a cut-off covers exactly the rows recorded_at >= that cut-off,
+# the window the per-table AVG() queries this replaces used.
+# COUNT(v) skips NULLs exactly like the AVG() it replaces.
+_ROLLUP_SQL = """
+    WITH m(day, k, v) AS (
+        SELECT SUBSTR(recorded_at,1,10), metric, value FROM heart_rate
+         WHERE metric IN ('resting_heart_rate','respiratory_rate','vo2_max')
+           AND recorded_at>=:since
+        UNION ALL
+        SELECT SUBSTR(recorded_at,1,10), 'spo2_apple',
+               CASE WHEN value <= 1.5 THEN value * 100.0 ELSE value END
+          FROM heart_rate WHERE metric='blood_oxygen_spo2' AND recorded_at>=:since
+        UNION ALL
+        SELECT SUBSTR(recorded_at,1,10), 'hrv', value FROM hrv WHERE recorded_at>=:since
+        UNION ALL
+        SELECT SUBSTR(recorded_at,1,10), 'spo2_whoop', spo2_pct FROM whoop_recovery
+         WHERE spo2_pct IS NOT NULL AND recorded_at>=:since
+        UNION ALL
+        SELECT SUBSTR(recorded_at,1,10), 'whoop', recovery_score FROM whoop_recovery
+         WHERE recorded_at>=:since
+        UNION ALL
+        SELECT SUBSTR(recorded_at,1,10), 'oura', readiness_score FROM oura_readiness
+         WHERE recorded_at>=:since
+        UNION ALL
+        SELECT SUBSTR(recorded_at,1,10), 'strain', day_strain FROM whoop_strain
+         WHERE recorded_at>=:since
+    )
+    INSERT INTO daily_summary
+        (day, rhr_sum, rhr_n, hrv_sum, hrv_n, resp_sum, resp_n, vo2_sum, vo2_n,
+         spo2_apple_sum, spo2_apple_n, spo2_whoop_sum, spo2_whoop_n,
+         whoop_sum, whoop_n, oura_sum, oura_n, strain_sum, strain_n)
+    SELECT day,
+        SUM(CASE k WHEN 'resting_heart_rate' THEN v END), COUNT(CASE k WHEN 'resting_heart_rate' THEN v END),
+        SUM(CASE k WHEN 'hrv'                THEN v END), COUNT(CASE k WHEN 'hrv'                THEN v END),
+        SUM(CASE k WHEN 'respiratory_rate'   THEN v END), COUNT(CASE k WHEN 'respiratory_rate'   THEN v END),
+        SUM(CASE k WHEN 'vo2_max'            THEN v END), COUNT(CASE k WHEN 'vo2_max'            THEN v END),
+        SUM(CASE k WHEN 'spo2_apple'         THEN v END), COUNT(CASE k WHEN 'spo2_apple'         THEN v END),
+        SUM(CASE k WHEN 'spo2_whoop'         THEN v END), COUNT(CASE k WHEN 'spo2_whoop'         THEN v END),
+        SUM(CASE k WHEN 'whoop'              THEN v END), COUNT(CASE k WHEN 'whoop'              THEN v END),
+        SUM(CASE k WHEN 'oura'               THEN v END), COUNT(CASE k WHEN 'oura'               THEN v END),
+        SUM(CASE k WHEN 'strain'             THEN v END), COUNT(CASE k WHEN 'strain'             THEN v END)
+    FROM m GROUP BY day
+"""
 
+_summary_lock = threading.Lock()
+
+# Which sources have data and the latest sample time. These only change on
+# import, so they are re-probed when the _refresh_summary() id marks move
+# instead of on every /api/summary hit.
+_SOURCES_SQL = """
+    SELECT EXISTS(SELECT 1 FROM heart_rate WHERE source='apple_health') AS apple_health,
+           EXISTS(SELECT 1 FROM whoop_recovery)                         AS whoop,
+           EXISTS(SELECT 1 FROM oura_readiness)                         AS oura,
+           EXISTS(SELECT 1 FROM heart_rate WHERE source='fitbit')       AS fitbit,
+           (SELECT MAX(recorded_at) FROM heart_rate)                    AS last
+"""
+_sources_cache = {"marks": None, "sources": [], "last": None}
 
-def _spo2_avg(since):
-    """SpO2 average from Apple Health and/or Whoop (Apple overwrites if both present)."""
-    apple = _q1("SELECT ROUND(AVG(CASE WHEN value <= 1.5 THEN value * 100.0 ELSE value END),1) AS v "
-                "FROM heart_rate WHERE metric='blood_oxygen_spo2' AND recorded_at>=?", (since,))
-    whoop = _q1("SELECT ROUND(AVG(spo2_pct),1) AS v FROM whoop_recovery "
-                "WHERE spo2_pct IS NOT NULL AND recorded_at>=?", (since,))
-    return apple.get("v") or whoop.get("v")
+
+def rebuild_summary(since_day="", conn=None):
+    """
+    Recompute daily_summary for every day >= since_day ("" = all history).
+    """
+    c = conn or _borrow()
+    try:
+        with c:
+            for ddl in SUMMARY_DDL:
+                c.execute(ddl)
+            c.execute("DELETE FROM daily_summary WHERE day>=?", (since_day,))
+            c.execute(_ROLLUP_SQL, {"since": since_day})
+    finally:
+        if conn is None:
+            _release(c)
+
+
+def _refresh_summary():
+    """
+    Bring daily_summary up to date with the source tables.
+
+    Cheap when nothing changed (one MAX(id) per table). After an import only
+    days from the earliest newly-inserted row onward are rebuilt; a shrunken
+    table (rows deleted) or a missing rollup triggers a full rebuild.
+    """
+    with _summary_lock:
+        try:
+            c = _borrow()           # writes, so never the request's read_txn()
+        except Exception:
+            return
+        try:
+            marks = {t: c.execute(f"SELECT COALESCE(MAX(id),0) FROM {t}").fetchone()[0]
+                     for t in _SUMMARY_SOURCES}
+            if _sources_cache["marks"] != (DB_PATH, marks):
+                r = dict(c.execute(_SOURCES_SQL).fetchone())
+                _sources_cache.update(
+                    marks=(DB_PATH, marks), last=r.pop("last"),
+                    sources=[name for name, present in r.items() if present])
+            try:
+                stored = dict(c.execute("SELECT tbl, max_id FROM daily_summary_marks").fetchall())
+            except sqlite3.OperationalError:
+                stored = {}
+            if stored == marks:
+                return
+            since = ""
+            if stored and all(marks[t] >= stored.get(t, 0) for t in marks):
+                days = [c.execute(f"SELECT SUBSTR(MIN(recorded_at),1,10) FROM {t} WHERE id>?",
+                                  (stored.get(t, 0),)).fetchone()[0]
+                        for t in marks if marks[t] != stored.get(t)]
+                since = min((d for d in days if d), default="")
+            rebuild_summary(since, conn=c)
+            with c:
+                c.execute("DELETE FROM daily_summary_marks")
+                c.executemany("INSERT INTO daily_summary_marks VALUES (?, ?)", marks.items())
+        except Exception as e:
+            print(f"      Warning: daily summary refresh failed: {e}")
+        finally:
+            _release(c)
 
 
 def _trend_pct(now_v, base_v):
@@ -138,70 +388,80 @@ def _trend_pct(now_v, base_v):
         return None
 
 
+# Every scalar the summary card needs, in one round trip. The averages come
+# from daily_summary (≤15 rows); :s7 / :s15 are the current-week and
+# 15-day-baseline cut-offs.
+_SUMMARY_SQL = """
+    WITH w AS (
+        SELECT ds.*, day>=:s7 AS wk FROM daily_summary ds WHERE day>=MIN(:s7, :s15)
+    )
+    SELECT
+      ROUND(SUM(CASE WHEN wk THEN rhr_sum END) / SUM(CASE WHEN wk THEN rhr_n END),1)   AS rhr,
+      ROUND(SUM(CASE WHEN wk THEN hrv_sum END) / SUM(CASE WHEN wk THEN hrv_n END),1)   AS hrv,
+      ROUND(SUM(CASE WHEN wk THEN resp_sum END) / SUM(CASE WHEN wk THEN resp_n END),1) AS resp,
+      ROUND(SUM(CASE WHEN wk THEN vo2_sum END) / SUM(CASE WHEN wk THEN vo2_n END),1)   AS vo2,
+      ROUND(SUM(CASE WHEN wk THEN spo2_apple_sum END)
+            / SUM(CASE WHEN wk THEN spo2_apple_n END),1)                                AS spo2_apple,
+      ROUND(SUM(CASE WHEN wk THEN spo2_whoop_sum END)
+            / SUM(CASE WHEN wk THEN spo2_whoop_n END),1)                                AS spo2_whoop,
+
+      ROUND(SUM(rhr_sum) / SUM(rhr_n),1)                                                AS rhr_base,
+      ROUND(SUM(hrv_sum) / SUM(hrv_n),1)                                                AS hrv_base,
+      ROUND(SUM(resp_sum) / SUM(resp_n),1)                                              AS resp_base,
+      ROUND(SUM(vo2_sum) / SUM(vo2_n),1)                                                AS vo2_base,
+      ROUND(SUM(spo2_apple_sum) / SUM(spo2_apple_n),1)                                  AS spo2_apple_base,
+      ROUND(SUM(spo2_whoop_sum) / SUM(spo2_whoop_n),1)                                  AS spo2_whoop_base,
+
+      ROUND(SUM(CASE WHEN wk THEN whoop_sum END) / SUM(CASE WHEN wk THEN whoop_n END),0)   AS whoop,
+      ROUND(SUM(CASE WHEN wk THEN oura_sum END) / SUM(CASE WHEN wk THEN oura_n END),0)     AS oura,
+      ROUND(SUM(CASE WHEN wk THEN strain_sum END) / SUM(CASE WHEN wk THEN strain_n END),1) AS strain
+    FROM w
+"""
+
+
+def _sleep_avg(days):
+    """Return average total sleep hours using the properly interval-merged api_sleep()."""
+    rows = api_sleep(days)
+    if not rows:
+        return None
+    totals = [
+        (r.get("deep") or 0) + (r.get("rem") or 0) + (r.get("light") or 0)
+        for r in rows
+        if (r.get("deep") or 0) + (r.get("rem") or 0) + (r.get("light") or 0) > 0
+    ]
+    return round(sum(totals) / len(totals), 2) if totals else None
+
+
 def api_summary():
-    s7  = _since(7)
-    s15 = _since(15)
-
-    # ── Current 7-day values ──────────────────────────────────────────────────
-    rhr  = _q1("SELECT ROUND(AVG(value),1) AS v FROM heart_rate "
-               "WHERE metric='resting_heart_rate' AND recorded_at>=?", (s7,))
-    hrv  = _q1("SELECT ROUND(AVG(value),1) AS v FROM hrv WHERE recorded_at>=?", (s7,))
-    resp = _q1("SELECT ROUND(AVG(value),1) AS v FROM heart_rate "
-               "WHERE metric='respiratory_rate' AND recorded_at>=?", (s7,))
-
-    # Sleep via properly merged intervals (fixes double-counting)
-    sleep_now = _sleep_avg(7)
-    spo2_now  = _spo2_avg(s7)
-    vo2_now   = _q1("SELECT ROUND(AVG(value),1) AS v FROM heart_rate "
-                    "WHERE metric='vo2_max' AND recorded_at>=?", (s7,))
-
-    # ── 15-day baselines for trend comparison ─────────────────────────────────
-    rhr_base  = _q1("SELECT ROUND(AVG(value),1) AS v FROM heart_rate "
-                    "WHERE metric='resting_heart_rate' AND recorded_at>=?", (s15,))
-    hrv_base  = _q1("SELECT ROUND(AVG(value),1) AS v FROM hrv WHERE recorded_at>=?", (s15,))
-    resp_base = _q1("SELECT ROUND(AVG(value),1) AS v FROM heart_rate "
-                    "WHERE metric='respiratory_rate' AND recorded_at>=?", (s15,))
+    _refresh_summary()
+    r = _q1(_SUMMARY_SQL, {"s7": _since(7), "s15": _since(15)})
+
+    # Sleep via properly merged intervals (fixes double-counting); nights
+    # span days, so these read the few sleep rows in range directly.
+    sleep_now  = _sleep_avg(7)
     sleep_base = _sleep_avg(15)
-    spo2_base  = _spo2_avg(s15)
-    vo2_base   = _q1("SELECT ROUND(AVG(value),1) AS v FROM heart_rate "
-                     "WHERE metric='vo2_max' AND recorded_at>=?", (s15,))
-
-    # ── Recovery scores ───────────────────────────────────────────────────────
-    whoop  = _q1("SELECT ROUND(AVG(recovery_score),0) AS v FROM whoop_recovery WHERE recorded_at>=?", (s7,))
-    oura   = _q1("SELECT ROUND(AVG(readiness_score),0) AS v FROM oura_readiness WHERE recorded_at>=?", (s7,))
-    strain = _q1("SELECT ROUND(AVG(day_strain),1) AS v FROM whoop_strain WHERE recorded_at>=?", (s7,))
-
-    # ── Detect data sources ───────────────────────────────────────────────────
-    sources = []
-    if _q1("SELECT 1 AS x FROM heart_rate WHERE source='apple_health' LIMIT 1").get("x"):
-        sources.append("apple_health")
-    if _q1("SELECT 1 AS x FROM whoop_recovery LIMIT 1").get("x"):
-        sources.append("whoop")
-    if _q1("SELECT 1 AS x FROM oura_readiness LIMIT 1").get("x"):
-        sources.append("oura")
-    if _q1("SELECT 1 AS x FROM heart_rate WHERE source='fitbit' LIMIT 1").get("x"):
-        sources.append("fitbit")
-
-    last = _q1("SELECT MAX(recorded_at) AS d FROM heart_rate")
+    # SpO2: Apple Health wins over Whoop when both are present
+    spo2_now   = r.get("spo2_apple") or r.get("spo2_whoop")
+    spo2_base  = r.get("spo2_apple_base") or r.get("spo2_whoop_base")
 
     return {
-        "resting_hr":       _safe_int(rhr.get("v")),
-        "resting_hr_trend": _trend_pct(rhr.get("v"), rhr_base.get("v")),
-        "hrv":              rhr_or_none(hrv.get("v")),
-        "hrv_trend":        _trend_pct(hrv.get("v"), hrv_base.get("v")),
+        "resting_hr":       _safe_int(r.get("rhr")),
+        "resting_hr_trend": _trend_pct(r.get("rhr"), r.get("rhr_base")),
+        "hrv":              rhr_or_none(r.get("hrv")),
+        "hrv_trend":        _trend_pct(r.get("hrv"), r.get("hrv_base")),
         "sleep_hours":      rhr_or_none(sleep_now),
         "sleep_trend":      _trend_pct(sleep_now, sleep_base),
         "spo2":             rhr_or_none(spo2_now),
         "spo2_trend":       _trend_pct(spo2_now, spo2_base),
-        "resp_rate":        rhr_or_none(resp.get("v")),
-        "resp_trend":       _trend_pct(resp.get("v"), resp_base.get("v")),
-        "whoop_recovery":   _safe_int(whoop.get("v")),
-        "oura_readiness":   _safe_int(oura.get("v")),
-        "whoop_strain":     rhr_or_none(strain.get("v")),
-        "vo2_max":          rhr_or_none(vo2_now.get("v")),
-        "vo2_max_trend":    _trend_pct(vo2_now.get("v"), vo2_base.get("v")),
-        "sources":          sources,
-        "last_recorded":    (last.get("d") or "")[:10],
+        "resp_rate":        rhr_or_none(r.get("resp")),
+        "resp_trend":       _trend_pct(r.get("resp"), r.get("resp_base")),
+        "whoop_recovery":   _safe_int(r.get("whoop")),
+        "oura_readiness":   _safe_int(r.get("oura")),
+        "whoop_strain":     rhr_or_none(r.get("strain")),
+        "vo2_max":          rhr_or_none(r.get("vo2")),
+        "vo2_max_trend":    _trend_pct(r.get("vo2"), r.get("vo2_base")),
+        "sources":          list(_sources_cache["sources"]),
+        "last_recorded":    (_sources_cache["last"] or "")[:10],
     }
 
 def _safe_int(v):
@@ -213,39 +473,43 @@ def rhr_or_none(v):
     except: return None
 
 
+# recorded_at>=:since is the window cut-off, on the local-time string as in
+# every other query. A row's UTC date(recorded_at) is at most a day before its
+# local date, so the extra date() bound never drops a row; it only lets SQLite
+# range-scan the date(recorded_at) covering indexes.
 def api_heart_rate(days=30):
-    return _q("""
+    return _q_json("""
         SELECT date(recorded_at) AS date,
                ROUND(AVG(value),0) AS avg,
                MIN(value) AS min, MAX(value) AS max
         FROM heart_rate
-        WHERE metric='heart_rate' AND recorded_at>=?
+        WHERE metric='heart_rate' AND date(recorded_at)>=date(:since,'-1 day') AND recorded_at>=:since
         GROUP BY date(recorded_at) ORDER BY date
-    """, (_since(days),))
+    """, {"since": _since(days)})
 
 
 def api_resting_hr(days=30):
     return _q("""
         SELECT date(recorded_at) AS date, ROUND(AVG(value),0) AS value
         FROM heart_rate
-        WHERE metric='resting_heart_rate' AND recorded_at>=?
+        WHERE metric='resting_heart_rate' AND date(recorded_at)>=date(:since,'-1 day') AND recorded_at>=:since
         GROUP BY date(recorded_at) ORDER BY date
-    """, (_since(days),))
+    """, {"since": _since(days)})
 
 
 def api_hrv(days=30):
-    rows = _q("""
-        SELECT date(recorded_at) AS date, ROUND(AVG(value),1) AS value, source
-        FROM hrv WHERE recorded_at>=?
-        GROUP BY date(recorded_at), source ORDER BY date
-    """, (_since(days),))
-    # Collapse multiple sources per day → prefer apple_health
-    by_date = {}
-    for r in rows:
-        d = r["date"]
-        if d not in by_date or r["source"] == "apple_health":
-            by_date[d] = r
-    return sorted(by_date.values(), key=lambda x: x["date"])
+    # One row per day: collapse multiple sources, preferring apple_health
+    # (ties among other sources go to the first by name).
+    return _q("""
+        WITH per_source AS (
+            SELECT date(recorded_at) AS date, ROUND(AVG(value),1) AS value, source,
+                   ROW_NUMBER() OVER (PARTITION BY date(recorded_at)
+                                      ORDER BY source<>'apple_health', source) AS rn
+            FROM hrv WHERE date(recorded_at)>=date(:since,'-1 day') AND recorded_at>=:since
+            GROUP BY date(recorded_at), source
+        )
+        SELECT date, value, source FROM per_source WHERE rn=1 ORDER BY date
+    """, {"since": _since(days)})
 
 
 def api_blood_oxygen(days=30):
@@ -255,9 +519,9 @@ def api_blood_oxygen(days=30):
         SELECT date(recorded_at) AS date,
                ROUND(AVG(CASE WHEN value <= 1.5 THEN value * 100.0 ELSE value END),1) AS value
         FROM heart_rate
-        WHERE metric='blood_oxygen_spo2' AND recorded_at>=?
+        WHERE metric='blood_oxygen_spo2' AND date(recorded_at)>=date(:since,'-1 day') AND recorded_at>=:since
         GROUP BY date(recorded_at) ORDER BY date
-    """, (s,))
+    """, {"since": s})
     # Whoop (spo2_pct column in whoop_recovery)
     whoop = _q("""
         SELECT date(recorded_at) AS date, ROUND(AVG(spo2_pct),1) AS value
@@ -276,211 +540,126 @@ def api_respiration(days=30):
     return _q("""
         SELECT date(recorded_at) AS date, ROUND(AVG(value),1) AS value
         FROM heart_rate
-        WHERE metric='respiratory_rate' AND recorded_at>=?
+        WHERE metric='respiratory_rate' AND date(recorded_at)>=date(:since,'-1 day') AND recorded_at>=:since
         GROUP BY date(recorded_at) ORDER BY date
-    """, (_since(days),))
+    """, {"since": _since(days)})
 
 
 def api_vo2max(days=180):
     return _q("""
         SELECT date(recorded_at) AS date, ROUND(AVG(value),1) AS value
         FROM heart_rate
-        WHERE metric='vo2_max' AND recorded_at>=?
+        WHERE metric='vo2_max' AND date(recorded_at)>=date(:since,'-1 day') AND recorded_at>=:since
         GROUP BY date(recorded_at) ORDER BY date
-    """, (_since(days),))
-
-
-def _dur_hours(end_col, start_col):
-    """SQLite expression: hours between two ISO8601 columns (handles tz offsets)."""
-    # SUBSTR(...,1,19) strips timezone offset so julianday() can parse it.
-    return f"(julianday(SUBSTR({end_col},1,19))-julianday(SUBSTR({start_col},1,19)))*24"
-
+    """, {"since": _since(days)})
+
+
+# Apple Health sleep, one row per night, computed entirely in SQL. Stages are
+# stored as the lowercased enum suffix: asleepdeep, asleeprem, asleepcore,
+# asleepunspecified, awake, in_bed.
+#
+# Sources of inflation to guard against:
+#   A) Multiple devices (Apple Watch + AutoSleep) writing for the same night
+#      → rank devices per date: anything named "…watch…" first, then most
+#        deep+REM; keep rn=1
+#   B) Same device writes both granular stage segments AND a long
+#      asleepunspecified umbrella for the whole night (Apple Watch behaviour)
+#      → if device has any deep/rem/core, light = core and unspec is ignored
+#   C) Overlapping segments: Watch writes both short per-cycle segments
+#      AND longer processed blocks covering the same time range. A naive
+#      SUM() double-counts these. Fix: gaps-and-islands — a segment opens a
+#      new island when it starts after every earlier segment in the same
+#      (date, device, stage) has ended; each island counts MAX(end)-MIN(start).
+#   D) Duplicate rows from re-importing the same export (handled by the
+#      UNIQUE index, but island merging also collapses exact dupes).
+_APPLE_SLEEP_SQL = """
+    WITH seg AS (
+        SELECT date(recorded_at) AS d, COALESCE(device,'') AS device, stage,
+               SUBSTR(start, 1, 19) AS s, SUBSTR(end, 1, 19) AS e
+        FROM sleep
+        WHERE recorded_at>=? AND source='apple_health'
+          AND stage IN ('asleepdeep','asleeprem','asleepcore','asleepunspecified','awake')
+          AND end IS NOT NULL AND start IS NOT NULL
+          AND length(end)>=19 AND length(start)>=19
+    ), edged AS (
+        SELECT *, MAX(e) OVER (PARTITION BY d, device, stage ORDER BY s, e
+                               ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING) AS reach
+        FROM seg
+    ), islands AS (
+        SELECT d, device, stage, s, e,
+               SUM(reach IS NULL OR s > reach) OVER (PARTITION BY d, device, stage ORDER BY s, e
+                                                     ROWS UNBOUNDED PRECEDING) AS island
+        FROM edged
+    ), stage_hours AS (
+        SELECT d, device, stage, ROUND(SUM(h), 2) AS h
+        FROM (SELECT d, device, stage,
+                     (strftime('%s', MAX(e)) - strftime('%s', MIN(s))) / 3600.0 AS h
+              FROM islands GROUP BY d, device, stage, island)
+        GROUP BY d, device, stage
+    ), agg AS (
+        SELECT d, device,
+               ROUND(TOTAL(CASE stage WHEN 'asleepdeep'        THEN h END), 2) AS deep,
+               ROUND(TOTAL(CASE stage WHEN 'asleeprem'         THEN h END), 2) AS rem,
+               ROUND(TOTAL(CASE stage WHEN 'asleepcore'        THEN h END), 2) AS core,
+               ROUND(TOTAL(CASE stage WHEN 'asleepunspecified' THEN h END), 2) AS unspec,
+               ROUND(TOTAL(CASE stage WHEN 'awake'             THEN h END), 2) AS awake
+        FROM stage_hours GROUP BY d, device
+    ), ranked AS (
+        SELECT *, ROW_NUMBER() OVER (
+                      PARTITION BY d
+                      ORDER BY instr(lower(device), 'watch') > 0 DESC,
+                               deep + rem DESC, device) AS rn
+        FROM agg
+    )
+    SELECT d AS date, device, deep, rem, core, unspec, awake,
+           0 AS efficiency,
+           CASE WHEN deep > 0 OR rem > 0 OR core > 0 THEN core ELSE unspec END AS light
+    FROM ranked
+    WHERE rn=1
+      AND deep + rem + CASE WHEN deep > 0 OR rem > 0 OR core > 0 THEN core ELSE unspec END > 0
+    ORDER BY date
+"""
 
-_STAGE_KEY = {
-    "asleepdeep": "deep", "asleeprem": "rem", "asleepcore": "core",
-    "asleepunspecified": "unspec", "awake": "awake",
-}
 
+# Whoop / Oura: pre-computed stage hours. GROUP BY yields one row per
+# calendar date (Whoop + Oura both reporting the same night, or a nap +
+# nighttime session, are averaged).
+_WEARABLE_SLEEP_SQL = """
+    SELECT date(recorded_at) AS date,
+           ROUND(AVG(COALESCE(deep_sleep_hours,0)),2)      AS deep,
+           ROUND(AVG(COALESCE(rem_sleep_hours,0)),2)       AS rem,
+           ROUND(AVG(COALESCE(light_sleep_hours,0)),2)     AS light,
+           ROUND(AVG(COALESCE(awake_hours,0)),2)           AS awake,
+           ROUND(AVG(COALESCE(sleep_performance_pct,0)),0) AS efficiency
+    FROM sleep
+    WHERE recorded_at>=? AND source IN ('whoop','oura') AND stage='asleep'
+    GROUP BY date(recorded_at) ORDER BY date
+"""
 
-def _merge_sleep_segments(segments):
-    """
-    Merge overlapping Apple Health sleep intervals.
+# Last resort: Apple Health 'in_bed' only (older Apple Watch).
+_IN_BED_SLEEP_SQL = """
+    SELECT date(recorded_at) AS date,
+           0 AS deep, 0 AS rem,
+           ROUND(COALESCE(SUM(duration_hours),0),2) AS light,
+           0 AS awake, 0 AS efficiency
+    FROM sleep
+    WHERE recorded_at>=? AND source='apple_health' AND stage='in_bed'
+    GROUP BY date(recorded_at)
+    HAVING light > 0
+    ORDER BY date
+"""
 
-    Apple Watch can write both short per-cycle stage segments (~30 min)
-    AND longer processed blocks that cover the same time range.  A naive
-    SUM() double-counts the overlap; this function computes the true
-    *union* of time for each (date, device, stage) group, then returns
-    one row per (date, device) matching the dict shape the caller expects.
-    """
-    # Group raw segments by (date, device, stage)
-    groups = defaultdict(list)
-    for seg in segments:
-        key = (seg["date"], seg["device"], seg["stage"])
-        groups[key].append((seg["seg_start"], seg["seg_end"]))
-
-    # Merge overlapping intervals and measure total hours
-    def _merged_hours(intervals):
-        iv = sorted(intervals)
-        merged = [list(iv[0])]
-        for s, e in iv[1:]:
-            if s <= merged[-1][1]:              # overlapping or touching
-                merged[-1][1] = max(merged[-1][1], e)
-            else:
-                merged.append([s, e])
-        total = 0.0
-        for s, e in merged:
-            try:
-                ds = datetime.fromisoformat(s)
-                de = datetime.fromisoformat(e)
-                total += (de - ds).total_seconds() / 3600.0
-            except (ValueError, TypeError):
-                pass
-        return round(total, 2)
-
-    # Aggregate per (date, device)
-    dd = defaultdict(lambda: {"deep": 0, "rem": 0, "core": 0,
-                               "unspec": 0, "awake": 0, "device": ""})
-    for (date, device, stage), ivs in groups.items():
-        dd[(date, device)]["device"] = device
-        dd[(date, device)][_STAGE_KEY.get(stage, "unspec")] += _merged_hours(ivs)
-
-    # Build result list matching the shape the caller expects
-    raw = []
-    for (date, device), vals in sorted(dd.items()):
-        raw.append({
-            "date": date,
-            "device": vals["device"],
-            "deep": round(vals["deep"], 2),
-            "rem": round(vals["rem"], 2),
-            "core": round(vals["core"], 2),
-            "unspec": round(vals["unspec"], 2),
-            "awake": round(vals["awake"], 2),
-            "efficiency": 0,
-        })
-    return raw
+# Best source first; api_sleep uses the first tier with any rows in range.
+_SLEEP_TIERS = (_WEARABLE_SLEEP_SQL, _APPLE_SLEEP_SQL, _IN_BED_SLEEP_SQL)
 
 
 def api_sleep(days=30):
     s = _since(days)
-
-    # ── 1. Whoop / Oura (have pre-computed stage hours) ──────────────────────
-    rows = _q("""
-        SELECT date(recorded_at) AS date,
-               ROUND(AVG(COALESCE(deep_sleep_hours,0)),2)      AS deep,
-               ROUND(AVG(COALESCE(rem_sleep_hours,0)),2)       AS rem,
-               ROUND(AVG(COALESCE(light_sleep_hours,0)),2)     AS light,
-               ROUND(AVG(COALESCE(awake_hours,0)),2)           AS awake,
-               ROUND(AVG(COALESCE(sleep_performance_pct,0)),0) AS efficiency
-        FROM sleep
-        WHERE recorded_at>=? AND source IN ('whoop','oura') AND stage='asleep'
-        GROUP BY date(recorded_at) ORDER BY date
-    """, (s,))
-    if rows:
-        # Deduplicate to one row per calendar date — keep whichever session
-        # has the most total sleep (handles Whoop + Oura both reporting same night,
-        # or a nap + nighttime session on the same day)
-        by_date: dict = {}
-        for r in rows:
-            d = r["date"]
-            total = (r.get("deep") or 0) + (r.get("rem") or 0) + (r.get("light") or 0)
-            prev = by_date.get(d)
-            if prev is None:
-                by_date[d] = r
-            else:
-                prev_total = (prev.get("deep") or 0) + (prev.get("rem") or 0) + (prev.get("light") or 0)
-                if total > prev_total:
-                    by_date[d] = r
-        return sorted(by_date.values(), key=lambda x: x["date"])
-
-    # ── 2. Apple Health detailed stages ──────────────────────────────────────
-    # Apple Health stores stage as lowercased enum suffix:
-    #   asleepdeep, asleeprem, asleepcore, asleepunspecified, awake, in_bed
-    #
-    # Sources of inflation to guard against:
-    #   A) Multiple devices (Apple Watch + AutoSleep) writing for the same night
-    #      → group by device, pick device with most deep+REM (best stage data)
-    #   B) Same device writes both granular stage segments AND a long
-    #      asleepunspecified umbrella for the whole night (Apple Watch behaviour)
-    #      → if device has any deep/rem/core, drop asleepunspecified entirely
-    #   C) Overlapping segments: Watch writes both short per-cycle segments
-    #      AND longer processed blocks covering the same time range. A naive
-    #      SUM() double-counts these. Fix: merge overlapping intervals in
-    #      Python per (date, device, stage) and measure the union.
-    #   D) Duplicate rows from re-importing the same export (handled by the
-    #      UNIQUE index, but interval merging also collapses exact dupes).
-    segments = _q("""
-        SELECT date(recorded_at) AS date,
-               device,
-               stage,
-               SUBSTR(start, 1, 19) AS seg_start,
-               SUBSTR(end,   1, 19) AS seg_end
-        FROM sleep
-        WHERE recorded_at>=? AND source='apple_health'
-          AND stage IN ('asleepdeep','asleeprem','asleepcore','asleepunspecified','awake')
-          AND end IS NOT NULL AND start IS NOT NULL
-          AND length(end)>=19 AND length(start)>=19
-        ORDER BY date, device, stage, start
-    """, (s,))
-    if segments:
-        raw = _merge_sleep_segments(segments)
-    else:
-        raw = []
-    # Device selection priority:
-    #   1. Devices whose name contains "watch" (the physical Apple Watch)
-    #      — always preferred over third-party apps (AutoSleep, Sleep Cycle …)
-    #      which also write deep/REM and inflate light/core records.
-    #   2. Among same device-class, pick the one with the most deep+REM hours.
-    # Light-sleep dedup:
-    #   When a device has any deep/rem/core, Apple Watch also writes a long
-    #   asleepunspecified umbrella for the whole session — exclude it and use
-    #   only asleepcore for "light". Use asleepunspecified only when there are
-    #   zero stage records (older watch with basic tracking).
-    by_date = {}
-    for r in raw:
-        d = r["date"]
-        is_watch = "watch" in (r.get("device") or "").lower()
-        score = (r.get("deep") or 0) + (r.get("rem") or 0)
-        prev = by_date.get(d)
-        if prev is None:
-            by_date[d] = r
-        else:
-            prev_is_watch = "watch" in (prev.get("device") or "").lower()
-            prev_score = (prev.get("deep") or 0) + (prev.get("rem") or 0)
-            # Real Apple Watch beats any third-party app unconditionally.
-            # Within the same class, higher deep+REM wins.
-            if is_watch and not prev_is_watch:
-                by_date[d] = r
-            elif is_watch == prev_is_watch and score > prev_score:
-                by_date[d] = r
-    rows = []
-    for r in sorted(by_date.values(), key=lambda x: x["date"]):
-        deep   = r.get("deep")  or 0
-        rem    = r.get("rem")   or 0
-        core   = r.get("core")  or 0
-        unspec = r.get("unspec") or 0
-        has_stage_tracking = deep > 0 or rem > 0 or core > 0
-        light = core if has_stage_tracking else unspec
-        entry = dict(r)
-        entry["light"] = round(light, 2)
-        if deep + rem + light > 0:
-            rows.append(entry)
-    if rows:
-        return rows
-
-    # ── 3. Last resort: Apple Health 'in_bed' only (older Apple Watch) ───────
-    dur = _dur_hours("end", "start")
-    rows = _q(f"""
-        SELECT date(recorded_at) AS date,
-               0 AS deep, 0 AS rem,
-               ROUND(COALESCE(SUM({dur}),0),2) AS light,
-               0 AS awake, 0 AS efficiency
-        FROM sleep
-        WHERE recorded_at>=? AND source='apple_health' AND stage='in_bed'
-          AND end IS NOT NULL AND start IS NOT NULL
-        GROUP BY date(recorded_at)
-        ORDER BY date
-    """, (s,))
-    return [r for r in rows if (r.get("light") or 0) > 0]
+    for sql in _SLEEP_TIERS:
+        rows = _q(sql, (s,))
+        if rows:
+            return rows
+    return []
 
 
 def api_debug_sleep():
@@ -497,7 +676,7 @@ def api_debug_sleep():
         dates  = dict(conn.execute(
             "SELECT MIN(date(recorded_at)) AS mn, MAX(date(recorded_at)) AS mx FROM sleep"
         ).fetchone())
-        conn.close()
+        _release(conn)
         return {"total_rows": total, "date_range": dates,
                 "stages": stages, "sample": sample}
     except Exception as e:
@@ -531,40 +710,98 @@ def api_sleep_stages(date=""):
     """, (date, date))
 
 
+# Workout HR charts are a few hundred px wide; longer sample runs are thinned
+# with LTTB before encoding so the payload and the canvas loop stay small.
+_WORKOUT_HR_POINTS = 400
+
+
+def _lttb(xs, ys, threshold):
+    """
+    Largest-Triangle-Three-Buckets downsampling.
+
+    Returns the indices of `threshold` points (always including the first and
+    last) that best preserve the visual shape of the series; xs must ascend.
+    """
+    n = len(xs)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+    every = (n - 2) / (threshold - 2)
+    keep = [0]
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = int(i * every) + 1, int((i + 1) * every) + 1
+        nlo, nhi = hi, min(int((i + 2) * every) + 1, n)
+        cx = sum(xs[nlo:nhi]) / (nhi - nlo)
+        cy = sum(ys[nlo:nhi]) / (nhi - nlo)
+        ax, ay = xs[a], ys[a]
+        best, best_area = lo, -1.0
+        for j in range(lo, hi):
+            area = abs((ax - cx) * (ys[j] - ay) - (ax - xs[j]) * (cy - ay))
+            if area > best_area:
+                best, best_area = j, area
+        keep.append(best)
+        a = best
+    keep.append(n - 1)
+    return keep
+
+
 def api_workout_hr(start, end):
     """Heart rate samples recorded during a workout window.
-    Uses datetime() for timezone-safe comparison (handles -05:00 vs Z offsets)."""
-    return _q("""
-        SELECT recorded_at AS time, ROUND(value,0) AS value
+    Uses datetime() for timezone-safe comparison (handles -05:00 vs Z offsets).
+    Long workouts are downsampled to _WORKOUT_HR_POINTS with LTTB."""
+    rows = _q("""
+        SELECT recorded_at AS time, ROUND(value,0) AS value,
+               julianday(recorded_at) AS jd
         FROM heart_rate
         WHERE metric='heart_rate'
           AND datetime(recorded_at) >= datetime(?)
           AND datetime(recorded_at) <= datetime(?)
-        ORDER BY recorded_at LIMIT 500
+        ORDER BY recorded_at LIMIT 5000
     """, (start, end))
+    xs = [r.pop("jd") for r in rows]
+    if len(rows) > _WORKOUT_HR_POINTS:
+        if None in xs:
+            xs = list(range(len(rows)))
+        ys = [r["value"] or 0 for r in rows]
+        rows = [rows[i] for i in _lttb(xs, ys, _WORKOUT_HR_POINTS)]
+    return rows
+
+
+_ROUTE_SQL = """
+    SELECT latitude AS lat, longitude AS lon, altitude_m AS alt, timestamp AS time
+    FROM workout_routes
+    WHERE datetime(workout_start) = datetime(?)
+    ORDER BY timestamp LIMIT 5000
+"""
 
 
 def api_workout_route(start):
     """GPS route points for a workout (empty list if not yet imported)."""
-    return _q("""
-        SELECT latitude AS lat, longitude AS lon, altitude_m AS alt, timestamp AS time
-        FROM workout_routes
-        WHERE datetime(workout_start) = datetime(?)
-        ORDER BY timestamp LIMIT 5000
-    """, (start,))
+    return _q_json(_ROUTE_SQL, (start,))
 
 
 def api_workout_splits(start):
     """Compute per-mile splits from GPS route data for a workout."""
+    return _route_splits(_q(_ROUTE_SQL, (start,)))
+
+
+def api_workout_detail(start, end, route=True):
+    """
+    Everything the expanded workout card needs in one request: HR samples,
+    and (for route activities) the GPS route plus its per-mile splits, read in
+    one transaction with the route fetched once for both.
+    """
+    with read_txn():
+        hr = api_workout_hr(start, end)
+        points = _q(_ROUTE_SQL, (start,)) if route else []
+    return {"hr": hr, "route": points, "splits": _route_splits(points)}
+
+
+def _route_splits(points):
+    """Per-mile splits (pace, elevation change) from ordered route points."""
     import math
     from datetime import datetime as _dt
     KM_PER_MILE = 1.60934
-    points = _q("""
-        SELECT latitude AS lat, longitude AS lon, altitude_m AS alt, timestamp AS time
-        FROM workout_routes
-        WHERE datetime(workout_start) = datetime(?)
-        ORDER BY timestamp LIMIT 5000
-    """, (start,))
     if not points or len(points) < 2:
         return []
 
@@ -686,7 +923,7 @@ def api_temperature(days=30):
 
 
 def api_workouts(days=30):
-    return _q("""
+    return _q_json("""
         SELECT w.recorded_at,
                w.end,
                date(w.recorded_at)               AS date,
@@ -1136,6 +1373,42 @@ canvas{display:block;width:100%}
   </div>
 </main>
 
+<template id="woRow">
+  <div class="wo">
+    <div class="wo-main">
+      <div class="wo-left">
+        <div class="wo-icon"></div>
+        <div>
+          <div class="wo-name"></div>
+          <div class="wo-date"></div>
+        </div>
+      </div>
+      <div class="wo-right">
+        <div class="wo-dur"></div>
+        <div class="wo-cal"></div>
+        <span class="wo-chev">›</span>
+      </div>
+    </div>
+    <div class="wo-detail">
+      <div class="wo-detail-inner"></div>
+      <div class="wo-detail-charts">
+        <div class="wo-hr-chart">
+          <div class="wo-hr-lbl">Heart Rate Trend</div>
+          <canvas height="120"></canvas>
+        </div>
+      </div>
+      <div data-slot="zones"></div>
+      <div data-slot="splits"></div>
+      <div class="wo-route-section">
+        <div class="wo-route-lbl">GPS Route</div>
+        <canvas class="wo-route-canvas"></canvas>
+        <canvas class="wo-elev-canvas"></canvas>
+      </div>
+    </div>
+  </div>
+</template>
+<template id="woStat"><div class="wo-stat"><div class="wo-stat-val"></div><div class="wo-stat-lbl"></div></div></template>
+
 <div id="tt"><div id="tt-date"></div><div id="tt-val"></div><div id="tt-sub"></div></div>
 
 <script>
@@ -1172,27 +1445,40 @@ function fmtDateLong(s) {
 }
 
 // Animated counter (counts from 0 to target)
+// All count-up animations advance from one shared rAF loop: each entry is a
+// step function that returns false once finished.
+const _anims = [];
+function _tick(t) {
+  for (let i = _anims.length-1; i >= 0; i--) if (!_anims[i](t)) _anims.splice(i, 1);
+  if (_anims.length) requestAnimationFrame(_tick);
+}
+
 function countUp(el, target, decimals=0, suffix='') {
-  if (target == null || isNaN(target)) { el.innerHTML = '—'; return; }
-  const dur = 800, steps = 40, step = dur/steps;
-  let i = 0;
-  const tick = () => {
-    i++;
-    const progress = i/steps;
+  if (target == null || isNaN(target)) { el._anim = null; el.innerHTML = '—'; return; }
+  const dur = 800, token = {};
+  let t0 = null;
+  el._anim = token;   // a newer countUp on the same element supersedes this one
+  const step = t => {
+    if (el._anim !== token) return false;
+    if (t0 === null) t0 = t;
+    const progress = Math.min(1, (t - t0) / dur);
     const ease = 1 - Math.pow(1-progress, 3); // ease-out cubic
     el.textContent = (+target * ease).toFixed(decimals) + suffix;
-    if (i < steps) setTimeout(tick, step);
-    else el.textContent = (+target).toFixed(decimals) + suffix;
+    if (progress < 1) return true;
+    el.textContent = (+target).toFixed(decimals) + suffix;
+    return false;
   };
-  tick();
+  if (_anims.push(step) === 1) requestAnimationFrame(_tick);
 }
 
 // ── Canvas helpers ────────────────────────────────────────────────────────────
+const lastW = {};   // CSS width each canvas was last drawn at (see resize)
 function ctx2d(id) {
   const c = $(id);
   if (!c) return null;
   const dpr = window.devicePixelRatio || 1;
   const w = c.offsetWidth || 600;
+  lastW[id] = w;
   const h = c.offsetHeight || parseInt(c.getAttribute('height')) || 128;
   c.width  = w * dpr;
   c.height = h * dpr;
@@ -1204,6 +1490,31 @@ function ctx2d(id) {
 // ── Line Chart ────────────────────────────────────────────────────────────────
 const chartMeta = {};   // stores layout info per chart id for hover
 
+const seriesPaths = {}; // cached Path2D per chart series, keyed by data + size
+
+// Static grid/label layers, rendered once per size + range into an offscreen
+// bitmap and blitted under the data on every redraw.
+const gridCache = new Map();
+function offscreen(w, h) {
+  return typeof OffscreenCanvas !== 'undefined'
+    ? new OffscreenCanvas(w, h)
+    : Object.assign(document.createElement('canvas'), {width: w, height: h});
+}
+function gridLayer(key, w, h, paint) {
+  const dpr = window.devicePixelRatio || 1;
+  key += '@' + dpr;
+  let layer = gridCache.get(key);
+  if (!layer) {
+    if (gridCache.size >= 64) gridCache.clear();
+    layer = offscreen(w * dpr, h * dpr);
+    const g = layer.getContext('2d');
+    g.scale(dpr, dpr);
+    paint(g);
+    gridCache.set(key, layer);
+  }
+  return layer;
+}
+
 function drawLine(mainId, overlayId, data, {
   color='#fff', valueKey='value', dateKey='date',
   minY=null, maxY=null, unit='', label2=null, value2Key=null, color2=null
@@ -1238,29 +1549,30 @@ function drawLine(mainId, overlayId, data, {
   }));
 
   // Save meta for hover
-  chartMeta[mainId] = { data, pts, valueKey, dateKey, color, unit, pad, cw, ch };
+  const step = cw / Math.max(data.length-1, 1);
+  chartMeta[mainId] = { data, pts, valueKey, dateKey, color, unit, pad, cw, ch, step };
 
   // Clear
   cx.clearRect(0, 0, w, h);
 
-  // Horizontal grid lines
-  cx.strokeStyle = 'rgba(255,255,255,0.04)';
-  cx.lineWidth   = 1;
-  for (let i=0; i<=4; i++) {
-    const y = pad.t + (ch/4)*i;
-    cx.beginPath(); cx.moveTo(pad.l, y); cx.lineTo(w-pad.r, y); cx.stroke();
-  }
-
-  // Y labels
-  cx.fillStyle   = 'rgba(255,255,255,0.28)';
-  cx.font        = '10px -apple-system,sans-serif';
-  cx.textAlign   = 'right';
-  cx.textBaseline= 'middle';
-  for (let i=0; i<=2; i++) {
-    const v = yMin + (yRange/2)*i;
-    const y = pad.t + ch - ((v-yMin)/yRange)*ch;
-    cx.fillText(Math.round(v), pad.l-6, y);
-  }
+  // Horizontal grid lines + Y labels (cached per size and range)
+  cx.drawImage(gridLayer(`line:${w}x${h}:${yMin}:${yRange}`, w, h, g => {
+    g.strokeStyle = 'rgba(255,255,255,0.04)';
+    g.lineWidth   = 1;
+    for (let i=0; i<=4; i++) {
+      const y = pad.t + (ch/4)*i;
+      g.beginPath(); g.moveTo(pad.l, y); g.lineTo(w-pad.r, y); g.stroke();
+    }
+    g.fillStyle   = 'rgba(255,255,255,0.28)';
+    g.font        = '10px -apple-system,sans-serif';
+    g.textAlign   = 'right';
+    g.textBaseline= 'middle';
+    for (let i=0; i<=2; i++) {
+      const v = yMin + (yRange/2)*i;
+      const y = pad.t + ch - ((v-yMin)/yRange)*ch;
+      g.fillText(Math.round(v), pad.l-6, y);
+    }
+  }), 0, 0, w, h);
 
   // X labels (first / middle / last)
   cx.textAlign   = 'center';
@@ -1274,50 +1586,43 @@ function drawLine(mainId, overlayId, data, {
     const validPts = pts.filter(p => p[yk] != null);
     if (validPts.length < 2) return;
 
+    const last = validPts[validPts.length-1];
+    const fst  = validPts[0];
+
+    // Smoothed line + closed fill as Path2D, rebuilt only when data or size change
+    const key = mainId + ':' + yk;
+    let paths = seriesPaths[key];
+    if (!paths || paths.data !== data || paths.w !== w || paths.h !== h) {
+      const line = new Path2D();
+      let first = true, prev = -1;
+      for (let i=0; i<pts.length; i++) {
+        const p = pts[i], y = p[yk];
+        if (y == null) { first=true; continue; }
+        if (first) { line.moveTo(p.x, y); first=false; }
+        else {
+          const pp = pts[prev];
+          const cpx = (pp.x + p.x) / 2;
+          line.bezierCurveTo(cpx, pp[yk], cpx, y, p.x, y);
+        }
+        prev = i;
+      }
+      const fill = new Path2D(line);
+      fill.lineTo(last.x, pad.t+ch);
+      fill.lineTo(fst.x,  pad.t+ch);
+      fill.closePath();
+      paths = seriesPaths[key] = { data, w, h, line, fill };
+    }
+
     // Gradient fill
     const grad = cx.createLinearGradient(0, pad.t, 0, pad.t+ch);
     grad.addColorStop(0,   col + '28');
     grad.addColorStop(0.7, col + '08');
     grad.addColorStop(1,   col + '00');
-
-    cx.beginPath();
-    let first = true;
-    for (let i=0; i<pts.length; i++) {
-      const p = pts[i], y = p[yk];
-      if (y == null) { first=true; continue; }
-      if (first) { cx.moveTo(p.x, y); first=false; }
-      else {
-        const pp = pts.slice(0,i).reverse().find(pp=>pp[yk]!=null);
-        if (pp) {
-          const cpx = (pp.x + p.x) / 2;
-          cx.bezierCurveTo(cpx, pp[yk], cpx, y, p.x, y);
-        } else cx.lineTo(p.x, y);
-      }
-    }
-    const last = validPts[validPts.length-1];
-    const fst  = validPts[0];
-    cx.lineTo(last.x, pad.t+ch);
-    cx.lineTo(fst.x,  pad.t+ch);
-    cx.closePath();
-    cx.fillStyle = grad; cx.fill();
+    cx.fillStyle = grad; cx.fill(paths.fill);
 
     // Line
-    cx.beginPath();
-    first = true;
-    for (let i=0; i<pts.length; i++) {
-      const p = pts[i], y = p[yk];
-      if (y == null) { first=true; continue; }
-      if (first) { cx.moveTo(p.x, y); first=false; }
-      else {
-        const pp = pts.slice(0,i).reverse().find(pp=>pp[yk]!=null);
-        if (pp) {
-          const cpx = (pp.x + p.x) / 2;
-          cx.bezierCurveTo(cpx, pp[yk], cpx, y, p.x, y);
-        } else cx.lineTo(p.x, y);
-      }
-    }
     cx.strokeStyle = col; cx.lineWidth = 2;
-    cx.lineJoin='round'; cx.lineCap='round'; cx.stroke();
+    cx.lineJoin='round'; cx.lineCap='round'; cx.stroke(paths.line);
 
     // Terminus dot
     cx.beginPath();
@@ -1332,15 +1637,22 @@ function drawLine(mainId, overlayId, data, {
   if (value2Key && color2) drawSeries(pts, color2, 'y2');
 
   // Hover indicator (drawn on overlay canvas instead, see drawOverlay)
-  if (hoverIdx !== null) drawOverlay(mainId, overlayId, hoverIdx);
+  if (hoverIdx !== null && overlayId) {
+    const ov = overlayCtx(chartMeta[mainId], overlayId);
+    if (ov) drawOverlay(chartMeta[mainId], ov, hoverIdx);
+  }
 }
 
-function drawOverlay(mainId, overlayId, idx) {
-  const meta = chartMeta[mainId];
-  if (!meta || !overlayId) return;
-  const m = ctx2d(overlayId);
-  if (!m) return;
-  const {cx, w, h} = m;
+// Overlay sized with ctx2d() once per chart draw; hover frames only paint.
+function overlayCtx(meta, overlayId) {
+  if (!meta.ov) meta.ov = ctx2d(overlayId);
+  return meta.ov;
+}
+
+function drawOverlay(meta, ov, idx) {
+  if (meta.lastOverlayIdx === idx) return;   // same point: nothing changes
+  meta.lastOverlayIdx = idx;
+  const {cx, w, h} = ov;
   cx.clearRect(0, 0, w, h);
 
   const p = meta.pts[idx];
@@ -1372,43 +1684,69 @@ function drawOverlay(mainId, overlayId, idx) {
   cx.fillStyle = '#fff'; cx.fill();
 }
 
-function clearOverlay(overlayId) {
-  const c = $(overlayId);
-  if (!c) return;
-  const dpr = window.devicePixelRatio || 1;
-  c.getContext('2d').clearRect(0, 0, c.width/dpr, c.height/dpr);
+// ── Hover tooltips ────────────────────────────────────────────────────────────
+// Coalesce a high-rate event into at most one call per animation frame,
+// always with the latest event; .cancel() drops a pending frame.
+function perFrame(fn) {
+  let pending = 0, latest = null;
+  const run = () => { pending = 0; fn(latest); };
+  const h = e => { latest = e; if (!pending) pending = requestAnimationFrame(run); };
+  h.cancel = () => { if (pending) cancelAnimationFrame(pending); pending = 0; };
+  return h;
 }
 
-// ── Hover tooltips ────────────────────────────────────────────────────────────
-function attachHover(wrapEl, mainId, overlayId, getLabel) {
-  const tt = $('tt');
-  wrapEl.addEventListener('mousemove', e => {
+// `label(d, valNode, subNode)` writes the tooltip text for data point d
+// straight into the nodes. Loaders call this on every reload, so listeners are
+// installed once per wrapper and later calls only swap the formatter.
+function attachHover(wrapEl, mainId, overlayId, label) {
+  if (wrapEl._hoverLabel) { wrapEl._hoverLabel = label; return; }
+  wrapEl._hoverLabel = label;
+  // Tooltip nodes looked up once; the mousemove path touches no DOM queries
+  const tt = $('tt'), ttDate = $('tt-date'), ttVal = $('tt-val'), ttSub = $('tt-sub');
+  let shownMeta = null, shownIdx = -1;
+  const onMove = perFrame(e => {
     const meta = chartMeta[mainId];
     if (!meta) return;
+    const ov = overlayCtx(meta, overlayId);
+    if (!ov) return;
 
     const rect = wrapEl.getBoundingClientRect();
-    const mx   = e.clientX - rect.left;
-
-    // Find nearest point by x
-    let best=-1, bestD=Infinity;
-    meta.pts.forEach((p,i)=>{ if(p.y==null)return; const d=Math.abs(p.x-mx); if(d<bestD){bestD=d;best=i;}});
-    if (best < 0) return;
-
-    drawOverlay(mainId, overlayId, best);
+    const mx   = (e.clientX - rect.left) | 0;   // whole CSS pixels
+
+    // Nearest point by x — pts sit on a uniform grid, so invert it directly
+    const pts = meta.pts, n = pts.length;
+    let best = Math.round((mx - meta.pad.l) / meta.step);
+    best = Math.max(0, Math.min(n-1, best));
+    if (pts[best].y == null) {
+      // Gap: walk outward to the closest point that has a value
+      let lo = best - 1, hi = best + 1;
+      while (lo >= 0 && pts[lo].y == null) lo--;
+      while (hi < n && pts[hi].y == null) hi++;
+      if (lo < 0 && hi >= n) return;
+      best = hi >= n || (lo >= 0 && mx - pts[lo].x <= pts[hi].x - mx) ? lo : hi;
+    }
 
-    const d   = meta.data[best];
-    const {val, sub} = getLabel(d, best);
+    drawOverlay(meta, ov, best);
 
     tt.style.display = 'block';
     tt.style.left    = (e.clientX + 14) + 'px';
     tt.style.top     = (e.clientY - 48) + 'px';
-    $('tt-date').textContent = fmtDateLong(d[meta.dateKey]);
-    $('tt-val').textContent  = val;
-    $('tt-sub').textContent  = sub || '';
+    if (meta === shownMeta && best === shownIdx) return;   // same text
+    shownMeta = meta; shownIdx = best;
+    const d = meta.data[best];
+    ttDate.textContent = fmtDateLong(d[meta.dateKey]);
+    wrapEl._hoverLabel(d, ttVal, ttSub);
   });
+  wrapEl.addEventListener('mousemove', onMove);
   wrapEl.addEventListener('mouseleave', () => {
+    onMove.cancel();
     tt.style.display = 'none';
-    clearOverlay(overlayId);
+    shownMeta = null;
+    const meta = chartMeta[mainId];
+    if (meta && meta.ov) {
+      meta.ov.cx.clearRect(0, 0, meta.ov.w, meta.ov.h);
+      meta.lastOverlayIdx = -1;
+    }
   });
 }
 
@@ -1428,14 +1766,16 @@ function drawSleep(id, data) {
   cx.clearRect(0, 0, w, h);
 
   // Grid
-  [0,4,8].forEach(v=>{
-    const y=pad.t+ch-yScale(v);
-    cx.strokeStyle='rgba(255,255,255,0.04)'; cx.lineWidth=1;
-    cx.beginPath(); cx.moveTo(pad.l,y); cx.lineTo(w-pad.r,y); cx.stroke();
-    cx.fillStyle='rgba(255,255,255,0.28)'; cx.font='10px -apple-system,sans-serif';
-    cx.textAlign='right'; cx.textBaseline='middle';
-    cx.fillText(v+'h', pad.l-5, y);
-  });
+  cx.drawImage(gridLayer(`sleep:${w}x${h}:${maxH}`, w, h, g => {
+    [0,4,8].forEach(v=>{
+      const y=pad.t+ch-yScale(v);
+      g.strokeStyle='rgba(255,255,255,0.04)'; g.lineWidth=1;
+      g.beginPath(); g.moveTo(pad.l,y); g.lineTo(w-pad.r,y); g.stroke();
+      g.fillStyle='rgba(255,255,255,0.28)'; g.font='10px -apple-system,sans-serif';
+      g.textAlign='right'; g.textBaseline='middle';
+      g.fillText(v+'h', pad.l-5, y);
+    });
+  }), 0, 0, w, h);
 
   const barW = (cw - (nights.length-1)*3) / nights.length;
 
@@ -1534,16 +1874,28 @@ function drawWoHR(canvasId, data) {
   const cx = c.getContext('2d');
   cx.scale(dpr, dpr);
 
-  const vals = data.map(d => +d.value).filter(v => !isNaN(v));
-  if (vals.length < 2) return;
-  const rawMax = Math.max(...vals);
+  // Valid samples go into flat typed arrays (bpm + epoch ms), with min / max /
+  // mean gathered in the same pass — no temp arrays, no argument spreads.
+  // Timestamps are parsed once here, not on every hover frame.
+  const vs = new Float64Array(data.length), ts = new Float64Array(data.length);
+  let rawMin = Infinity, rawMax = -Infinity, sum = 0, n = 0;
+  for (let i = 0; i < data.length; i++) {
+    const v = +data[i].value;
+    if (isNaN(v)) continue;
+    if (v < rawMin) rawMin = v;
+    if (v > rawMax) rawMax = v;
+    sum += v;
+    ts[n] = data[i].time ? Date.parse(data[i].time) : NaN;
+    vs[n++] = v;
+  }
+  if (n < 2) return;
   const maxRef = Math.round(Math.max(rawMax * 1.12, rawMax + 15));
-  const mn = Math.min(Math.min(...vals) * 0.97, maxRef * 0.45);
+  const mn = Math.min(rawMin * 0.97, maxRef * 0.45);
   const mx = maxRef * 1.03;
   const rng = mx - mn || 1;
   const pad = {t:8, r:8, b:18, l:36};
   const cw = w - pad.l - pad.r, ch = h - pad.t - pad.b;
-  const avgV = Math.round(vals.reduce((s,v)=>s+v,0)/vals.length);
+  const avgV = Math.round(sum / n);
   const maxV = Math.round(rawMax);
 
   const ZONES = [
@@ -1553,14 +1905,20 @@ function drawWoHR(canvasId, data) {
     { lo:0.70, hi:0.85, color:'#ff9f0a', name:'Tempo' },
     { lo:0.85, hi:1.01, color:'#ff375f', name:'Peak' },
   ];
-  const getZone = bpm => ZONES.find(z => (bpm/maxRef) >= z.lo && (bpm/maxRef) < z.hi) || ZONES[4];
+  const invMax = 1 / maxRef;
+  function getZone(bpm) {
+    const r = bpm * invMax;
+    return r < 0.50 ? ZONES[0] : r < 0.60 ? ZONES[1] : r < 0.70 ? ZONES[2]
+         : r < 0.85 ? ZONES[3] : ZONES[4];
+  }
 
-  const pts = data.map((d, i) => ({
-    x: pad.l + (i / Math.max(data.length-1, 1)) * cw,
-    y: pad.t + ch - ((+d.value - mn) / rng) * ch,
-    v: +d.value,
-    t: d.time,
-  }));
+  // Screen coordinates as parallel arrays (SoA) on a uniform x grid
+  const xs = new Float32Array(n), ys = new Float32Array(n);
+  for (let i = 0; i < n; i++) {
+    xs[i] = pad.l + (i / (n-1)) * cw;
+    ys[i] = pad.t + ch - ((vs[i] - mn) / rng) * ch;
+  }
+  const t0Ms = ts[0], tNMs = ts[n-1];
 
   function rrect(x, y, rw, rh, r) {
     cx.beginPath();
@@ -1572,9 +1930,9 @@ function drawWoHR(canvasId, data) {
     cx.closePath();
   }
 
-  function drawBase() {
-    cx.clearRect(0, 0, w, h);
-
+  // Static layer (zones, grid, curve, labels) — painted once per data set
+  // into an offscreen bitmap; hover frames just blit it back.
+  function paintBase(cx) {
     // Zone bands
     ZONES.forEach(z => {
       const yTop = pad.t + ch - Math.min(1, Math.max(0, (z.hi * maxRef - mn) / rng)) * ch;
@@ -1594,9 +1952,8 @@ function drawWoHR(canvasId, data) {
     });
 
     // X-axis elapsed time labels
-    if (pts[0].t && pts[pts.length-1].t) {
-      const t0 = new Date(pts[0].t), tN = new Date(pts[pts.length-1].t);
-      const totalMs = tN - t0;
+    if (!isNaN(t0Ms) && !isNaN(tNMs)) {
+      const totalMs = tNMs - t0Ms;
       if (totalMs > 0) {
         cx.fillStyle = 'rgba(255,255,255,0.28)';
         cx.font = '9px -apple-system,sans-serif';
@@ -1616,21 +1973,19 @@ function drawWoHR(canvasId, data) {
     // Fill
     const grad = cx.createLinearGradient(0, pad.t, 0, pad.t+ch);
     grad.addColorStop(0, C.hr+'40'); grad.addColorStop(1, C.hr+'04');
-    cx.beginPath(); cx.moveTo(pts[0].x, pts[0].y);
-    for (let i=1; i<pts.length; i++) {
-      const cpx = (pts[i-1].x+pts[i].x)/2;
-      cx.bezierCurveTo(cpx, pts[i-1].y, cpx, pts[i].y, pts[i].x, pts[i].y);
+    const line = new Path2D();
+    line.moveTo(xs[0], ys[0]);
+    for (let i=1; i<n; i++) {
+      const cpx = (xs[i-1]+xs[i])/2;
+      line.bezierCurveTo(cpx, ys[i-1], cpx, ys[i], xs[i], ys[i]);
     }
-    cx.lineTo(pts[pts.length-1].x, pad.t+ch); cx.lineTo(pts[0].x, pad.t+ch);
-    cx.closePath(); cx.fillStyle = grad; cx.fill();
+    const fill = new Path2D(line);
+    fill.lineTo(xs[n-1], pad.t+ch); fill.lineTo(xs[0], pad.t+ch);
+    fill.closePath();
+    cx.fillStyle = grad; cx.fill(fill);
 
     // Line
-    cx.beginPath(); cx.moveTo(pts[0].x, pts[0].y);
-    for (let i=1; i<pts.length; i++) {
-      const cpx = (pts[i-1].x+pts[i].x)/2;
-      cx.bezierCurveTo(cpx, pts[i-1].y, cpx, pts[i].y, pts[i].x, pts[i].y);
-    }
-    cx.strokeStyle = C.hr; cx.lineWidth = 1.5; cx.lineJoin = 'round'; cx.stroke();
+    cx.strokeStyle = C.hr; cx.lineWidth = 1.5; cx.lineJoin = 'round'; cx.stroke(line);
 
     // Avg dashed line
     const avgY = pad.t + ch - ((avgV - mn) / rng) * ch;
@@ -1643,46 +1998,55 @@ function drawWoHR(canvasId, data) {
     cx.fillStyle = C.hr; cx.font = 'bold 9px -apple-system,sans-serif';
     cx.textAlign = 'left'; cx.textBaseline = 'bottom';
     cx.fillText(`▲ ${maxV}`, pad.l+2, maxY-1);
+  }
+
+  const base = offscreen(c.width, c.height);
+  const bcx = base.getContext('2d');
+  bcx.scale(dpr, dpr);
+  paintBase(bcx);
 
+  function drawBase() {
+    cx.clearRect(0, 0, w, h);
+    cx.drawImage(base, 0, 0, w, h);
   }
 
   function drawHover(mouseX) {
-    // Nearest point
-    const idx = pts.reduce((b, p, i) =>
-      Math.abs(p.x - mouseX) < Math.abs(pts[b].x - mouseX) ? i : b, 0);
-    const pt = pts[idx];
-    const zone = getZone(pt.v);
+    // Nearest point — samples sit on a uniform x grid, so invert it directly
+    let idx = Math.round((mouseX - pad.l) / cw * (n - 1));
+    idx = Math.max(0, Math.min(n - 1, idx));
+    const px = xs[idx], py = ys[idx], pv = vs[idx];
+    const zone = getZone(pv);
 
     // Vertical crosshair
-    cx.beginPath(); cx.moveTo(pt.x, pad.t); cx.lineTo(pt.x, pad.t+ch);
+    cx.beginPath(); cx.moveTo(px, pad.t); cx.lineTo(px, pad.t+ch);
     cx.strokeStyle = 'rgba(255,255,255,0.22)'; cx.lineWidth = 1;
     cx.setLineDash([2,3]); cx.stroke(); cx.setLineDash([]);
 
     // Horizontal crosshair
-    cx.beginPath(); cx.moveTo(pad.l, pt.y); cx.lineTo(w-pad.r, pt.y);
+    cx.beginPath(); cx.moveTo(pad.l, py); cx.lineTo(w-pad.r, py);
     cx.strokeStyle = 'rgba(255,255,255,0.1)'; cx.lineWidth = 1;
     cx.setLineDash([2,3]); cx.stroke(); cx.setLineDash([]);
 
     // Outer glow ring
-    cx.beginPath(); cx.arc(pt.x, pt.y, 6, 0, Math.PI*2);
+    cx.beginPath(); cx.arc(px, py, 6, 0, Math.PI*2);
     cx.fillStyle = zone.color+'44'; cx.fill();
     // Coloured dot
-    cx.beginPath(); cx.arc(pt.x, pt.y, 4, 0, Math.PI*2);
+    cx.beginPath(); cx.arc(px, py, 4, 0, Math.PI*2);
     cx.fillStyle = zone.color; cx.fill();
     // White centre
-    cx.beginPath(); cx.arc(pt.x, pt.y, 2, 0, Math.PI*2);
+    cx.beginPath(); cx.arc(px, py, 2, 0, Math.PI*2);
     cx.fillStyle = '#fff'; cx.fill();
 
     // Elapsed time
     let elapsed = '';
-    if (pt.t && pts[0].t) {
-      const ms = new Date(pt.t) - new Date(pts[0].t);
-      const m = Math.floor(ms/60000), s = Math.floor((ms%60000)/1000);
+    if (!isNaN(ts[idx]) && !isNaN(t0Ms)) {
+      const sec = ((ts[idx] - t0Ms) / 1000) | 0;
+      const m = (sec / 60) | 0, s = sec - m*60;
       elapsed = `+${m}:${String(s).padStart(2,'0')}`;
     }
 
     // Tooltip dimensions
-    const bpmStr = `${Math.round(pt.v)} bpm`;
+    const bpmStr = `${Math.round(pv)} bpm`;
     cx.font = 'bold 13px -apple-system,sans-serif';
     const bpmW = cx.measureText(bpmStr).width;
     cx.font = '10px -apple-system,sans-serif';
@@ -1690,11 +2054,11 @@ function drawWoHR(canvasId, data) {
     const tipW = Math.max(bpmW, subW) + 20;
     const tipH = 40;
 
-    let tx = pt.x - tipW/2;
+    let tx = px - tipW/2;
     if (tx < pad.l) tx = pad.l;
     if (tx + tipW > w - 4) tx = w - 4 - tipW;
-    let ty = pt.y - tipH - 12;
-    if (ty < pad.t) ty = pt.y + 10;
+    let ty = py - tipH - 12;
+    if (ty < pad.t) ty = py + 10;
     if (ty + tipH > h) ty = h - tipH - 2;
 
     // Bubble background
@@ -1726,18 +2090,27 @@ function drawWoHR(canvasId, data) {
   if (c._hrMove) c.removeEventListener('mousemove', c._hrMove);
   if (c._hrLeave) c.removeEventListener('mouseleave', c._hrLeave);
 
-  c._hrMove = e => {
-    const rect = c.getBoundingClientRect();
-    const mouseX = (e.clientX - rect.left) * (w / rect.width);
+  // The canvas is redrawn whenever its CSS width changes (below), so w is
+  // always its current width and offsetX maps 1:1 — no layout read per move.
+  c._hrMove = perFrame(e => {
+    const mouseX = e.offsetX;
     if (mouseX < pad.l || mouseX > w-pad.r) { drawBase(); return; }
     drawBase();
     drawHover(mouseX);
-  };
-  c._hrLeave = () => drawBase();
+  });
+  const move = c._hrMove;
+  c._hrLeave = () => { move.cancel(); drawBase(); };
 
   c.addEventListener('mousemove', c._hrMove);
   c.addEventListener('mouseleave', c._hrLeave);
   c.style.cursor = 'crosshair';
+
+  if (c._hrResize) c._hrResize.disconnect();
+  c._hrResize = new ResizeObserver(entries => {
+    const cw2 = Math.round(entries[0].contentRect.width);
+    if (cw2 && cw2 !== Math.round(w)) drawWoHR(canvasId, data);
+  });
+  c._hrResize.observe(c);
 }
 
 // ── Workout GPS map — pace-coloured canvas ────────────────────────────────────
@@ -1752,16 +2125,31 @@ function drawRouteMap(canvasId, points, elevCanvasId) {
   const ctx = c.getContext('2d');
   ctx.scale(dpr, dpr);
 
-  const lats = points.map(p => +p.lat), lons = points.map(p => +p.lon);
-  const minLat = Math.min(...lats), maxLat = Math.max(...lats);
-  const minLon = Math.min(...lons), maxLon = Math.max(...lons);
+  // Coordinates and timestamps as parallel typed arrays (SoA), with the
+  // bounding box gathered in the same pass
+  const n  = points.length;
+  const la = new Float64Array(n), lo = new Float64Array(n), tm = new Float64Array(n);
+  let minLat = Infinity, maxLat = -Infinity, minLon = Infinity, maxLon = -Infinity;
+  for (let i = 0; i < n; i++) {
+    const p = points[i];
+    const a = la[i] = +p.lat, o = lo[i] = +p.lon;
+    tm[i] = p.time ? Date.parse(p.time) : NaN;
+    if (a < minLat) minLat = a;
+    if (a > maxLat) maxLat = a;
+    if (o < minLon) minLon = o;
+    if (o > maxLon) maxLon = o;
+  }
   const latR = maxLat - minLat || 0.001, lonR = maxLon - minLon || 0.001;
   const PAD  = 22;
   const cw   = W - PAD*2, ch = H - PAD*2;
   const sc   = Math.min(cw / lonR, ch / latR);
   const ox   = (cw - lonR*sc)/2, oy = (ch - latR*sc)/2;
-  const nx   = lon => PAD + ox + (lon - minLon)*sc;
-  const ny   = lat => PAD + oy + (maxLat - lat)*sc;
+  // Screen x/y interleaved, projected once
+  const xy = new Float32Array(n*2);
+  for (let i = 0; i < n; i++) {
+    xy[2*i]   = PAD + ox + (lo[i] - minLon)*sc;
+    xy[2*i+1] = PAD + oy + (maxLat - la[i])*sc;
+  }
 
   // Background
   ctx.fillStyle = '#0b0f1a';
@@ -1782,24 +2170,34 @@ function drawRouteMap(canvasId, points, elevCanvasId) {
     const a = Math.sin(dLa/2)**2 + Math.cos(la1*Math.PI/180)*Math.cos(la2*Math.PI/180)*Math.sin(dLo/2)**2;
     return R * 2 * Math.atan2(Math.sqrt(a), Math.sqrt(1-a));
   }
-  const rawPaces = points.slice(1).map((p,i) => {
-    const dt = p.time && points[i].time ? (new Date(p.time)-new Date(points[i].time))/60000 : 0;
-    const km = haversineKm(+points[i].lat, +points[i].lon, +p.lat, +p.lon);
-    const mi = km / KM_PER_MI;
-    return (mi > 0.00006 && dt > 0 && dt < 5) ? dt/mi : null;
-  });
+  const rawPaces = new Array(n-1);
+  for (let i = 0; i < n-1; i++) {
+    const dt = (tm[i+1] - tm[i]) / 60000;   // NaN when either time is missing
+    const mi = haversineKm(la[i], lo[i], la[i+1], lo[i+1]) / KM_PER_MI;
+    rawPaces[i] = (mi > 0.00006 && dt > 0 && dt < 5) ? dt/mi : null;
+  }
   // Smooth with a 5-sample running average
   const pSmooth = rawPaces.map((_,i) => {
     const win = rawPaces.slice(Math.max(0,i-2), i+3).filter(v=>v!==null);
     return win.length ? win.reduce((a,b)=>a+b,0)/win.length : null;
   });
   const valid  = pSmooth.filter(p => p !== null && p > 2 && p < 20);
-  const pFast  = valid.length ? valid.slice().sort((a,b)=>a-b)[Math.floor(valid.length*0.05)] : 4;
-  const pSlow  = valid.length ? valid.slice().sort((a,b)=>a-b)[Math.floor(valid.length*0.95)] : 8;
-
-  function paceColor(p) {
-    if (p === null) return 'rgba(94,142,247,0.7)';
+  valid.sort((a,b)=>a-b);
+  const pFast  = valid.length ? valid[Math.floor(valid.length*0.05)] : 4;
+  const pSlow  = valid.length ? valid[Math.floor(valid.length*0.95)] : 8;
+
+  // Pace is quantised into PACE_STEPS+1 colour buckets (plus one for
+  // segments without a pace) so the route strokes once per bucket, not per
+  // segment.
+  const PACE_STEPS = 32;
+  function paceBucket(p) {
+    if (p === null) return PACE_STEPS + 1;
     const t = Math.max(0, Math.min(1, (p - pFast) / ((pSlow - pFast) || 1)));
+    return Math.round(t * PACE_STEPS);
+  }
+  function bucketColor(b) {
+    if (b > PACE_STEPS) return 'rgba(94,142,247,0.7)';
+    const t = b / PACE_STEPS;
     // fast=green → mid=yellow → slow=red
     if (t < 0.5) {
       const u = t * 2;
@@ -1809,26 +2207,26 @@ function drawRouteMap(canvasId, points, elevCanvasId) {
     return `rgb(255,${Math.round(214-214*u)},0)`;
   }
 
-  // Draw pace-coloured route
+  // Draw pace-coloured route: one Path2D per colour bucket
+  const paths = new Array(PACE_STEPS + 2);
+  for (let i = 0; i < n-1; i++) {
+    const b = paceBucket(pSmooth[i]);
+    const path = paths[b] || (paths[b] = new Path2D());
+    path.moveTo(xy[2*i],   xy[2*i+1]);
+    path.lineTo(xy[2*i+2], xy[2*i+3]);
+  }
   ctx.lineWidth = 2.5; ctx.lineCap = 'round';
-  points.slice(1).forEach((p, i) => {
-    ctx.strokeStyle = paceColor(pSmooth[i]);
-    ctx.beginPath();
-    ctx.moveTo(nx(+points[i].lon), ny(+points[i].lat));
-    ctx.lineTo(nx(+p.lon),         ny(+p.lat));
-    ctx.stroke();
-  });
+  paths.forEach((path, b) => { ctx.strokeStyle = bucketColor(b); ctx.stroke(path); });
 
   // Start marker (green glow)
-  const p0 = points[0], pe = points[points.length-1];
   ctx.shadowColor = '#30d158'; ctx.shadowBlur = 10;
   ctx.fillStyle = '#30d158';
-  ctx.beginPath(); ctx.arc(nx(+p0.lon), ny(+p0.lat), 5, 0, Math.PI*2); ctx.fill();
+  ctx.beginPath(); ctx.arc(xy[0], xy[1], 5, 0, Math.PI*2); ctx.fill();
   ctx.shadowBlur = 0;
   // End marker (red glow)
   ctx.shadowColor = '#ff375f'; ctx.shadowBlur = 10;
   ctx.fillStyle = '#ff375f';
-  ctx.beginPath(); ctx.arc(nx(+pe.lon), ny(+pe.lat), 5, 0, Math.PI*2); ctx.fill();
+  ctx.beginPath(); ctx.arc(xy[2*n-2], xy[2*n-1], 5, 0, Math.PI*2); ctx.fill();
   ctx.shadowBlur = 0;
 
   // Pace legend (bottom-left)
@@ -1861,7 +2259,11 @@ function drawElevationProfile(canvasId, points) {
   const ctx = c.getContext('2d'); ctx.scale(dpr, dpr);
   const PAD = {l:2, r:2, t:5, b:18};
   const cw  = W - PAD.l - PAD.r, ch = H - PAD.t - PAD.b;
-  const mn  = Math.min(...alts), mx = Math.max(...alts);
+  let mn = Infinity, mx = -Infinity;
+  for (let i = 0; i < alts.length; i++) {
+    if (alts[i] < mn) mn = alts[i];
+    if (alts[i] > mx) mx = alts[i];
+  }
   const rng = mx - mn || 1;
   const xOf = i => PAD.l + (i/(alts.length-1))*cw;
   const yOf = a => PAD.t + ch - ((a-mn)/rng)*ch;
@@ -1995,15 +2397,26 @@ async function loadWoDetail(el, idx) {
   const endParam = end && end !== start ? end
     : new Date(new Date(start).getTime() + 2*3600*1000).toISOString();
 
-  const hrData = await get(
-    `/api/workout-hr?start=${encodeURIComponent(start)}&end=${encodeURIComponent(endParam)}`
-  );
+  // HR, route and splits in one round trip; the route is only read for
+  // activities that can have one.
+  const ROUTE_ACTS = new Set(['running','cycling','walking','hiking','skiing','snowboarding']);
+  const withRoute  = ROUTE_ACTS.has(activity);
+  const qs = new URLSearchParams({start, end: endParam, route: withRoute ? 1 : 0});
+  const detail = await get('/api/workout/detail?' + qs) || {};
+  const hrData = detail.hr;
   const hrWrap = $(`woHrWrap${idx}`);
   if (hrData && hrData.length >= 2) {
-    drawWoHR(`woHrC${idx}`, hrData);
-    const vals = hrData.map(d => +d.value).filter(v => !isNaN(v));
-    const avgHR = Math.round(vals.reduce((s,v)=>s+v,0)/vals.length);
-    const maxHR = Math.round(Math.max(...vals));
+    whenVisible(el, () => drawWoHR(`woHrC${idx}`, hrData));
+    const vals = [];
+    let sum = 0, max = -Infinity;
+    for (let i = 0; i < hrData.length; i++) {
+      const v = +hrData[i].value;
+      if (isNaN(v)) continue;
+      vals.push(v); sum += v;
+      if (v > max) max = v;
+    }
+    const avgHR = Math.round(sum / vals.length);
+    const maxHR = Math.round(max);
     const hrStatAvg = $(`woAvgHR${idx}`);
     if (hrStatAvg) hrStatAvg.innerHTML =
       `<div class="wo-stat-val" style="color:var(--hr)">${avgHR}</div><div class="wo-stat-lbl">Avg HR (bpm)</div>`;
@@ -2015,16 +2428,11 @@ async function loadWoDetail(el, idx) {
     hrWrap.innerHTML = '<div style="font-size:11px;color:var(--muted);padding:8px 0">No HR samples in Apple Health for this workout</div>';
   }
 
-  const ROUTE_ACTS = new Set(['running','cycling','walking','hiking','skiing','snowboarding']);
-  if (ROUTE_ACTS.has(activity)) {
-    // Fetch route and splits in parallel
-    const [route, splits] = await Promise.all([
-      get(`/api/workout-route?start=${encodeURIComponent(start)}`),
-      get(`/api/workout-splits?start=${encodeURIComponent(start)}`)
-    ]);
+  if (withRoute) {
+    const route = detail.route, splits = detail.splits;
     const rtWrap = $(`woRtWrap${idx}`);
     if (route && route.length >= 2) {
-      drawRouteMap(`woRtC${idx}`, route, `woElC${idx}`);
+      whenVisible(el, () => drawRouteMap(`woRtC${idx}`, route, `woElC${idx}`));
       // Elevation gain stat
       const alts = route.map(p => +p.alt).filter(a => !isNaN(a) && a > -500 && a < 9000);
       if (alts.length >= 2) {
@@ -2044,16 +2452,49 @@ async function loadWoDetail(el, idx) {
   }
 }
 
+// Workout mini-charts are painted in idle time, and only once their row has
+// scrolled into view; rows that never become visible never render.
+const idle = window.requestIdleCallback ? fn => requestIdleCallback(fn) : fn => setTimeout(fn, 1);
+let woObserver = null;
+function whenVisible(row, paint) {
+  if (row.dataset.visible || !woObserver) idle(paint);
+  else (row._paint = row._paint || []).push(paint);
+}
+
+// One delegated listener for every workout row, installed once
+$('woList').addEventListener('click', e => {
+  const row = e.target.closest('.wo');
+  if (row) toggleWo(row, +row.dataset.idx);
+});
+
 function renderWorkouts(data) {
   const el = $('woList');
   if (!data || !data.length) { el.innerHTML='<div class="empty">No workouts in this period</div>'; return; }
 
   const ROUTE_ACTS = new Set(['running','cycling','walking','hiking','skiing','snowboarding']);
 
-  const rows = data.slice(0, 20).map((w, idx) => {
-    const key  = (w.activity||'').toLowerCase().replace(/[\s_]/g,'');
-    const icon = woIcon(key);
-    const name = woName(w.activity);
+  // Rows are cloned from <template>s and filled via textContent — no HTML
+  // string building or parsing.
+  const rowTpl  = $('woRow').content.firstElementChild;
+  const statTpl = $('woStat').content.firstElementChild;
+  const q = (root, sel) => root.querySelector(sel);
+  function stat(val, lbl, style) {
+    const n = statTpl.cloneNode(true);
+    const v = n.firstChild;
+    v.textContent = val; n.lastChild.textContent = lbl;
+    if (style) v.style.cssText = style;
+    return n;
+  }
+  function slot(id) {
+    const n = statTpl.cloneNode(false);
+    n.id = id;
+    return n;
+  }
+
+  const list = document.createElement('div');
+  list.className = 'wo-list';
+  data.slice(0, 20).forEach((w, idx) => {
+    const key  = w._k, icon = w._icon, name = w._name;
     const dur  = w.duration  ? Math.round(w.duration) + 'm'          : '';
     const cals = w.calories  ? Math.round(w.calories) + ' kcal'      : '';
     const activeCals = w.active_calories ? Math.round(w.active_calories) + ' kcal' : '';
@@ -2067,66 +2508,65 @@ function renderWorkouts(data) {
     const cadence = w.avg_cadence ? Math.round(w.avg_cadence) + ' spm' : '';
     const canRoute = ROUTE_ACTS.has(key);
 
-    const stats = [
-      dur   && `<div class="wo-stat"><div class="wo-stat-val">${dur}</div><div class="wo-stat-lbl">Duration</div></div>`,
-      dist  && `<div class="wo-stat"><div class="wo-stat-val">${dist}</div><div class="wo-stat-lbl">Distance</div></div>`,
-      pace  && `<div class="wo-stat"><div class="wo-stat-val">${pace}</div><div class="wo-stat-lbl">Avg Pace</div></div>`,
-      activeCals && `<div class="wo-stat"><div class="wo-stat-val" style="color:var(--workout)">${activeCals}</div><div class="wo-stat-lbl">Active Cal</div></div>`,
-      cals  && `<div class="wo-stat"><div class="wo-stat-val">${cals}</div><div class="wo-stat-lbl">Total Cal</div></div>`,
-      cadence && `<div class="wo-stat"><div class="wo-stat-val">${cadence}</div><div class="wo-stat-lbl">Avg Cadence</div></div>`,
-      `<div class="wo-stat" id="woAvgHR${idx}"></div>`,
-      `<div class="wo-stat" id="woMaxHR${idx}"></div>`,
-      w.source && `<div class="wo-stat"><div class="wo-stat-val" style="font-size:11px;font-weight:400">${w.source.replace('_',' ')}</div><div class="wo-stat-lbl">Source</div></div>`,
-    ].filter(Boolean).join('');
-
-    const safeStart = encodeURIComponent(w.recorded_at||'');
-    const safeEnd   = encodeURIComponent(w.end||w.recorded_at||'');
-
-    return `<div class="wo" onclick="toggleWo(this,${idx})"
-        data-start="${w.recorded_at||''}" data-end="${w.end||''}" data-activity="${key}" data-idx="${idx}">
-      <div class="wo-main">
-        <div class="wo-left">
-          <div class="wo-icon">${icon}</div>
-          <div>
-            <div class="wo-name">${name}</div>
-            <div class="wo-date">${fmtDateLong(w.date)}${w.time?' · '+w.time.slice(0,5):''}</div>
-          </div>
-        </div>
-        <div class="wo-right">
-          <div class="wo-dur">${dur}</div>
-          ${pace ? `<div class="wo-cal">${pace}</div>` : dist ? `<div class="wo-cal">${dist}</div>` : cals ? `<div class="wo-cal">${cals}</div>` : ''}
-          <span class="wo-chev">›</span>
-        </div>
-      </div>
-      <div class="wo-detail">
-        <div class="wo-detail-inner">
-          ${stats}
-          ${canRoute ? `<div class="wo-stat" id="woElev${idx}"></div>` : ''}
-        </div>
-        <div class="wo-detail-charts">
-          <div class="wo-hr-chart" id="woHrWrap${idx}">
-            <div class="wo-hr-lbl">Heart Rate Trend</div>
-            <canvas id="woHrC${idx}" height="120"></canvas>
-          </div>
-        </div>
-        <div id="woZones${idx}"></div>
-        ${canRoute ? `<div id="woSplits${idx}"></div>` : ''}
-        ${canRoute ? `<div class="wo-route-section" id="woRtWrap${idx}">
-          <div class="wo-route-lbl">GPS Route</div>
-          <canvas id="woRtC${idx}" class="wo-route-canvas"></canvas>
-          <canvas id="woElC${idx}" class="wo-elev-canvas"></canvas>
-        </div>` : ''}
-      </div>
-    </div>`;
+    const row = rowTpl.cloneNode(true);
+    row.dataset.start    = w.recorded_at || '';
+    row.dataset.end      = w.end || '';
+    row.dataset.activity = key;
+    row.dataset.idx      = idx;
+
+    q(row, '.wo-icon').textContent = icon;
+    q(row, '.wo-name').textContent = name;
+    q(row, '.wo-date').textContent = fmtDateLong(w.date) + (w.time ? ' · ' + w.time.slice(0,5) : '');
+    q(row, '.wo-dur').textContent  = dur;
+    const sub = pace || dist || cals;
+    if (sub) q(row, '.wo-cal').textContent = sub;
+    else q(row, '.wo-cal').remove();
+
+    const inner = q(row, '.wo-detail-inner');
+    if (dur)   inner.append(stat(dur, 'Duration'));
+    if (dist)  inner.append(stat(dist, 'Distance'));
+    if (pace)  inner.append(stat(pace, 'Avg Pace'));
+    if (activeCals) inner.append(stat(activeCals, 'Active Cal', 'color:var(--workout)'));
+    if (cals)  inner.append(stat(cals, 'Total Cal'));
+    if (cadence) inner.append(stat(cadence, 'Avg Cadence'));
+    inner.append(slot(`woAvgHR${idx}`), slot(`woMaxHR${idx}`));
+    if (w.source) inner.append(stat(w.source.replace('_',' '), 'Source', 'font-size:11px;font-weight:400'));
+    if (canRoute) inner.append(slot(`woElev${idx}`));
+
+    const hr = q(row, '.wo-hr-chart');
+    hr.id = `woHrWrap${idx}`;
+    q(hr, 'canvas').id = `woHrC${idx}`;
+    q(row, '[data-slot=zones]').id = `woZones${idx}`;
+    if (canRoute) {
+      q(row, '[data-slot=splits]').id = `woSplits${idx}`;
+      const rt = q(row, '.wo-route-section');
+      rt.id = `woRtWrap${idx}`;
+      q(rt, '.wo-route-canvas').id = `woRtC${idx}`;
+      q(rt, '.wo-elev-canvas').id  = `woElC${idx}`;
+    } else {
+      q(row, '[data-slot=splits]').remove();
+      q(row, '.wo-route-section').remove();
+    }
+    list.append(row);
   });
-
-  el.innerHTML = '<div class="wo-list">' + rows.join('') + '</div>';
+  el.replaceChildren(list);
+
+  if (woObserver) woObserver.disconnect();
+  woObserver = typeof IntersectionObserver === 'undefined' ? null
+    : new IntersectionObserver(entries => entries.forEach(e => {
+        if (!e.isIntersecting) return;
+        const row = e.target;
+        row.dataset.visible = '1';
+        woObserver.unobserve(row);
+        (row._paint || []).forEach(fn => idle(fn));
+        row._paint = null;
+      }));
+  if (woObserver) el.querySelectorAll('.wo').forEach(row => woObserver.observe(row));
 
   // ── Activity breakdown bars ──────────────────────────────────────────
   const counts = {};
   data.forEach(w => {
-    const name = woName(w.activity);
-    counts[name] = (counts[name] || 0) + 1;
+    counts[w._name] = (counts[w._name] || 0) + 1;
   });
   const sorted = Object.entries(counts).sort((a,b)=>b[1]-a[1]).slice(0, 5);
   const maxC = sorted[0]?.[1] || 1;
@@ -2151,9 +2591,20 @@ function renderWorkouts(data) {
 }
 
 // ── API loaders ───────────────────────────────────────────────────────────────
-async function get(path) {
-  try { const r=await fetch(path); return r.ok ? r.json() : null; }
-  catch { return null; }
+// Responses are memoised per path for a short TTL, so flipping back to a range
+// that was just loaded is served from memory. The promise itself is cached,
+// which also folds concurrent requests for the same path into one fetch.
+const GET_TTL = 60000;
+const getCache = new Map();
+function get(path) {
+  const hit = getCache.get(path), now = Date.now();
+  if (hit && now - hit.t < GET_TTL) return hit.p;
+  const p = fetch(path)
+    .then(r => r.ok ? r.json() : null)
+    .catch(() => null)
+    .then(d => { if (d == null && getCache.get(path)?.p === p) getCache.delete(path); return d; });
+  getCache.set(path, {t: now, p});
+  return p;
 }
 
 function trendBadge(pct, higherIsBetter) {
@@ -2222,7 +2673,7 @@ async function loadBloodOxygen() {
   const el = $('spo2Val'); if(el) countUp(el, a, 1);
   drawLine('spo2C','spo2O', d, {color:C.spo2, unit:'%', minY:90, maxY:100});
   const wrap = $('spo2C').parentElement;
-  attachHover(wrap,'spo2C','spo2O', d=>({val:fmt(d.value,1)+'%', sub:'Blood Oxygen'}));
+  attachHover(wrap,'spo2C','spo2O', (d,vn,sn)=>{ vn.textContent=fmt(d.value,1)+'%'; sn.textContent='Blood Oxygen'; });
 }
 
 async function loadRespiration() {
@@ -2235,7 +2686,7 @@ async function loadRespiration() {
   const el = $('respVal'); if(el) countUp(el, a, 1);
   drawLine('respC','respO', d, {color:C.resp, unit:' br/min'});
   const wrap = $('respC').parentElement;
-  attachHover(wrap,'respC','respO', d=>({val:fmt(d.value,1)+' br/min', sub:'Respiration Rate'}));
+  attachHover(wrap,'respC','respO', (d,vn,sn)=>{ vn.textContent=fmt(d.value,1)+' br/min'; sn.textContent='Respiration Rate'; });
 }
 
 async function loadVO2Max() {
@@ -2248,7 +2699,7 @@ async function loadVO2Max() {
   const el = $('vo2Val'); if(el) countUp(el, a, 1);
   drawLine('vo2C','vo2O', d, {color:C.vo2, unit:' ml/kg/min'});
   const wrap = $('vo2C').parentElement;
-  attachHover(wrap,'vo2C','vo2O', d=>({val:fmt(d.value,1)+' ml/kg/min', sub:'VO₂ Max'}));
+  attachHover(wrap,'vo2C','vo2O', (d,vn,sn)=>{ vn.textContent=fmt(d.value,1)+' ml/kg/min'; sn.textContent='VO₂ Max'; });
 }
 
 function drawHRBand(mainId, overlayId, data) {
@@ -2328,7 +2779,8 @@ function drawHRBand(mainId, overlayId, data) {
   chartMeta[mainId] = {
     data,
     pts: data.map((d,i) => ({x: xOf(i), y: d.avg != null ? yOf(d.avg) : null})),
-    valueKey: 'avg', dateKey: 'date', color, unit: 'bpm', pad, cw, ch
+    valueKey: 'avg', dateKey: 'date', color, unit: 'bpm', pad, cw, ch,
+    step: cw / Math.max(data.length-1, 1)
   };
 }
 
@@ -2342,7 +2794,7 @@ async function loadHR() {
   const el=$('hrVal'); if(el) countUp(el, a, 0);
   drawHRBand('hrC','hrO', d);
   const wrap=$('hrC').parentElement;
-  attachHover(wrap,'hrC','hrO', r=>({val:fmt(r.avg,0)+' bpm', sub:`min ${fmt(r.min,0)} / max ${fmt(r.max,0)}`}));
+  attachHover(wrap,'hrC','hrO', (r,vn,sn)=>{ vn.textContent=fmt(r.avg,0)+' bpm'; sn.textContent=`min ${fmt(r.min,0)} / max ${fmt(r.max,0)}`; });
 }
 
 async function loadHRV() {
@@ -2353,7 +2805,7 @@ async function loadHRV() {
   const el = $('hrvVal'); if(el) countUp(el, a, 0);
   drawLine('hrvC','hrvO', d, {color:C.hrv, unit:'ms', minY:0});
   const wrap = $('hrvC').parentElement;
-  attachHover(wrap,'hrvC','hrvO', d=>({val:fmt(d.value,1)+' ms', sub:d.source||''}));
+  attachHover(wrap,'hrvC','hrvO', (d,vn,sn)=>{ vn.textContent=fmt(d.value,1)+' ms'; sn.textContent=d.source||''; });
 }
 
 async function loadRHR() {
@@ -2364,7 +2816,7 @@ async function loadRHR() {
   const el = $('rhrVal'); if(el) countUp(el, a, 0);
   drawLine('rhrC','rhrO', d, {color:'#ff6b6b',unit:'bpm'});
   const wrap = $('rhrC').parentElement;
-  attachHover(wrap,'rhrC','rhrO', d=>({val:fmt(d.value,0)+' bpm',sub:'Resting HR'}));
+  attachHover(wrap,'rhrC','rhrO', (d,vn,sn)=>{ vn.textContent=fmt(d.value,0)+' bpm'; sn.textContent='Resting HR'; });
 }
 
 function attachSleepHover(data) {
@@ -2403,12 +2855,41 @@ function attachSleepHover(data) {
   const stagesCache = {};  // date → segments[] | null (pending)
   let currentIdx = -1;
 
-  function getIdx(e) {
-    const rect = canvas.getBoundingClientRect();
-    const mx = (e.clientX - rect.left) / rect.width * (canvas.width / (window.devicePixelRatio||1));
-    const cw = (canvas.width / (window.devicePixelRatio||1)) - 36 - 10;
+  // Per-night totals and stage fractions don't change while hovering
+  const NIGHT_STATS = nights.map(n => {
+    const sleepH = (n.deep||0) + (n.rem||0) + (n.light||0);
+    const totalH = sleepH + (n.awake||0) || 1;
+    return { sleepH, fracs: TOTAL_COLS.map(c => (n[c.key]||0) / totalH) };
+  });
+
+  // Overlay geometry — sized once and again on resize, not per mousemove
+  // (assigning overlay.width reallocates the backing store).
+  let geom = null;
+  function recalc() {
+    const dpr = window.devicePixelRatio || 1;
+    const W   = overlay.offsetWidth  || canvas.offsetWidth  || 600;
+    const H   = overlay.offsetHeight || canvas.offsetHeight || 150;
+    overlay.width  = W * dpr; overlay.height = H * dpr;
+    overlay.style.width = W+'px'; overlay.style.height = H+'px';
+    const ctx = overlay.getContext('2d'); ctx.setTransform(dpr, 0, 0, dpr, 0, 0);
+    const PAD  = {l:36, r:10, t:10, b:26};
+    const cw   = W - PAD.l - PAD.r, ch = H - PAD.t - PAD.b;
     const barW = (cw - (nights.length-1)*3) / nights.length;
-    return Math.floor((mx - 36) / (barW + 3));
+    geom = { W, H, ctx, PAD, ch, barW };
+  }
+
+  // Bar pitch for hit-testing, recomputed only when drawSleep resizes the
+  // bar canvas (its backing width changes), not per mousemove.
+  let pitchFor = -1, pitch = 0;
+  function getIdx(e) {
+    // Overlay is pointer-events:none, so offsetX is relative to the bar canvas,
+    // which drawSleep keeps at its CSS width — no per-move layout read.
+    if (canvas.width !== pitchFor) {
+      pitchFor = canvas.width;
+      const cw = (pitchFor / (window.devicePixelRatio||1)) - 36 - 10;
+      pitch = (cw - (nights.length-1)*3) / nights.length + 3;
+    }
+    return Math.floor((e.offsetX - 36) / pitch);
   }
 
   function rrect(ctx, x, y, rw, rh, r) {
@@ -2436,25 +2917,18 @@ function attachSleepHover(data) {
   }
 
   function draw(idx, segs) {
-    const dpr = window.devicePixelRatio || 1;
-    const W   = overlay.offsetWidth  || canvas.offsetWidth  || 600;
-    const H   = overlay.offsetHeight || canvas.offsetHeight || 150;
-    overlay.width  = W * dpr; overlay.height = H * dpr;
-    overlay.style.width = W+'px'; overlay.style.height = H+'px';
-    const ctx = overlay.getContext('2d'); ctx.scale(dpr, dpr);
+    if (!geom) recalc();
+    const { W, H, ctx, PAD, ch, barW } = geom;
     ctx.clearRect(0, 0, W, H);
     if (idx < 0 || idx >= nights.length) return;
 
     // ── Highlight hovered bar on main chart ────────────────────────────────
-    const PAD  = {l:36, r:10, t:10, b:26};
-    const cw   = W - PAD.l - PAD.r, ch = H - PAD.t - PAD.b;
-    const barW = (cw - (nights.length-1)*3) / nights.length;
     const barX = PAD.l + idx*(barW+3);
     ctx.fillStyle = 'rgba(255,255,255,0.07)';
     rrect(ctx, barX-1, PAD.t, barW+2, ch, 3); ctx.fill();
 
     const n = nights[idx];
-    const sleepH = (n.deep||0) + (n.rem||0) + (n.light||0);
+    const { sleepH, fracs } = NIGHT_STATS[idx];
 
     // ── Card geometry ──────────────────────────────────────────────────────
     const CW = 350, CH = 200;
@@ -2485,12 +2959,11 @@ function attachSleepHover(data) {
 
     if (!segs || !segs.length) {
       // Fallback: proportional stage strip (no raw segments available)
-      const totalH = sleepH + (n.awake||0) || 1;
       let sx = HP.l;
       ctx.save();
       rrect(ctx, HP.l, HP.t + HH*0.3, HW, HH*0.4, 5); ctx.clip();
-      TOTAL_COLS.forEach(c => {
-        const sw = ((n[c.key]||0) / totalH) * HW;
+      TOTAL_COLS.forEach((c, k) => {
+        const sw = fracs[k] * HW;
         if (sw < 0.5) return;
         ctx.fillStyle = c.color + 'cc';
         ctx.fillRect(sx, HP.t + HH*0.3, sw, HH*0.4); sx += sw;
@@ -2594,8 +3067,14 @@ function attachSleepHover(data) {
     }
   }
 
-  wrap.addEventListener('mousemove', onMove);
-  wrap.addEventListener('mouseleave', () => { draw(-1, null); currentIdx = -1; });
+  const onMoveFrame = perFrame(onMove);
+  wrap.addEventListener('mousemove', onMoveFrame);
+  wrap.addEventListener('mouseleave', () => { onMoveFrame.cancel(); draw(-1, null); currentIdx = -1; });
+
+  // Re-measure only when the overlay's box actually changes size
+  if (overlay._slResize) overlay._slResize.disconnect();
+  overlay._slResize = new ResizeObserver(() => { geom = null; });
+  overlay._slResize.observe(overlay);
 }
 
 async function loadSleep() {
@@ -2637,14 +3116,14 @@ async function loadRecovery() {
     const el=$('whoopVal'); if(el) countUp(el,a,0);
     drawLine('whoopC','whoopO', d.whoop, {color:C.rec, unit:'%', minY:0, maxY:100});
     const wrap=$('whoopC').parentElement;
-    attachHover(wrap,'whoopC','whoopO', r=>({val:fmt(r.value,0)+'%',sub:'Recovery'}));
+    attachHover(wrap,'whoopC','whoopO', (r,vn,sn)=>{ vn.textContent=fmt(r.value,0)+'%'; sn.textContent='Recovery'; });
   }
   if (hasOura) {
     const a = avg(d.oura.map(r=>r.value).filter(v=>v));
     const el=$('ouraVal'); if(el) countUp(el,a,0);
     drawLine('ouraC','ouraO', d.oura, {color:C.read, unit:'', minY:0, maxY:100});
     const wrap=$('ouraC').parentElement;
-    attachHover(wrap,'ouraC','ouraO', r=>({val:fmt(r.value,0),sub:'Readiness'}));
+    attachHover(wrap,'ouraC','ouraO', (r,vn,sn)=>{ vn.textContent=fmt(r.value,0); sn.textContent='Readiness'; });
   }
 
   const hasStrain = d && d.whoop_strain && d.whoop_strain.length;
@@ -2654,12 +3133,18 @@ async function loadRecovery() {
     const el=$('strainVal'); if(el) countUp(el,a,1);
     drawLine('strainC','strainO', d.whoop_strain, {color:C.strain, unit:' / 21', minY:0, maxY:21});
     const wrap=$('strainC').parentElement;
-    attachHover(wrap,'strainC','strainO', r=>({val:fmt(r.value,1),sub:'Day Strain'}));
+    attachHover(wrap,'strainC','strainO', (r,vn,sn)=>{ vn.textContent=fmt(r.value,1); sn.textContent='Day Strain'; });
   }
 }
 
 async function loadWorkouts() {
   const d = await get(`/api/workouts?days=${D.wo}`);
+  // Normalised key, icon and display name resolved once per fetch, not per render
+  if (d) for (const w of d) {
+    w._k    = (w.activity||'').toLowerCase().replace(/[\s_]/g,'');
+    w._icon = woIcon(w._k);
+    w._name = woName(w.activity);
+  }
   cache.wo = d;
   renderWorkouts(d);
 }
@@ -2679,7 +3164,7 @@ async function loadTemperature() {
     const lbl=$('tempLbl'); if(lbl) lbl.textContent='deviation °C (Oura)';
     drawLine('tempC','tempO', d.oura, {color:C.temp, unit:'°C', minY:-2, maxY:2});
     const wrap=$('tempC').parentElement;
-    attachHover(wrap,'tempC','tempO', r=>({val:(r.value>=0?'+':'')+fmt(r.value,2)+'°C',sub:'Temp deviation'}));
+    attachHover(wrap,'tempC','tempO', (r,vn,sn)=>{ vn.textContent=(r.value>=0?'+':'')+fmt(r.value,2)+'°C'; sn.textContent='Temp deviation'; });
   } else if (hasWhoop) {
     // Whoop skin temperature — absolute Celsius
     const a = avg(d.whoop.map(r=>r.value).filter(v=>v));
@@ -2687,12 +3172,15 @@ async function loadTemperature() {
     const lbl=$('tempLbl'); if(lbl) lbl.textContent='skin temp °C (Whoop)';
     drawLine('tempC','tempO', d.whoop, {color:C.temp, unit:'°C'});
     const wrap=$('tempC').parentElement;
-    attachHover(wrap,'tempC','tempO', r=>({val:fmt(r.value,1)+'°C',sub:'Skin temp'}));
+    attachHover(wrap,'tempC','tempO', (r,vn,sn)=>{ vn.textContent=fmt(r.value,1)+'°C'; sn.textContent='Skin temp'; });
   }
 }
 
 function loadAll() {
-  loadBloodOxygen(); loadHRV(); loadRHR(); loadHR(); loadRespiration(); loadVO2Max(); loadSleep(); loadRecovery(); loadWorkouts(); loadTemperature();
+  return Promise.all([
+    loadBloodOxygen(), loadHRV(), loadRHR(), loadHR(), loadRespiration(),
+    loadVO2Max(), loadSleep(), loadRecovery(), loadWorkouts(), loadTemperature(),
+  ]);
 }
 
 // ── Per-card range buttons ────────────────────────────────────────────────────
@@ -2759,27 +3247,41 @@ document.querySelectorAll('.crange:not([data-chart="global"])').forEach(group=>{
 })();
 
 // ── Resize: redraw from cache ──────────────────────────────────────────────────
-window.addEventListener('resize', ()=>{
+// Per-chart redraw from cached data, keyed by main canvas id
+const REDRAW = {
+  spo2C:   () => cache.spo2 && drawLine('spo2C','spo2O', cache.spo2, {color:C.spo2, unit:'%', minY:90, maxY:100}),
+  hrvC:    () => cache.hrv  && drawLine('hrvC','hrvO',   cache.hrv,  {color:C.hrv,  unit:'ms', minY:0}),
+  rhrC:    () => cache.rhr  && drawLine('rhrC','rhrO',   cache.rhr,  {color:C.rhr,  unit:'bpm'}),
+  hrC:     () => cache.hr?.length && drawHRBand('hrC','hrO', cache.hr),
+  respC:   () => cache.resp && drawLine('respC','respO', cache.resp, {color:C.resp, unit:' br/min'}),
+  vo2C:    () => cache.vo2  && drawLine('vo2C','vo2O',   cache.vo2,  {color:C.vo2,  unit:' ml/kg/min'}),
+  slC:     () => cache.sleep && drawSleep('slC', cache.sleep),
+  whoopC:  () => cache.rec?.whoop?.length && drawLine('whoopC','whoopO', cache.rec.whoop, {color:C.rec, unit:'%', minY:0, maxY:100}),
+  ouraC:   () => cache.rec?.oura?.length  && drawLine('ouraC','ouraO', cache.rec.oura, {color:C.read, unit:'', minY:0, maxY:100}),
+  strainC: () => cache.rec?.whoop_strain?.length && drawLine('strainC','strainO', cache.rec.whoop_strain, {color:C.strain, unit:' / 21', minY:0, maxY:21}),
+  tempC:   () => {
+    if (cache.temp?.oura?.length)       drawLine('tempC','tempO', cache.temp.oura,  {color:C.temp, unit:'°C', minY:-2, maxY:2});
+    else if (cache.temp?.whoop?.length) drawLine('tempC','tempO', cache.temp.whoop, {color:C.temp, unit:'°C'});
+  },
+};
+
+// Charts are width-driven: a ResizeObserver on each canvas reports only real
+// size changes (with the new width, no layout read), and after a short
+// debounce only the charts whose width differs from their last draw repaint.
+const _resized = new Set();
+const _chartRO = new ResizeObserver(entries => {
+  for (const e of entries) {
+    const w = Math.round(e.contentRect.width);
+    if (w && w !== lastW[e.target.id]) _resized.add(e.target.id);   // 0 = hidden card
+  }
+  if (!_resized.size) return;
   clearTimeout(window._rsz);
-  window._rsz = setTimeout(()=>{
-    if(cache.spo2)   drawLine('spo2C','spo2O',  cache.spo2, {color:C.spo2, unit:'%', minY:90, maxY:100});
-    if(cache.hrv)    drawLine('hrvC','hrvO',    cache.hrv,  {color:C.hrv,  unit:'ms', minY:0});
-    if(cache.rhr)    drawLine('rhrC','rhrO',    cache.rhr,  {color:C.rhr,  unit:'bpm'});
-    if(cache.hr?.length) drawHRBand('hrC','hrO', cache.hr);
-    if(cache.resp)   drawLine('respC','respO',  cache.resp, {color:C.resp, unit:' br/min'});
-    if(cache.vo2)    drawLine('vo2C','vo2O',    cache.vo2,  {color:C.vo2,  unit:' ml/kg/min'});
-    if(cache.sleep)  drawSleep('slC', cache.sleep);
-    if(cache.rec){
-      if(cache.rec.whoop?.length)        drawLine('whoopC','whoopO', cache.rec.whoop,        {color:C.rec,    unit:'%', minY:0, maxY:100});
-      if(cache.rec.oura?.length)         drawLine('ouraC','ouraO',   cache.rec.oura,         {color:C.read,   unit:'',  minY:0, maxY:100});
-      if(cache.rec.whoop_strain?.length) drawLine('strainC','strainO',cache.rec.whoop_strain,{color:C.strain, unit:' / 21', minY:0, maxY:21});
-    }
-    if(cache.temp){
-      if(cache.temp.oura?.length)  drawLine('tempC','tempO', cache.temp.oura,  {color:C.temp, unit:'°C', minY:-2, maxY:2});
-      else if(cache.temp.whoop?.length) drawLine('tempC','tempO', cache.temp.whoop, {color:C.temp, unit:'°C'});
-    }
+  window._rsz = setTimeout(() => {
+    _resized.forEach(id => REDRAW[id]());
+    _resized.clear();
   }, 120);
 });
+Object.keys(REDRAW).forEach(id => { const c = $(id); if (c) _chartRO.observe(c); });
 
 // ── Init ──────────────────────────────────────────────────────────────────────
 loadSummary();
@@ -2789,13 +3291,81 @@ loadAll();
 </html>
 """
 
+# The page never changes while the server runs: encode, gzip and hash it once.
+_HTML_BYTES = HTML.encode("utf-8")
+_HTML_GZ    = gzip.compress(_HTML_BYTES, compresslevel=6)
+_HTML_ETAG  = '"' + hashlib.sha256(_HTML_BYTES).hexdigest()[:32] + '"'
+
+# ── Response cache ────────────────────────────────────────────────────────────
+# Encoded JSON bodies for the read-only chart endpoints, keyed by (path, days).
+# Entries expire after a TTL and are dropped wholesale as soon as the database
+# files change on disk (leo-watch / import_data.py run in other processes).
+
+_SUMMARY_TTL = 60
+_API_TTL     = 300
+_API_CACHE_MAX = 256
+
+_api_cache: dict = {}
+_api_cache_gen = None
+_api_cache_lock = threading.Lock()
+
+
+def _db_generation():
+    """Cheap change token for the DB: (mtime, size) of the main file and its WAL."""
+    gen = []
+    for path in (DB_PATH, DB_PATH + "-wal"):
+        try:
+            st = os.stat(path)
+            gen.append((st.st_mtime_ns, st.st_size))
+        except OSError:
+            gen.append(None)
+    return tuple(gen)
+
+
+def _cached_json(key, ttl, fn):
+    """Return fn()'s JSON-encoded body, reusing a fresh cached copy if there is one."""
+    global _api_cache_gen
+    gen = _db_generation()
+    now = time.monotonic()
+    with _api_cache_lock:
+        if gen != _api_cache_gen or len(_api_cache) >= _API_CACHE_MAX:
+            _api_cache.clear()
+            _api_cache_gen = gen
+        hit = _api_cache.get(key)
+        if hit is not None and now - hit[0] < ttl:
+            return hit[1]
+    body = _encode(fn())
+    with _api_cache_lock:
+        _api_cache[key] = (now, body)
+    return body
+
+
 # ── HTTP server ───────────────────────────────────────────────────────────────
 
+_DAYS_RE = re.compile(r"\d{1,4}")
+
+
+def _parse_days(raw, default=30):
+    """Validate a ?days= value: 1–3650, else the default. No exception path."""
+    if not isinstance(raw, str) or not _DAYS_RE.fullmatch(raw):
+        return default
+    d = int(raw)
+    return d if 1 <= d <= 3650 else default
+
+
 class _Handler(http.server.BaseHTTPRequestHandler):
+    # Keep-alive: the page's parallel /api fetches reuse a few connections
+    # (and their threads) instead of a TCP handshake + thread per request.
+    # Every response sets Content-Length, which HTTP/1.1 needs for this.
+    protocol_version = "HTTP/1.1"
+    timeout          = 30          # drop idle keep-alive connections
+
     def log_message(self, *_): pass   # suppress terminal noise
 
     def _json(self, data, status=200):
-        body = json.dumps(data, default=str).encode()
+        self._json_body(_encode(data), status)
+
+    def _json_body(self, body, status=200):
         self.send_response(status)
         self.send_header("Content-Type",   "application/json")
         self.send_header("Cache-Control",  "no-store")
@@ -2804,11 +3374,23 @@ class _Handler(http.server.BaseHTTPRequestHandler):
         self.end_headers()
         self.wfile.write(body)
 
-    def _html(self, text):
-        body = text.encode()
+    def _html(self):
+        # no-cache (not no-store) so the browser keeps the page and revalidates
+        # it with If-None-Match; an unchanged page costs a bodiless 304.
+        if _HTML_ETAG in self.headers.get("If-None-Match", ""):
+            self.send_response(304)
+            self.send_header("ETag", _HTML_ETAG)
+            self.end_headers()
+            return
+        gz = "gzip" in self.headers.get("Accept-Encoding", "")
+        body = _HTML_GZ if gz else _HTML_BYTES
         self.send_response(200)
         self.send_header("Content-Type",   "text/html; charset=utf-8")
-        self.send_header("Cache-Control",  "no-store")
+        self.send_header("Cache-Control",  "no-cache")
+        self.send_header("ETag",           _HTML_ETAG)
+        self.send_header("Vary",           "Accept-Encoding")
+        if gz:
+            self.send_header("Content-Encoding", "gzip")
         self.send_header("X-Content-Type-Options", "nosniff")
         self.send_header("Content-Security-Policy", "default-src 'self'; script-src 'self' 'unsafe-inline'; style-src 'self' 'unsafe-inline'")
         self.send_header("Content-Length", len(body))
@@ -2818,37 +3400,41 @@ class _Handler(http.server.BaseHTTPRequestHandler):
     def do_GET(self):
         p = urllib.parse.urlparse(self.path)
         qs = urllib.parse.parse_qs(p.query)
-        try:
-            d = int(qs.get("days", ["30"])[0])
-            if d < 1 or d > 3650:
-                d = 30
-        except (ValueError, TypeError):
-            d = 30
+        d = _parse_days(qs.get("days", ["30"])[0])
         start = qs.get("start", [""])[0]
         end   = qs.get("end",   [""])[0]
         date  = qs.get("date",  [""])[0]
+        # Aggregated chart data — served from the response cache
+        cached = {
+            "/api/summary":       (_SUMMARY_TTL, lambda: api_summary()),
+            "/api/heart-rate":    (_API_TTL, lambda: api_heart_rate(d)),
+            "/api/resting-hr":    (_API_TTL, lambda: api_resting_hr(d)),
+            "/api/hrv":           (_API_TTL, lambda: api_hrv(d)),
+            "/api/sleep":         (_API_TTL, lambda: api_sleep(d)),
+            "/api/blood-oxygen":  (_API_TTL, lambda: api_blood_oxygen(d)),
+            "/api/respiration":   (_API_TTL, lambda: api_respiration(d)),
+            "/api/vo2-max":       (_API_TTL, lambda: api_vo2max(d)),
+            "/api/recovery":      (_API_TTL, lambda: api_recovery(d)),
+            "/api/temperature":   (_API_TTL, lambda: api_temperature(d)),
+            "/api/workouts":      (_API_TTL, lambda: api_workouts(d)),
+        }
         routes = {
-            "/api/summary":       lambda: api_summary(),
-            "/api/heart-rate":    lambda: api_heart_rate(d),
-            "/api/resting-hr":    lambda: api_resting_hr(d),
-            "/api/hrv":           lambda: api_hrv(d),
-            "/api/sleep":         lambda: api_sleep(d),
-            "/api/blood-oxygen":  lambda: api_blood_oxygen(d),
-            "/api/respiration":   lambda: api_respiration(d),
-            "/api/vo2-max":       lambda: api_vo2max(d),
-            "/api/recovery":      lambda: api_recovery(d),
-            "/api/temperature":   lambda: api_temperature(d),
-            "/api/workouts":      lambda: api_workouts(d),
             "/api/debug/sleep":   lambda: api_debug_sleep(),
             "/api/sleep-stages":  lambda: api_sleep_stages(date),
             "/api/workout-hr":    lambda: api_workout_hr(start, end),
             "/api/workout-route": lambda: api_workout_route(start),
             "/api/workout-splits": lambda: api_workout_splits(start),
+            "/api/workout/detail": lambda: api_workout_detail(
+                start, end, qs.get("route", ["1"])[0] != "0"),
         }
-        if p.path in routes:
-            self._json(routes[p.path]())
+        if p.path in cached:
+            ttl, fn = cached[p.path]
+            key = (p.path, None if p.path == "/api/summary" else d)
+            self._json_body(_cached_json(key, ttl, lambda: _in_read_txn(fn)))
+        elif p.path in routes:
+            self._json(_in_read_txn(routes[p.path]))
         elif p.path in ("/", "/index.html"):
-            self._html(HTML)
+            self._html()
         else:
             self._json({"error": "not found"}, 404)
 
@@ -2856,6 +3442,7 @@ class _Handler(http.server.BaseHTTPRequestHandler):
 class _ThreadedServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
     allow_reuse_address = True
     daemon_threads      = True
+    request_queue_size  = 64       # page load opens a burst of connections
 
 
 def start_server():
@@ -2923,6 +3510,7 @@ def main():
         return
 
     _startup_migrate()   # deduplicate sleep rows from multiple imports
+    _refresh_summary()   # roll up anything imported since the last run
 
     url = f"http://{HOST}:{PORT}"
 
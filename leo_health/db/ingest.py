@@ -4,57 +4,290 @@ Writes normalized parser output into the Leo SQLite database.
 ZERO network imports. Stdlib only.
 """
 
+import importlib
+import itertools
+import operator
+import os
+import queue
 import sqlite3
-from typing import Optional
-from .schema import create_schema, DEFAULT_DB_PATH
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Iterable, Iterator, KeysView, Optional, Sized, Union
+from .schema import bulk_ingest, create_schema, finalize_indexes, get_connection, DEFAULT_DB_PATH
 
 
 # ── Insert helpers ────────────────────────────────────────────────────────────
 
-# Allowlist of valid tables and their permitted columns
-_ALLOWED_COLUMNS: dict[str, set] = {
-    "heart_rate":     {"source","metric","value","unit","recorded_at","device"},
-    "hrv":            {"source","metric","value","unit","recorded_at","device"},
-    "sleep":          {"source","stage","start","end","recorded_at","device"},
-    "workouts":       {"source","activity","duration_minutes","distance_km",
-                       "calories","recorded_at","end","device",
-                       "active_calories","avg_cadence","avg_hr","max_hr"},
-    "whoop_recovery": {"source","recorded_at","recovery_score","hrv_ms",
-                       "resting_heart_rate","spo2","skin_temp"},
-    "whoop_strain":   {"source","recorded_at","day_strain","calories",
-                       "avg_hr","max_hr"},
-    "blood_oxygen":   {"source","value","unit","recorded_at","device"},
-    "routes":         {"workout_start","timestamp","latitude","longitude","altitude_m"},
+# Allowlist of valid tables and their permitted columns, in insert order
+_ALLOWED_COLUMNS: dict[str, tuple[str, ...]] = {
+    "heart_rate":     ("source", "metric", "value", "unit", "recorded_at", "device"),
+    "hrv":            ("source", "metric", "value", "unit", "recorded_at", "device"),
+    "sleep":          ("source", "stage", "start", "end", "recorded_at", "device",
+                       "sleep_performance_pct", "time_in_bed_hours", "light_sleep_hours",
+                       "rem_sleep_hours", "deep_sleep_hours", "awake_hours",
+                       "disturbances"),
+    "workouts":       ("source", "activity", "duration_minutes", "distance_km",
+                       "calories", "recorded_at", "end", "device",
+                       "active_calories", "avg_cadence", "avg_hr", "max_hr"),
+    "whoop_recovery": ("source", "recorded_at", "recovery_score", "hrv_ms",
+                       "resting_heart_rate", "spo2_pct", "skin_temp_celsius"),
+    "whoop_strain":   ("source", "recorded_at", "day_strain", "calories",
+                       "max_heart_rate", "avg_heart_rate"),
+    "oura_readiness": ("source", "recorded_at", "readiness_score", "hrv_balance",
+                       "resting_heart_rate", "temperature_deviation",
+                       "recovery_index", "activity_balance", "sleep_balance"),
+    "workout_routes": ("workout_start", "timestamp", "latitude", "longitude", "altitude_m"),
 }
 
-def _insert_many(conn: sqlite3.Connection, table: str, rows: list[dict]) -> int:
+
+# Rows bound per executemany call; keeps at most this many parameter tuples
+# alive at once while the caller's transaction spans the whole insert.
+_BATCH_ROWS = 10_000
+
+# The insert helpers only call execute/executemany, so they take either a
+# connection or a cursor; _insert_batches passes one cursor for all tables.
+_Executor = Union[sqlite3.Connection, sqlite3.Cursor]
+
+def _insert_many(conn: _Executor, table: str, rows: Iterable[dict]) -> int:
     """
     Bulk insert rows into a table using an allowlist for safety.
+    Rows with the same keys as the first row are streamed straight through
+    with one cached INSERT; any row shaped differently is set aside and
+    inserted afterwards, grouped by its own key set, so no column is dropped
+    and no per-row .get() is needed. Rows may be any iterable, including a
+    generator, and are bound in batches of _BATCH_ROWS.
     Returns number of rows inserted.
     """
-    if not rows:
+    it = iter(rows)
+    first = next(it, None)
+    if first is None:
         return 0
 
     allowed = _ALLOWED_COLUMNS.get(table)
     if allowed is None:
         raise ValueError(f"Unknown table: {table!r}")
 
-    # Only use keys that are in the allowlist
-    keys = [k for k in rows[0].keys() if k in allowed]
-    if not keys:
+    count = 0
+    while first is not None:
+        keys = first.keys()
+        # Only use keys that are in the allowlist
+        cols = tuple(c for c in allowed if c in keys)
+        odd: list[dict] = []
+        same = _partition(itertools.chain((first,), it), keys, odd)
+        if cols:
+            count += _insert_many_tuples(conn, table, cols, map(_getter(cols), same))
+        else:
+            for _ in same:   # nothing to insert; still route odd rows aside
+                pass
+        it = iter(odd)
+        first = next(it, None)
+    return count
+
+
+def _insert_many_tuples(conn: _Executor, table: str,
+                        cols: tuple[str, ...], rows: Iterable[tuple]) -> int:
+    """
+    Bulk insert rows that are already parameter tuples in cols order.
+    For producers that can yield tuples directly and skip building a dict
+    per row; _insert_many converts dict rows onto this path. cols are checked
+    against the same allowlist. Returns number of rows inserted.
+    """
+    allowed = _ALLOWED_COLUMNS.get(table)
+    if allowed is None:
+        raise ValueError(f"Unknown table: {table!r}")
+    unknown = [c for c in cols if c not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown columns for {table!r}: {unknown}")
+    if not cols:
         return 0
+    return _execute_batches(conn, _insert_sql(table, tuple(cols)), rows)
+
+
+# INSERT text per (table, column tuple). Reusing the identical string also
+# lets sqlite3's statement cache skip re-preparing it on later calls.
+_INSERT_SQL: dict[tuple[str, tuple[str, ...]], str] = {}
+
+
+def _insert_sql(table: str, cols: tuple[str, ...]) -> str:
+    sql = _INSERT_SQL.get((table, cols))
+    if sql is None:
+        sql = (f"INSERT OR IGNORE INTO {table} ({', '.join(cols)}) "
+               f"VALUES ({', '.join('?' * len(cols))})")
+        _INSERT_SQL[table, cols] = sql
+    return sql
+
+
+# itemgetter per column tuple — a C-level multi-key lookup per row
+_GETTERS: dict[tuple[str, ...], Callable[[dict], tuple]] = {}
+
+
+def _getter(cols: tuple[str, ...]) -> Callable[[dict], tuple]:
+    """Return a callable mapping a row to its parameter tuple in cols order."""
+    getter = _GETTERS.get(cols)
+    if getter is None:
+        if len(cols) == 1:
+            key = cols[0]
+            getter = lambda row: (row[key],)
+        else:
+            getter = operator.itemgetter(*cols)
+        _GETTERS[cols] = getter
+    return getter
+
+
+def _partition(rows: Iterable[dict], keys: KeysView, odd: list) -> Iterator[dict]:
+    """Yield rows whose keys equal keys; append every other row to odd."""
+    for row in rows:
+        if row.keys() == keys:
+            yield row
+        else:
+            odd.append(row)
+
+
+def _execute_batches(conn: _Executor, sql: str, params: Iterable[tuple]) -> int:
+    """Run sql over params in executemany batches of _BATCH_ROWS; return the row count."""
+    params = iter(params)
+    count = 0
+    while True:
+        batch = list(itertools.islice(params, _BATCH_ROWS))
+        if not batch:
+            return count
+        conn.executemany(sql, batch)
+        count += len(batch)
+
+
+def _insert_batches(conn: sqlite3.Connection, batches: dict[str, Iterable[dict]]) -> dict:
+    """
+    Insert each table's rows and return the counts per table.
+    A table about to receive more rows than it already holds (a first import,
+    say) has its secondary indexes dropped for the insert and rebuilt after;
+    small top-ups keep them, since a rebuild would cost more than it saves.
+    """
+    cur = conn.cursor()
+    try:
+        bulk = set()
+        for table, rows in batches.items():
+            if table in _ALLOWED_COLUMNS and isinstance(rows, Sized) and rows:
+                held = cur.execute(f"SELECT MAX(rowid) FROM {table}").fetchone()[0] or 0
+                if len(rows) > held:
+                    bulk.add(table)
+        with bulk_ingest(conn, bulk):
+            return {table: _insert_many(cur, table, rows) for table, rows in batches.items()}
+    finally:
+        cur.close()
+
+
+def _analyze(db_path: str) -> None:
+    """
+    Refresh query-planner statistics after an import.
+    analysis_limit caps ANALYZE to a sample per index so this stays cheap on
+    large tables. (PRAGMA optimize alone is a no-op on a fresh connection
+    before SQLite 3.46, so ANALYZE is run explicitly.)
+    """
+    conn = get_connection(db_path, for_writes=True)
+    try:
+        conn.execute("PRAGMA analysis_limit=1000")
+        conn.execute("ANALYZE")
+        conn.execute("PRAGMA optimize")
+    finally:
+        conn.close()
+
+
+# Parsed chunks a pipelined parser may hold ahead of the writer
+_PIPELINE_DEPTH = 4
+
+
+def _write_pipelined(conn: sqlite3.Connection,
+                     produce: Callable[[Callable[[str, list], None]], None]) -> dict:
+    """
+    Run produce(emit) on a parser thread and insert each (table, rows) chunk
+    it emits as soon as it arrives, so parsing overlaps the SQLite writes.
+    The bounded queue caps memory at _PIPELINE_DEPTH chunks in flight. A
+    parser error is re-raised here; a write error stops the parser.
+    Returns the counts per table.
+    """
+    chunks: queue.Queue = queue.Queue(maxsize=_PIPELINE_DEPTH)
+    stop = threading.Event()
+
+    def emit(table: str, rows: list) -> None:
+        if stop.is_set():
+            raise RuntimeError("ingest aborted")
+        chunks.put((table, rows))
+
+    def run() -> None:
+        try:
+            produce(emit)
+        except BaseException as exc:
+            chunks.put(exc)
+        else:
+            chunks.put(None)
+
+    parser = threading.Thread(target=run, name="leo-parse", daemon=True)
+    parser.start()
+    counts: dict = {}
+    cur = conn.cursor()
+    try:
+        while (item := chunks.get()) is not None:
+            if isinstance(item, BaseException):
+                raise item
+            table, rows = item
+            counts[table] = counts.get(table, 0) + _insert_many(cur, table, rows)
+    finally:
+        cur.close()
+        stop.set()
+        while parser.is_alive():   # unblock a parser waiting on a full queue
+            try:
+                chunks.get(timeout=0.1)
+            except queue.Empty:
+                pass
+    return counts
+
+
+def _write(db_path: str, fill: Callable[[sqlite3.Connection], dict]) -> dict:
+    """
+    Open the database once and run fill(conn) inside a single BEGIN IMMEDIATE
+    transaction: the write lock is taken up front and everything commits
+    together. WAL checkpoints are deferred while writing and done once after.
+    Missing secondary indexes (a new database) are built after fill.
+    Returns whatever fill returns.
+    """
+    conn = create_schema(db_path, for_writes=True)
+    try:
+        conn.execute("PRAGMA wal_autocheckpoint=10000")
+        conn.execute("BEGIN IMMEDIATE")
+        result = fill(conn)
+        finalize_indexes(conn)
+        conn.commit()
+        conn.execute("PRAGMA optimize")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    finally:
+        conn.close()
+    return result
+
+
+# Tables every device parser may fill, keyed the same in the parser output
+_COMMON_TABLES = ("heart_rate", "hrv", "sleep", "workouts")
 
-    placeholders = ", ".join("?" for _ in keys)
-    cols = ", ".join(keys)
-    sql = f"INSERT OR IGNORE INTO {table} ({cols}) VALUES ({placeholders})"
 
-    values = [tuple(row.get(k) for k in keys) for row in rows]
-    conn.executemany(sql, values)
-    return len(rows)
+def _ingest_common(conn: sqlite3.Connection, data: dict,
+                   extra: Iterable[tuple[str, str]] = (),
+                   tables: Iterable[str] = _COMMON_TABLES) -> dict:
+    """
+    Insert the given common tables (all of _COMMON_TABLES by default) from
+    parser output plus any source-specific (table, data key) pairs in extra.
+    Returns the counts per table, keyed only by the tables written.
+    """
+    batches = {table: data.get(table, []) for table in tables}
+    for table, key in extra:
+        batches[table] = data.get(key, [])
+    return _insert_batches(conn, batches)
 
 
 # ── Apple Health ingest ───────────────────────────────────────────────────────
 
+def _ingest_apple_health(conn: sqlite3.Connection, data: dict) -> dict:
+    return _ingest_common(conn, data, extra=(("workout_routes", "routes"),))
+
+
 def ingest_apple_health(data: dict, db_path: str = DEFAULT_DB_PATH) -> dict:
     """
     Write parsed Apple Health data to the database.
@@ -66,24 +299,40 @@ def ingest_apple_health(data: dict, db_path: str = DEFAULT_DB_PATH) -> dict:
     Returns:
         Dict with counts of inserted rows per table
     """
-    conn = create_schema(db_path)
-    counts = {}
+    return _write(db_path, lambda conn: _ingest_apple_health(conn, data))
 
-    try:
-        counts["heart_rate"]     = _insert_many(conn, "heart_rate",     data.get("heart_rate", []))
-        counts["hrv"]            = _insert_many(conn, "hrv",            data.get("hrv", []))
-        counts["sleep"]          = _insert_many(conn, "sleep",          data.get("sleep", []))
-        counts["workouts"]       = _insert_many(conn, "workouts",       data.get("workouts", []))
-        counts["workout_routes"] = _insert_many(conn, "workout_routes", data.get("routes", []))
-        conn.commit()
-    finally:
-        conn.close()
 
+def ingest_apple_health_zip(zip_path: str, db_path: str = DEFAULT_DB_PATH) -> dict:
+    """
+    Parse an Apple Health export.zip and write it to the database as a pipeline:
+    rows are inserted chunk by chunk while the rest of the export is parsed.
+
+    Args:
+        zip_path: Path to Apple Health export.zip
+        db_path: Path to SQLite database
+
+    Returns:
+        Dict with counts of inserted rows per table
+    """
+    from ..parsers import apple_health
+    counts = dict.fromkeys(_COMMON_TABLES + ("workout_routes",), 0)
+    counts.update(_write(db_path, lambda conn: _write_pipelined(
+        conn, lambda emit: apple_health.parse_chunks(zip_path, emit))))
     return counts
 
 
 # ── Whoop ingest ──────────────────────────────────────────────────────────────
 
+def _ingest_whoop(conn: sqlite3.Connection, data: dict) -> dict:
+    return _insert_batches(conn, {
+        "whoop_recovery": data.get("recovery", []),
+        "whoop_strain":   data.get("strain", []),
+        "hrv":            data.get("hrv", []),
+        # Whoop sleep rows need a recorded_at at minimum
+        "sleep":          (r for r in data.get("sleep", []) if r.get("recorded_at")),
+    })
+
+
 def ingest_whoop(data: dict, db_path: str = DEFAULT_DB_PATH) -> dict:
     """
     Write parsed Whoop data to the database.
@@ -95,25 +344,14 @@ def ingest_whoop(data: dict, db_path: str = DEFAULT_DB_PATH) -> dict:
     Returns:
         Dict with counts of inserted rows per table
     """
-    conn = create_schema(db_path)
-    counts = {}
+    return _write(db_path, lambda conn: _ingest_whoop(conn, data))
 
-    try:
-        counts["whoop_recovery"] = _insert_many(conn, "whoop_recovery", data.get("recovery", []))
-        counts["whoop_strain"] = _insert_many(conn, "whoop_strain", data.get("strain", []))
-        counts["hrv"] = _insert_many(conn, "hrv", data.get("hrv", []))
 
-        # Whoop sleep rows need a recorded_at at minimum
-        sleep_rows = [r for r in data.get("sleep", []) if r.get("recorded_at")]
-        counts["sleep"] = _insert_many(conn, "sleep", sleep_rows)
-        conn.commit()
-    finally:
-        conn.close()
-
-    return counts
+# ── Fitbit ingest ─────────────────────────────────────────────────────────────
 
+def _ingest_fitbit(conn: sqlite3.Connection, data: dict) -> dict:
+    return _ingest_common(conn, data)
 
-# ── Fitbit ingest ─────────────────────────────────────────────────────────────
 
 def ingest_fitbit(data: dict, db_path: str = DEFAULT_DB_PATH) -> dict:
     """
@@ -126,22 +364,16 @@ def ingest_fitbit(data: dict, db_path: str = DEFAULT_DB_PATH) -> dict:
     Returns:
         Dict with counts of inserted rows per table
     """
-    conn = create_schema(db_path)
-    counts = {}
+    return _write(db_path, lambda conn: _ingest_fitbit(conn, data))
 
-    try:
-        counts["heart_rate"] = _insert_many(conn, "heart_rate", data.get("heart_rate", []))
-        counts["hrv"] = _insert_many(conn, "hrv", data.get("hrv", []))
-        counts["sleep"] = _insert_many(conn, "sleep", data.get("sleep", []))
-        counts["workouts"] = _insert_many(conn, "workouts", data.get("workouts", []))
-        conn.commit()
-    finally:
-        conn.close()
 
-    return counts
+# ── Oura ingest ───────────────────────────────────────────────────────────────
 
+def _ingest_oura(conn: sqlite3.Connection, data: dict) -> dict:
+    # The Oura parser has no workouts
+    return _ingest_common(conn, data, extra=(("oura_readiness", "readiness"),),
+                          tables=("sleep", "heart_rate", "hrv"))
 
-# ── Oura ingest ───────────────────────────────────────────────────────────────
 
 def ingest_oura(data: dict, db_path: str = DEFAULT_DB_PATH) -> dict:
     """
@@ -154,22 +386,32 @@ def ingest_oura(data: dict, db_path: str = DEFAULT_DB_PATH) -> dict:
     Returns:
         Dict with counts of inserted rows per table
     """
-    conn = create_schema(db_path)
-    counts = {}
+    return _write(db_path, lambda conn: _ingest_oura(conn, data))
 
-    try:
-        counts["oura_readiness"] = _insert_many(conn, "oura_readiness", data.get("readiness", []))
-        counts["sleep"] = _insert_many(conn, "sleep", data.get("sleep", []))
-        counts["heart_rate"] = _insert_many(conn, "heart_rate", data.get("heart_rate", []))
-        counts["hrv"] = _insert_many(conn, "hrv", data.get("hrv", []))
-        conn.commit()
-    finally:
-        conn.close()
 
-    return counts
+# ── Combined ingest ───────────────────────────────────────────────────────────
 
+def _parse_source(module: str, func: str, path: str) -> dict:
+    """Run one parser by name. Module-level so worker processes can pickle it."""
+    parser = importlib.import_module(f"..parsers.{module}", __package__)
+    return getattr(parser, func)(path)
+
+
+def _parse_all(jobs: list) -> Iterator[tuple]:
+    """
+    Yield (job, parsed data) for each ingest_all job in completion order.
+    Parsing is CPU-bound and independent per source, so with more than one
+    job the parsers run in separate processes.
+    """
+    if len(jobs) == 1:
+        job = jobs[0]
+        yield job, _parse_source(*job[2:5])
+        return
+    with ProcessPoolExecutor(max_workers=min(len(jobs), os.cpu_count() or 1)) as pool:
+        futures = {pool.submit(_parse_source, *job[2:5]): job for job in jobs}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
 
-# ── Combined ingest ───────────────────────────────────────────────────────────
 
 def ingest_all(
     apple_health_zip: Optional[str] = None,
@@ -203,54 +445,53 @@ def ingest_all(
         ... )
         >>> print(results)
     """
-    from ..parsers import apple_health, whoop as whoop_parser, fitbit as fitbit_parser, oura as oura_parser
-
-    results = {}
-
+    # (result key, label, parser module, parser function, path, table writer);
+    # a folder takes precedence over a single CSV for the same device.
+    jobs = []
     if apple_health_zip:
-        print(f"Parsing Apple Health export: {apple_health_zip}")
-        ah_data = apple_health.parse(apple_health_zip)
-        ah_counts = ingest_apple_health(ah_data, db_path)
-        results["apple_health"] = ah_counts
-        total = sum(ah_counts.values())
-        print(f"  ✓ {total:,} records ingested")
-
+        jobs.append(("apple_health", "Apple Health export", "apple_health", "parse",
+                     apple_health_zip, _ingest_apple_health))
     if whoop_folder:
-        print(f"Parsing Whoop exports from folder: {whoop_folder}")
-        w_data = whoop_parser.parse_folder(whoop_folder)
-        w_counts = ingest_whoop(w_data, db_path)
-        results["whoop"] = w_counts
-        total = sum(w_counts.values())
-        print(f"  ✓ {total:,} records ingested")
+        jobs.append(("whoop", "Whoop exports from folder", "whoop", "parse_folder",
+                     whoop_folder, _ingest_whoop))
     elif whoop_csv:
-        print(f"Parsing Whoop CSV: {whoop_csv}")
-        w_data = whoop_parser.parse(whoop_csv)
-        w_counts = ingest_whoop(w_data, db_path)
-        results["whoop"] = w_counts
-        total = sum(w_counts.values())
-        print(f"  ✓ {total:,} records ingested")
-
+        jobs.append(("whoop", "Whoop CSV", "whoop", "parse", whoop_csv, _ingest_whoop))
     if fitbit_zip:
-        print(f"Parsing Fitbit export: {fitbit_zip}")
-        f_data = fitbit_parser.parse(fitbit_zip)
-        f_counts = ingest_fitbit(f_data, db_path)
-        results["fitbit"] = f_counts
-        total = sum(f_counts.values())
-        print(f"  ✓ {total:,} records ingested")
-
+        jobs.append(("fitbit", "Fitbit export", "fitbit", "parse", fitbit_zip, _ingest_fitbit))
     if oura_folder:
-        print(f"Parsing Oura exports from folder: {oura_folder}")
-        o_data = oura_parser.parse_folder(oura_folder)
-        o_counts = ingest_oura(o_data, db_path)
-        results["oura"] = o_counts
-        total = sum(o_counts.values())
-        print(f"  ✓ {total:,} records ingested")
+        jobs.append(("oura", "Oura exports from folder", "oura", "parse_folder",
+                     oura_folder, _ingest_oura))
     elif oura_csv:
-        print(f"Parsing Oura CSV: {oura_csv}")
-        o_data = oura_parser.parse(oura_csv)
-        o_counts = ingest_oura(o_data, db_path)
-        results["oura"] = o_counts
-        total = sum(o_counts.values())
-        print(f"  ✓ {total:,} records ingested")
-
+        jobs.append(("oura", "Oura CSV", "oura", "parse", oura_csv, _ingest_oura))
+
+    if not jobs:
+        return {}
+
+    # Every source goes through one connection and one transaction, so schema
+    # setup runs once and a multi-source import commits atomically. Sources
+    # are written as their parsers finish, overlapping the writes with the
+    # parsers still running; the first result is awaited before the write
+    # lock is taken. Progress is still reported one source at a time in
+    # argument order, as when each was parsed and written in turn.
+    _, label, _, _, path, _ = jobs[0]
+    print(f"Parsing {label}: {path}")
+    parsed = _parse_all(jobs)
+    first = next(parsed)
+
+    def write_all(conn: sqlite3.Connection) -> dict:
+        results = {}
+        reported = 0
+        for (key, *_, ingest), data in itertools.chain((first,), parsed):
+            results[key] = ingest(conn, data)
+            while reported < len(jobs) and jobs[reported][0] in results:
+                total = sum(results[jobs[reported][0]].values())
+                print(f"  ✓ {total:,} records ingested")
+                reported += 1
+                if reported < len(jobs):
+                    _, label, _, _, path, _ = jobs[reported]
+                    print(f"Parsing {label}: {path}")
+        return {key: results[key] for key, *_ in jobs}
+
+    results = _write(db_path, write_all)
+    _analyze(db_path)
     return results
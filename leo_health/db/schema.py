@@ -4,6 +4,8 @@ Creates and manages the Leo Health database.
 ZERO network imports. Stdlib only.
 """
 
+import contextlib
+import re
 import sqlite3
 import os
 from pathlib import Path
@@ -16,7 +18,33 @@ DEFAULT_DB_PATH = os.environ.get("LEO_DB_PATH", os.path.join(Path.home(), ".leo-
 
 # ── Schema SQL ────────────────────────────────────────────────────────────────
 
-SCHEMA = """
+# Per-day rollup of the summary-card metrics, maintained by the dashboard.
+# Separate statements so the dashboard can also create them inside its own
+# transaction on databases that predate them (executescript would commit).
+SUMMARY_DDL = (
+    """
+-- Each metric is stored as (sum, count) so window averages stay exact.
+CREATE TABLE IF NOT EXISTS daily_summary (
+    day             TEXT PRIMARY KEY,           -- YYYY-MM-DD prefix of the local recorded_at
+    rhr_sum         REAL, rhr_n         INTEGER,
+    hrv_sum         REAL, hrv_n         INTEGER,
+    resp_sum        REAL, resp_n        INTEGER,
+    vo2_sum         REAL, vo2_n         INTEGER,
+    spo2_apple_sum  REAL, spo2_apple_n  INTEGER,
+    spo2_whoop_sum  REAL, spo2_whoop_n  INTEGER,
+    whoop_sum       REAL, whoop_n       INTEGER,
+    oura_sum        REAL, oura_n        INTEGER,
+    strain_sum      REAL, strain_n      INTEGER
+)""",
+    """
+-- Highest source-table id folded into daily_summary (new rows = id above this)
+CREATE TABLE IF NOT EXISTS daily_summary_marks (
+    tbl             TEXT PRIMARY KEY,
+    max_id          INTEGER NOT NULL
+)""",
+)
+
+SCHEMA_TABLES = """
 -- Heart rate records (Apple Health + future sources)
 CREATE TABLE IF NOT EXISTS heart_rate (
     id              INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -70,6 +98,7 @@ CREATE TABLE IF NOT EXISTS sleep (
     deep_sleep_hours        REAL,
     awake_hours             REAL,
     disturbances            REAL,
+    duration_hours  REAL,                       -- end - start, filled by trg_sleep_duration
     created_at      TEXT DEFAULT (datetime('now'))
 );
 
@@ -141,7 +170,11 @@ CREATE TABLE IF NOT EXISTS workout_routes (
     altitude_m      REAL,
     created_at      TEXT DEFAULT (datetime('now'))
 );
+""" + "".join(f"\n{ddl};\n" for ddl in SUMMARY_DDL)
 
+# Secondary indexes. A new database gets them from finalize_indexes once its
+# first ingest has loaded the rows, not empty up front.
+SCHEMA_INDEXES = """
 -- Indexes for common query patterns
 CREATE INDEX IF NOT EXISTS idx_heart_rate_recorded_at ON heart_rate(recorded_at);
 CREATE INDEX IF NOT EXISTS idx_hrv_recorded_at ON hrv(recorded_at);
@@ -150,98 +183,206 @@ CREATE INDEX IF NOT EXISTS idx_workouts_recorded_at ON workouts(recorded_at);
 CREATE INDEX IF NOT EXISTS idx_whoop_recovery_recorded_at ON whoop_recovery(recorded_at);
 CREATE INDEX IF NOT EXISTS idx_whoop_strain_recorded_at ON whoop_strain(recorded_at);
 CREATE INDEX IF NOT EXISTS idx_oura_readiness_recorded_at ON oura_readiness(recorded_at);
+CREATE INDEX IF NOT EXISTS idx_sleep_start ON sleep(start);
 CREATE INDEX IF NOT EXISTS idx_heart_rate_source ON heart_rate(source);
 CREATE INDEX IF NOT EXISTS idx_hrv_source ON hrv(source);
 CREATE INDEX IF NOT EXISTS idx_workout_routes_start ON workout_routes(workout_start);
+
+-- Covering indexes for the dashboard's filter + aggregate patterns
+-- (metric/source equality, day range, value read from the index). Indexing
+-- date(recorded_at) lets per-day GROUP BYs walk the index in order, and the raw
+-- recorded_at column answers the exact window cut-off from the index too.
+CREATE INDEX IF NOT EXISTS idx_heart_rate_metric_day_ts ON heart_rate(metric, date(recorded_at), recorded_at, value);
+CREATE INDEX IF NOT EXISTS idx_hrv_day_source_ts_value ON hrv(date(recorded_at), source, recorded_at, value);
+CREATE INDEX IF NOT EXISTS idx_sleep_source_stage_ts ON sleep(source, stage, recorded_at);
 """
 
+SCHEMA = SCHEMA_TABLES + SCHEMA_INDEXES
+
+# Non-unique indexes from SCHEMA_INDEXES as (table, name, DDL). Unique indexes are not
+# listed: INSERT OR IGNORE needs them in place to dedupe.
+REBUILDABLE_INDEXES = tuple(
+    (m.group(2), m.group(1), m.group(0))
+    for m in re.finditer(r"^CREATE INDEX IF NOT EXISTS (\w+) ON (\w+)\(.*\);$", SCHEMA_INDEXES, re.M)
+)
+
+
+# ── Connection tuning ─────────────────────────────────────────────────────────
+
+# Applied to every file-backed connection. WAL must be set before synchronous.
+_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",          # Better concurrent read performance
+    "PRAGMA synchronous=NORMAL",        # Faster writes, still crash-safe under WAL
+    "PRAGMA temp_store=MEMORY",         # Sorts / temp indexes stay off disk
+    "PRAGMA cache_size=-65536",         # 64 MiB page cache for bulk ingest
+    "PRAGMA mmap_size=10737418240",     # Memory-map reads (capped by SQLite build)
+    "PRAGMA busy_timeout=5000",         # Wait out a dashboard/ingest lock instead of failing
+)
+
+
+def _tune(conn: sqlite3.Connection, db_path: str) -> None:
+    """Apply Leo's standard PRAGMAs. No-op for in-memory databases."""
+    if db_path.endswith(":memory:"):
+        return
+    for pragma in _PRAGMAS:
+        conn.execute(pragma)
+
 
 # ── Public API ────────────────────────────────────────────────────────────────
 
-def get_connection(db_path: str = DEFAULT_DB_PATH) -> sqlite3.Connection:
+def get_connection(db_path: str = DEFAULT_DB_PATH, *, for_writes: bool = False) -> sqlite3.Connection:
     """
     Get a SQLite connection, creating the DB and schema if needed.
 
     Args:
         db_path: Path to SQLite database file. Defaults to ~/.leo-health/leo.db
+        for_writes: Skip the sqlite3.Row factory; ingest only inserts and reads
+            back plain tuples.
 
     Returns:
         sqlite3.Connection with row_factory set for dict-like access
+        (plain tuples when for_writes is true)
     """
     db_dir = os.path.dirname(db_path)
     os.makedirs(db_dir, exist_ok=True)
     os.chmod(db_dir, 0o700)
     conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA journal_mode=WAL")   # Better concurrent read performance
-    conn.execute("PRAGMA synchronous=NORMAL") # Faster writes, still crash-safe
+    if not for_writes:
+        conn.row_factory = sqlite3.Row
+    _tune(conn, db_path)
     return conn
 
 
-def _migrate_sleep_dedup(conn: sqlite3.Connection) -> None:
+# Natural key each table is deduplicated on: INSERT OR IGNORE skips a row
+# whose key already exists. Nullable columns are COALESCEd so NULLs compare
+# equal. heart_rate/hrv keep value in the key so two distinct readings that
+# share a timestamp both survive.
+_DEDUP_KEYS = (
+    ("sleep",      "idx_sleep_unique",
+     "source, COALESCE(stage, ''), COALESCE(start, ''), COALESCE(end, ''), COALESCE(device, '')"),
+    ("heart_rate", "idx_heart_rate_unique", "source, metric, recorded_at, value, COALESCE(device, '')"),
+    ("hrv",        "idx_hrv_unique",        "source, metric, recorded_at, value, COALESCE(device, '')"),
+    ("workouts",   "idx_workouts_unique",   "source, activity, recorded_at, COALESCE(end, '')"),
+)
+
+
+def _migrate_dedup(conn: sqlite3.Connection) -> None:
     """
-    One-time idempotent migration:
-      1. Delete duplicate sleep rows, keeping the earliest id per unique segment.
-      2. Create a unique index so INSERT OR IGNORE prevents future duplicates.
+    One-time idempotent migration, for each table in _DEDUP_KEYS:
+      1. Delete duplicate rows, keeping the earliest id per natural key.
+      2. Create a unique index on the key so INSERT OR IGNORE prevents future duplicates.
+    A table whose unique index already exists is skipped, so reopening a
+    migrated database costs one sqlite_master read.
 
     Root cause: without a UNIQUE constraint, every re-import of an Apple Health
-    export creates additional copies of every sleep stage record, inflating totals
+    export creates additional copies of every record, inflating totals
     (e.g. 3 imports × 3h core = 9h displayed light sleep).
     """
-    conn.execute("""
-        DELETE FROM sleep
-        WHERE id NOT IN (
-            SELECT MIN(id)
-            FROM sleep
-            GROUP BY source,
-                     COALESCE(stage,   ''),
-                     COALESCE(start,   ''),
-                     COALESCE(end,     ''),
-                     COALESCE(device,  '')
-        )
-    """)
-    conn.execute("""
-        CREATE UNIQUE INDEX IF NOT EXISTS idx_sleep_unique
-        ON sleep (
-            source,
-            COALESCE(stage,  ''),
-            COALESCE(start,  ''),
-            COALESCE(end,    ''),
-            COALESCE(device, '')
-        )
+    have = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    for table, index, key in _DEDUP_KEYS:
+        if index in have:
+            continue
+        conn.execute(f"""
+            DELETE FROM {table}
+            WHERE id NOT IN (SELECT MIN(id) FROM {table} GROUP BY {key})
+        """)
+        conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {index} ON {table} ({key})")
+
+
+# Segment length in hours. SUBSTR(...,1,19) strips the timezone offset so
+# julianday() can parse it.
+_SLEEP_DURATION = "(julianday(SUBSTR({p}end,1,19)) - julianday(SUBSTR({p}start,1,19))) * 24"
+
+
+def _migrate_sleep_duration(conn: sqlite3.Connection) -> None:
+    """
+    Store each sleep segment's length in sleep.duration_hours instead of
+    re-parsing start/end on every dashboard query.
+      1. Add the column to databases created before it existed and backfill it.
+      2. Keep it filled on insert with a trigger, for every source and writer.
+    """
+    cols = {r[1] for r in conn.execute("PRAGMA table_info(sleep)")}
+    if "duration_hours" not in cols:
+        conn.execute("ALTER TABLE sleep ADD COLUMN duration_hours REAL")
+        conn.execute(f"""
+            UPDATE sleep SET duration_hours = {_SLEEP_DURATION.format(p="")}
+            WHERE duration_hours IS NULL AND end IS NOT NULL AND start IS NOT NULL
+              AND length(end)>=19 AND length(start)>=19
+        """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_sleep_duration AFTER INSERT ON sleep
+        WHEN NEW.duration_hours IS NULL
+         AND length(NEW.end)>=19 AND length(NEW.start)>=19
+        BEGIN
+            UPDATE sleep SET duration_hours = {_SLEEP_DURATION.format(p="NEW.")}
+            WHERE id = NEW.id;
+        END
     """)
 
 
-def create_schema(db_path: str = DEFAULT_DB_PATH) -> sqlite3.Connection:
+def create_schema(db_path: str = DEFAULT_DB_PATH, *, for_writes: bool = False) -> sqlite3.Connection:
     """
     Create the Leo Health database schema.
     Safe to call multiple times — uses CREATE IF NOT EXISTS.
+    Creates tables and the unique dedup indexes only; the secondary indexes
+    come from finalize_indexes after an ingest.
 
     Args:
         db_path: Path to SQLite database file
+        for_writes: Passed to get_connection
 
     Returns:
         Open sqlite3.Connection
     """
-    conn = get_connection(db_path)
-    conn.executescript(SCHEMA)
-    _migrate_sleep_dedup(conn)
+    conn = get_connection(db_path, for_writes=for_writes)
+    conn.executescript(SCHEMA_TABLES)
+    _migrate_dedup(conn)
+    _migrate_sleep_duration(conn)
     conn.commit()
     return conn
 
 
+def finalize_indexes(conn: sqlite3.Connection) -> None:
+    """
+    Create any secondary index from SCHEMA_INDEXES that is missing. Runs at
+    the end of each ingest so a first import loads its rows before the
+    indexes are built; on an already indexed database it is a no-op.
+    Safe inside a transaction (unlike executescript, which commits first).
+    """
+    for _, _, ddl in REBUILDABLE_INDEXES:
+        conn.execute(ddl)
+
+
+@contextlib.contextmanager
+def bulk_ingest(conn: sqlite3.Connection, tables):
+    """
+    Drop the rebuildable indexes on the given tables for the duration of a bulk
+    insert, then recreate them, so rows append to the table B-tree and each
+    index is built in one sorted pass at the end.
+    Use inside the write transaction: readers keep the indexed snapshot until
+    commit, and a rollback restores the indexes with the data.
+    """
+    dropped = [(name, ddl) for table, name, ddl in REBUILDABLE_INDEXES if table in tables]
+    for name, _ in dropped:
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+    yield
+    # Only on success: after an error the caller rolls back, which restores the
+    # indexes, and rebuilding here could mask the original exception.
+    for _, ddl in dropped:
+        conn.execute(ddl)
+
+
 def get_stats(db_path: str = DEFAULT_DB_PATH) -> dict:
     """
     Return row counts for all tables — used by the CLI status command.
     """
     conn = get_connection(db_path)
     tables = ["heart_rate", "hrv", "sleep", "workouts", "whoop_recovery", "whoop_strain", "oura_readiness"]
-    stats = {}
-    for table in tables:
-        try:
-            row = conn.execute(f"SELECT COUNT(*) as n FROM {table}").fetchone()
-            stats[table] = row["n"]
-        except sqlite3.OperationalError:
-            stats[table] = 0
+    stats = dict.fromkeys(tables, 0)
+    # One UNION ALL query over the tables that exist, not a query per table
+    present = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    sql = " UNION ALL ".join(f"SELECT '{t}', COUNT(*) FROM {t}" for t in tables if t in present)
+    if sql:
+        stats.update(conn.execute(sql).fetchall())
     conn.close()
     return stats
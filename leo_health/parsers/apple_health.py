@@ -4,13 +4,13 @@ Parses export.zip from Apple Health into normalized dicts.
 ZERO network imports. Stdlib only.
 """
 
+import io
 import re
 import xml.etree.ElementTree as ET
-import xml.sax
-import xml.sax.handler
 import zipfile
+from xml.parsers import expat
 from datetime import datetime
-from typing import Generator
+from typing import Callable, Generator, Iterator, Optional, Union
 
 
 # ── Helpers ──────────────────────────────────────────────────────────────────
@@ -19,20 +19,39 @@ def _iso(date_str: str) -> str:
     """Normalize Apple Health date strings to ISO8601."""
     if not date_str:
         return ""
-    # Apple uses: "2024-01-15 08:23:44 -0500"
+    # Apple uses: "2024-01-15 08:23:44 -0500" — fixed width, so slice it
+    # directly into the same output strptime().isoformat() would give.
+    s = date_str
+    if (len(s) == 25 and s[4] == "-" and s[7] == "-" and s[10] == " "
+            and s[13] == ":" and s[16] == ":" and s[19] == " " and s[20] in "+-"):
+        return s[:10] + "T" + s[11:19] + s[20:23] + ":" + s[23:]
+    s = s.strip()
+    # "2024-01-15 08:23:44" and "2024-01-15" parse in C. Only these fixed
+    # shapes: fromisoformat on newer Pythons also takes forms ("20240115",
+    # "2024-01-15 08:23") the strptime formats below reject.
+    if (s[4:5] == "-" and s[7:8] == "-" and (len(s) == 10 or (
+            len(s) == 19 and s[10] == " " and s[13] == ":" and s[16] == ":"))):
+        try:
+            return datetime.fromisoformat(s).isoformat()
+        except ValueError:
+            pass
     for fmt in ("%Y-%m-%d %H:%M:%S %z", "%Y-%m-%d %H:%M:%S", "%Y-%m-%d"):
         try:
-            return datetime.strptime(date_str.strip(), fmt).isoformat()
+            return datetime.strptime(s, fmt).isoformat()
         except ValueError:
             continue
-    return date_str.strip()
+    return s
+
+
+# Upper bound on memoised timestamps per parse (~40 MB at the cap)
+_ISO_CACHE_MAX = 200_000
 
 
-# ── SAX Handler ───────────────────────────────────────────────────────────────
+# ── Record handler ────────────────────────────────────────────────────────────
 
-class _HealthHandler(xml.sax.handler.ContentHandler):
+class _HealthHandler:
     """
-    Streaming SAX parser — memory efficient for 4GB+ XML files.
+    Streaming expat handler — memory efficient for 4GB+ XML files.
     Emits normalized dicts for each supported record type.
     """
 
@@ -69,12 +88,44 @@ class _HealthHandler(xml.sax.handler.ContentHandler):
         "HKWorkoutActivityTypeFunctionalStrengthTraining": "functional_strength",
     }
 
+    # Record type → (table kind, metric): one hash lookup dispatches a Record,
+    # and unsupported types (steps, energy, audio exposure, …) stop there.
+    RECORD_DISPATCH = {
+        **{t: ("heart_rate", m) for t, m in HEART_RATE_TYPES.items()},
+        **{t: ("hrv", m) for t, m in HRV_TYPES.items()},
+        **{t: ("vital", m) for t, m in VITAL_TYPES.items()},
+        "HKCategoryTypeIdentifierSleepAnalysis": ("sleep", None),
+    }
+
     def __init__(self):
-        super().__init__()
         self.heart_rate: list[dict] = []
         self.hrv: list[dict] = []
         self.sleep: list[dict] = []
         self.workouts: list[dict] = []
+        # Exports repeat timestamps heavily (samples sharing a second, sleep
+        # rows reusing startDate as recorded_at), so memoise _iso per raw string.
+        self._iso_cache: dict[str, str] = {}
+
+    def _iso(self, raw: str) -> str:
+        iso = self._iso_cache.get(raw)
+        if iso is None:
+            iso = _iso(raw)
+            if len(self._iso_cache) < _ISO_CACHE_MAX:
+                self._iso_cache[raw] = iso
+        return iso
+
+    def pending(self) -> int:
+        """Number of rows collected since the last drain."""
+        return len(self.heart_rate) + len(self.hrv) + len(self.sleep) + len(self.workouts)
+
+    def drain(self) -> list[tuple[str, list[dict]]]:
+        """Return the non-empty (table, rows) lists collected so far and start new ones."""
+        chunks = [(table, rows) for table, rows in (
+            ("heart_rate", self.heart_rate), ("hrv", self.hrv),
+            ("sleep", self.sleep), ("workouts", self.workouts),
+        ) if rows]
+        self.heart_rate, self.hrv, self.sleep, self.workouts = [], [], [], []
+        return chunks
 
     def startElement(self, name: str, attrs):
         if name == "Record":
@@ -83,34 +134,39 @@ class _HealthHandler(xml.sax.handler.ContentHandler):
             self._handle_workout(attrs)
 
     def _handle_record(self, attrs):
-        rtype = attrs.get("type", "")
+        get = attrs.get
+        dispatch = self.RECORD_DISPATCH.get(get("type"))
+        if dispatch is None:
+            return
+        kind, metric = dispatch
+        recorded_at = self._iso(get("startDate", ""))
+        device = get("sourceName", "")
 
         # Heart rate
-        if rtype in self.HEART_RATE_TYPES:
+        if kind == "heart_rate":
             self.heart_rate.append({
                 "source": "apple_health",
-                "metric": self.HEART_RATE_TYPES[rtype],
-                "value": float(attrs.get("value", 0)),
-                "unit": attrs.get("unit", "count/min"),
-                "recorded_at": _iso(attrs.get("startDate", "")),
-                "device": attrs.get("sourceName", ""),
+                "metric": metric,
+                "value": float(get("value", 0)),
+                "unit": get("unit", "count/min"),
+                "recorded_at": recorded_at,
+                "device": device,
             })
 
         # HRV
-        elif rtype in self.HRV_TYPES:
+        elif kind == "hrv":
             self.hrv.append({
                 "source": "apple_health",
-                "metric": self.HRV_TYPES[rtype],
-                "value": float(attrs.get("value", 0)),
-                "unit": attrs.get("unit", "ms"),
-                "recorded_at": _iso(attrs.get("startDate", "")),
-                "device": attrs.get("sourceName", ""),
+                "metric": metric,
+                "value": float(get("value", 0)),
+                "unit": get("unit", "ms"),
+                "recorded_at": recorded_at,
+                "device": device,
             })
 
         # Blood oxygen + respiration rate (stored in heart_rate table)
-        elif rtype in self.VITAL_TYPES:
-            raw = float(attrs.get("value", 0))
-            metric = self.VITAL_TYPES[rtype]
+        elif kind == "vital":
+            raw = float(get("value", 0))
             # Apple exports SpO2 as a fraction (0.0–1.0) with unit "%"; convert to pct
             if metric == "blood_oxygen_spo2" and raw <= 1.0:
                 raw = round(raw * 100, 2)
@@ -118,30 +174,31 @@ class _HealthHandler(xml.sax.handler.ContentHandler):
                 "source": "apple_health",
                 "metric": metric,
                 "value": raw,
-                "unit": attrs.get("unit", ""),
-                "recorded_at": _iso(attrs.get("startDate", "")),
-                "device": attrs.get("sourceName", ""),
+                "unit": get("unit", ""),
+                "recorded_at": recorded_at,
+                "device": device,
             })
 
         # Sleep
-        elif rtype == "HKCategoryTypeIdentifierSleepAnalysis":
-            stage_raw = attrs.get("value", "")
+        else:
+            stage_raw = get("value", "")
             stage = self.SLEEP_VALUES.get(stage_raw, stage_raw.replace("HKCategoryValueSleepAnalysis", "").lower())
             self.sleep.append({
                 "source": "apple_health",
                 "stage": stage,
-                "start": _iso(attrs.get("startDate", "")),
-                "end": _iso(attrs.get("endDate", "")),
-                "recorded_at": _iso(attrs.get("startDate", "")),
-                "device": attrs.get("sourceName", ""),
+                "start": recorded_at,
+                "end": self._iso(get("endDate", "")),
+                "recorded_at": recorded_at,
+                "device": device,
             })
 
     def _handle_workout(self, attrs):
-        activity_raw = attrs.get("workoutActivityType", "")
+        get = attrs.get
+        activity_raw = get("workoutActivityType", "")
         activity = self.WORKOUT_TYPES.get(activity_raw, activity_raw.replace("HKWorkoutActivityType", "").lower())
-        duration_raw = attrs.get("duration")
-        distance_raw = attrs.get("totalDistance")
-        energy_raw = attrs.get("totalEnergyBurned")
+        duration_raw = get("duration")
+        distance_raw = get("totalDistance")
+        energy_raw = get("totalEnergyBurned")
 
         self.workouts.append({
             "source": "apple_health",
@@ -149,9 +206,9 @@ class _HealthHandler(xml.sax.handler.ContentHandler):
             "duration_minutes": round(float(duration_raw), 2) if duration_raw else None,
             "distance_km": round(float(distance_raw) * 1.60934, 3) if distance_raw else None,
             "calories": round(float(energy_raw), 1) if energy_raw else None,
-            "recorded_at": _iso(attrs.get("startDate", "")),
-            "end": _iso(attrs.get("endDate", "")),
-            "device": attrs.get("sourceName", ""),
+            "recorded_at": self._iso(get("startDate", "")),
+            "end": self._iso(get("endDate", "")),
+            "device": get("sourceName", ""),
         })
 
 
@@ -160,29 +217,136 @@ class _HealthHandler(xml.sax.handler.ContentHandler):
 _GPX_NS = {"gpx": "http://www.topografix.com/GPX/1/1"}
 
 
+_GPX_TRKPT = "{%s}trkpt" % _GPX_NS["gpx"]
+_GPX_ELE   = "{%s}ele" % _GPX_NS["gpx"]
+_GPX_TIME  = "{%s}time" % _GPX_NS["gpx"]
+
+
+# Byte-level scanner for the <trkpt> shape Apple writes, e.g.
+#   <trkpt lon="-122.4" lat="37.7"><ele>12.3</ele><time>…</time>…</trkpt>
+# Only lat/lon attributes, then optional <ele> and <time>, then other plain
+# children and one flat <extensions>. Anything else doesn't match, so the
+# count check in _parse_gpx_fast hands the file to the tree parser.
+_TRKPT_RE = re.compile(
+    rb"""<trkpt\s+(lat|lon)\s*=\s*(["'])([^"'<]*)\2"""
+    rb"""\s+(?!\1)(?:lat|lon)\s*=\s*(["'])([^"'<]*)\4\s*"""
+    rb"(?:/>|>"
+    rb"(?:\s*<ele>([^<]*)</ele>)?(?:\s*<time>([^<]*)</time>)?"
+    rb"(?:\s*<(?!ele>|time>)(\w+)>[^<]*</\8>)*"
+    rb"\s*(?:<extensions>(?:\s*<(\w+)>[^<]*</\9>)*\s*</extensions>\s*)?"
+    rb"</trkpt>)")
+_XML_ENCODING_RE = re.compile(rb"""<\?xml[^>]*\bencoding\s*=\s*["']([^"']*)""")
+_GPX_ROOT = "{%s}gpx" % _GPX_NS["gpx"]
+
+
 def _parse_gpx(content: bytes, workout_start: str) -> list[dict]:
-    """Parse a single GPX file and return a list of route point dicts."""
-    try:
-        root = ET.fromstring(content)
-    except ET.ParseError:
-        return []
+    """
+    Parse a single GPX file and return a list of route point dicts.
+    Tries the regex scanner first and falls back to ElementTree whenever the
+    scan can't vouch for its result (other namespaces or encodings, entities,
+    comments, unusual trkpt markup, truncated or malformed files).
+    """
+    points = _parse_gpx_fast(content, workout_start)
+    return _parse_gpx_tree(content, workout_start) if points is None else points
+
+
+def _parse_gpx_fast(content: bytes, workout_start: str) -> Optional[list[dict]]:
+    """
+    Scan <trkpt> elements straight out of the bytes, with no per-point XML events.
+    Returns None when the result might differ from _parse_gpx_tree's.
+
+    Each trkpt must match the plain shape above; the rest of the document, with
+    every trkpt replaced by an empty placeholder, goes through ElementTree to
+    check well-formedness and that each placeholder is a GPX 1.1 trkpt.
+    """
+    if not content[-64:].rstrip().endswith(b"</gpx>"):
+        return None
+    if b"&" in content or b"<!" in content:  # entities, comments, CDATA, DOCTYPE
+        return None
+    decl = _XML_ENCODING_RE.search(content, 0, 256)
+    if decl and decl.group(1).lower() not in (b"utf-8", b"utf8"):
+        return None
 
     points = []
-    for trkpt in root.findall(".//gpx:trkpt", _GPX_NS):
+    skeleton = []
+    pos = 0
+    for m in _TRKPT_RE.finditer(content):
+        skeleton += (content[pos:m.start()], b"<trkpt/>")
+        pos = m.end()
+        first_name, first, second, ele, time = m.group(1, 3, 5, 6, 7)
         try:
-            lat = float(trkpt.get("lat", 0))
-            lon = float(trkpt.get("lon", 0))
-        except (TypeError, ValueError):
+            first, second = float(first), float(second)
+        except ValueError:
             continue
-        ele_el  = trkpt.find("gpx:ele",  _GPX_NS)
-        time_el = trkpt.find("gpx:time", _GPX_NS)
+        lat, lon = (first, second) if first_name == b"lat" else (second, first)
+        altitude = _gpx_float(ele)
+        try:
+            timestamp = time.strip().decode() if time is not None else workout_start
+        except UnicodeDecodeError:
+            return None
         points.append({
             "workout_start": workout_start,
-            "timestamp":     time_el.text.strip() if time_el is not None else workout_start,
+            "timestamp":     timestamp,
             "latitude":      lat,
             "longitude":     lon,
-            "altitude_m":    float(ele_el.text) if ele_el is not None else None,
+            "altitude_m":    altitude,
         })
+    matches = len(skeleton) // 2
+    if not matches or matches != content.count(b"<trkpt"):
+        return None
+
+    skeleton.append(content[pos:])
+    try:
+        root = ET.fromstring(b"".join(skeleton))
+    except ET.ParseError:
+        return None
+    if root.tag != _GPX_ROOT or sum(1 for _ in root.iter(_GPX_TRKPT)) != matches:
+        return None
+    return points
+
+
+def _gpx_float(text: Union[str, bytes, None]) -> Optional[float]:
+    """Float value of an element's text, or None when it is empty or not a number."""
+    try:
+        return float(text) if text else None
+    except ValueError:
+        return None
+
+
+def _parse_gpx_tree(content: bytes, workout_start: str) -> list[dict]:
+    """
+    ElementTree fallback for _parse_gpx.
+    Streams <trkpt> elements with iterparse and clears each one once read,
+    rather than building the whole document tree.
+    """
+    # Fast reject: empty blobs and anything that can't be XML never hit the parser
+    head = content[:64].lstrip(b"\xef\xbb\xbf \t\r\n")
+    if not head.startswith(b"<"):
+        return []
+
+    points = []
+    try:
+        for _, trkpt in ET.iterparse(io.BytesIO(content), events=("end",)):
+            if trkpt.tag != _GPX_TRKPT:
+                continue
+            try:
+                lat = float(trkpt.get("lat", 0))
+                lon = float(trkpt.get("lon", 0))
+            except (TypeError, ValueError):
+                trkpt.clear()
+                continue
+            ele_el  = trkpt.find(_GPX_ELE)
+            time_el = trkpt.find(_GPX_TIME)
+            points.append({
+                "workout_start": workout_start,
+                "timestamp":     (time_el.text or "").strip() if time_el is not None else workout_start,
+                "latitude":      lat,
+                "longitude":     lon,
+                "altitude_m":    _gpx_float(ele_el.text) if ele_el is not None else None,
+            })
+            trkpt.clear()
+    except ET.ParseError:
+        return []
     return points
 
 
@@ -198,6 +362,62 @@ def _gpx_workout_start(gpx_path: str) -> str:
     return ""
 
 
+def _export_entries(zf: zipfile.ZipFile) -> tuple[zipfile.ZipInfo, list[zipfile.ZipInfo]]:
+    """
+    Find export.xml and the workout-route GPX files in one pass over the
+    central directory. Opening by ZipInfo skips a name lookup per entry.
+    """
+    xml_info = None
+    gpx_infos = []
+    for info in zf.infolist():
+        name = info.filename
+        if name.endswith(".gpx"):
+            gpx_infos.append(info)
+        elif xml_info is None and name.endswith("export.xml"):
+            xml_info = info
+    if xml_info is None:
+        raise FileNotFoundError("No export.xml found in zip. Is this an Apple Health export?")
+    return xml_info, gpx_infos
+
+
+def _iter_routes(zf: zipfile.ZipFile, gpx_infos: list[zipfile.ZipInfo]) -> Iterator[list[dict]]:
+    """Yield the route points of each non-empty GPX entry."""
+    for info in gpx_infos:
+        with zf.open(info) as gpx_file:
+            data = gpx_file.read()
+        if data:
+            points = _parse_gpx(data, _gpx_workout_start(info.filename))
+            if points:
+                yield points
+
+
+# export.xml is fed to expat in blocks of this many bytes
+_READ_BYTES = 1 << 20
+
+
+def _feed_export(xml_file, handler: _HealthHandler,
+                 flush: Optional[Callable[[], None]] = None, flush_every: int = 10_000) -> None:
+    """
+    Stream export.xml into handler with a bare expat parser.
+
+    expat calls handler.startElement with each element's attributes as a
+    plain dict, so no tree nodes are built and memory stays flat on
+    multi-GB exports. If flush is given it is called between input blocks
+    once flush_every rows are pending, so the caller can hand them off.
+    """
+    parser = expat.ParserCreate()
+    parser.StartElementHandler = handler.startElement
+    read = xml_file.read
+    while True:
+        block = read(_READ_BYTES)
+        if not block:
+            break
+        parser.Parse(block, False)
+        if flush is not None and handler.pending() >= flush_every:
+            flush()
+    parser.Parse(b"", True)
+
+
 # ── Public API ────────────────────────────────────────────────────────────────
 
 def parse(zip_path: str) -> dict:
@@ -220,22 +440,13 @@ def parse(zip_path: str) -> dict:
     routes = []
     with zipfile.ZipFile(zip_path, "r") as zf:
         # Apple Health zip contains apple_health_export/export.xml
-        xml_candidates = [n for n in zf.namelist() if n.endswith("export.xml")]
-        if not xml_candidates:
-            raise FileNotFoundError("No export.xml found in zip. Is this an Apple Health export?")
-
-        xml_path = xml_candidates[0]
-        with zf.open(xml_path) as xml_file:
-            xml.sax.parse(xml_file, handler)
+        xml_info, gpx_infos = _export_entries(zf)
+        with zf.open(xml_info) as xml_file:
+            _feed_export(xml_file, handler)
 
         # Parse GPS workout routes (workout-routes/*.gpx inside the ZIP)
-        gpx_files = [n for n in zf.namelist() if n.endswith(".gpx")]
-        for gpx_path in gpx_files:
-            workout_start = _gpx_workout_start(gpx_path)
-            with zf.open(gpx_path) as gpx_file:
-                data = gpx_file.read()
-                if data:
-                    routes.extend(_parse_gpx(data, workout_start))
+        for points in _iter_routes(zf, gpx_infos):
+            routes.extend(points)
 
     return {
         "heart_rate": handler.heart_rate,
@@ -246,6 +457,30 @@ def parse(zip_path: str) -> dict:
     }
 
 
+def parse_chunks(zip_path: str, emit: Callable[[str, list[dict]], None],
+                 chunk_rows: int = 10_000) -> None:
+    """
+    Chunked variant — calls emit(table_name, rows) with roughly chunk_rows
+    rows at a time while parsing, instead of returning everything at the end.
+    Table names are DB tables, so GPS points arrive as 'workout_routes'.
+    Lets a caller write each chunk while the rest of the export is parsed.
+    """
+    handler = _HealthHandler()
+
+    def flush():
+        for table, rows in handler.drain():
+            emit(table, rows)
+
+    with zipfile.ZipFile(zip_path, "r") as zf:
+        xml_info, gpx_infos = _export_entries(zf)
+        with zf.open(xml_info) as xml_file:
+            _feed_export(xml_file, handler, flush, chunk_rows)
+        flush()
+
+        for points in _iter_routes(zf, gpx_infos):
+            emit("workout_routes", points)
+
+
 def parse_stream(zip_path: str) -> Generator[tuple[str, dict], None, None]:
     """
     Streaming variant — yields (table_name, record) tuples.
@@ -254,12 +489,9 @@ def parse_stream(zip_path: str) -> Generator[tuple[str, dict], None, None]:
     handler = _HealthHandler()
 
     with zipfile.ZipFile(zip_path, "r") as zf:
-        xml_candidates = [n for n in zf.namelist() if n.endswith("export.xml")]
-        if not xml_candidates:
-            raise FileNotFoundError("No export.xml found in zip.")
-
-        with zf.open(xml_candidates[0]) as xml_file:
-            xml.sax.parse(xml_file, handler)
+        xml_info, _ = _export_entries(zf)
+        with zf.open(xml_info) as xml_file:
+            _feed_export(xml_file, handler)
 
     for record in handler.heart_rate:
         yield ("heart_rate", record)
@@ -22,7 +22,7 @@ import zipfile
 import json
 import re
 from datetime import datetime
-from typing import Optional
+from typing import Callable, Optional
 
 
 # ── Helpers ───────────────────────────────────────────────────────────────────
@@ -32,16 +32,49 @@ def _iso(date_str: str) -> str:
     if not date_str:
         return ""
     # Fitbit uses: "2024-01-15T07:11:00.000", "2024-01-15T23:30:30.000", "2024-01-15"
+    # — parsed in C when the string has exactly one of those shapes, since
+    # fromisoformat on newer Pythons also takes forms ("20240115") the
+    # strptime formats below reject.
+    s = date_str.strip()
+    if (s[4:5] == "-" and s[7:8] == "-" and (len(s) == 10 or (
+            len(s) in (19, 23, 26) and s[10] == "T" and s[13] == ":" and s[16] == ":"
+            and (len(s) == 19 or s[19] == ".")))):
+        try:
+            return datetime.fromisoformat(s).isoformat()
+        except ValueError:
+            pass
     for fmt in (
         "%Y-%m-%dT%H:%M:%S.%f",
         "%Y-%m-%dT%H:%M:%S",
         "%Y-%m-%d",
     ):
         try:
-            return datetime.strptime(date_str.strip(), fmt).isoformat()
+            return datetime.strptime(s, fmt).isoformat()
         except ValueError:
             continue
-    return date_str.strip()
+    return s
+
+
+# Upper bound on memoised timestamps per parse (~40 MB at the cap)
+_ISO_CACHE_MAX = 200_000
+
+
+def _memo_iso() -> Callable[[str], str]:
+    """
+    _iso memoised per raw string for one parse() call. Sleep and exercise
+    files repeat the same day strings; the cache is dropped with the parse.
+    """
+    cache: dict[str, str] = {}
+
+    def iso(raw: str) -> str:
+        value = cache.get(raw)
+        if value is None:
+            value = _iso(raw)
+            if len(cache) < _ISO_CACHE_MAX:
+                cache[raw] = value
+        return value
+
+    return iso
 
 
 # ── File classification ────────────────────────────────────────────────────────
@@ -69,7 +102,7 @@ def _classify_file(name: str) -> str:
 
 # ── Row parsers ───────────────────────────────────────────────────────────────
 
-def _parse_heart_file(data: list) -> list[dict]:
+def _parse_heart_file(data: list, iso: Callable[[str], str] = _iso) -> list[dict]:
     """
     Parse activities-heart-YYYY-MM-DD.json for resting heart rate.
 
@@ -88,13 +121,13 @@ def _parse_heart_file(data: list) -> list[dict]:
                 "metric": "resting_heart_rate",
                 "value": float(rhr),
                 "unit": "count/min",
-                "recorded_at": _iso(date),
+                "recorded_at": iso(date),
                 "device": "fitbit",
             })
     return records
 
 
-def _parse_hrv_file(data: list) -> list[dict]:
+def _parse_hrv_file(data: list, iso: Callable[[str], str] = _iso) -> list[dict]:
     """
     Parse hrv-YYYY-MM-DD.json for daily HRV (RMSSD).
 
@@ -118,13 +151,13 @@ def _parse_hrv_file(data: list) -> list[dict]:
                     "metric": "hrv_rmssd",
                     "value": round(float(rmssd), 2),
                     "unit": "ms",
-                    "recorded_at": _iso(date),
+                    "recorded_at": iso(date),
                     "device": "fitbit",
                 })
     return records
 
 
-def _parse_sleep_file(data: list) -> list[dict]:
+def _parse_sleep_file(data: list, iso: Callable[[str], str] = _iso) -> list[dict]:
     """
     Parse sleep-YYYY-MM-DD.json for sleep sessions.
 
@@ -137,8 +170,8 @@ def _parse_sleep_file(data: list) -> list[dict]:
         if not date:
             continue
 
-        start = _iso(session.get("startTime", ""))
-        end = _iso(session.get("endTime", ""))
+        start = iso(session.get("startTime", ""))
+        end = iso(session.get("endTime", ""))
         time_in_bed = session.get("timeInBed")     # minutes
         efficiency = session.get("efficiency")       # 0-100 %
         minutes_asleep = session.get("minutesAsleep")
@@ -159,7 +192,7 @@ def _parse_sleep_file(data: list) -> list[dict]:
             "stage": "asleep",
             "start": start,
             "end": end,
-            "recorded_at": _iso(date),
+            "recorded_at": iso(date),
             "device": "fitbit",
             "sleep_performance_pct": float(efficiency) if efficiency is not None else None,
             "time_in_bed_hours": round(float(time_in_bed) / 60, 3) if time_in_bed else None,
@@ -203,7 +236,7 @@ def _normalize_activity(name: str) -> str:
     return lower.replace(" ", "_")
 
 
-def _parse_exercise_file(data: list) -> list[dict]:
+def _parse_exercise_file(data: list, iso: Callable[[str], str] = _iso) -> list[dict]:
     """
     Parse exercise-YYYY-MM-DD.json for workout sessions.
 
@@ -240,8 +273,8 @@ def _parse_exercise_file(data: list) -> list[dict]:
             "duration_minutes": duration_min,
             "distance_km": distance_km,
             "calories": round(float(calories), 1) if calories else None,
-            "recorded_at": _iso(start),
-            "end": _iso(session.get("endTime", "")),
+            "recorded_at": iso(start),
+            "end": iso(session.get("endTime", "")),
             "device": "fitbit",
         })
     return records
@@ -271,6 +304,7 @@ def parse(zip_path: str) -> dict:
         "workouts": [],
     }
 
+    iso = _memo_iso()
     with zipfile.ZipFile(zip_path, "r") as zf:
         for name in zf.namelist():
             file_type = _classify_file(name)
@@ -287,12 +321,12 @@ def parse(zip_path: str) -> dict:
                 continue
 
             if file_type == "heart":
-                result["heart_rate"].extend(_parse_heart_file(data))
+                result["heart_rate"].extend(_parse_heart_file(data, iso))
             elif file_type == "hrv":
-                result["hrv"].extend(_parse_hrv_file(data))
+                result["hrv"].extend(_parse_hrv_file(data, iso))
             elif file_type == "sleep":
-                result["sleep"].extend(_parse_sleep_file(data))
+                result["sleep"].extend(_parse_sleep_file(data, iso))
             elif file_type == "exercise":
-                result["workouts"].extend(_parse_exercise_file(data))
+                result["workouts"].extend(_parse_exercise_file(data, iso))
 
     return result
@@ -11,15 +11,17 @@ ZERO network imports. Stdlib only.
 """
 
 import os
+import functools
 import time
 import hashlib
+import mmap
 import argparse
 import subprocess
 from pathlib import Path
 from datetime import datetime
 
-from .db.ingest import ingest_apple_health, ingest_whoop, ingest_fitbit, ingest_oura
-from .parsers import apple_health, whoop as whoop_parser, fitbit as fitbit_parser, oura as oura_parser
+from .db.ingest import ingest_apple_health_zip, ingest_whoop, ingest_fitbit, ingest_oura
+from .parsers import whoop as whoop_parser, fitbit as fitbit_parser, oura as oura_parser
 
 
 # ── Config ────────────────────────────────────────────────────────────────────
@@ -48,12 +50,28 @@ def _notify(title: str, message: str):
 # ── File fingerprinting ───────────────────────────────────────────────────────
 
 def _file_hash(filepath: str) -> str:
-    """SHA-256 of full file — reliable deduplication."""
-    h = hashlib.sha256()
+    """
+    SHA-256 of full file — reliable deduplication.
+    Memoized on (path, mtime, size) so rescans of unchanged files are a stat().
+    """
+    st = os.stat(filepath)
+    return _hash_stat(filepath, st.st_mtime_ns, st.st_size)
+
+
+@functools.lru_cache(maxsize=256)
+def _hash_stat(filepath: str, mtime_ns: int, size: int) -> str:
+    """
+    Hash a file in a single call into OpenSSL: hashlib.file_digest on 3.11+,
+    otherwise an mmap of the file, so large exports avoid the Python read loop.
+    mtime_ns and size are only part of the cache key.
+    """
     with open(filepath, "rb") as f:
-        for chunk in iter(lambda: f.read(65536), b""):
-            h.update(chunk)
-    return h.hexdigest()
+        if hasattr(hashlib, "file_digest"):
+            return hashlib.file_digest(f, "sha256").hexdigest()
+        if os.fstat(f.fileno()).st_size == 0:
+            return hashlib.sha256(b"").hexdigest()   # mmap rejects empty files
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return hashlib.sha256(mm).hexdigest()
 
 
 def _load_processed() -> set:
@@ -139,8 +157,7 @@ def _process_apple_health(filepath: Path) -> dict:
     print(f"  📱 Detected Apple Health export: {filepath.name}")
     _notify("Leo Health", f"Parsing {filepath.name}...")
 
-    data = apple_health.parse(str(filepath))
-    counts = ingest_apple_health(data)
+    counts = ingest_apple_health_zip(str(filepath))
     total = sum(counts.values())
 
     summary = (
@@ -4,6 +4,7 @@ Run with: python3 -m pytest tests/
 """
 
 import os
+import queue
 import sqlite3
 import pytest
 from pathlib import Path
@@ -12,7 +13,7 @@ from pathlib import Path
 def make_db(tmp_path: Path) -> str:
     db_path = str(tmp_path / "test.db")
     from leo_health.db.schema import create_schema
-    create_schema(db_path)
+    create_schema(db_path).close()
     return db_path
 
 
@@ -35,6 +36,43 @@ class TestSchema:
         assert "avg_hr" in cols
         assert "max_hr" in cols
 
+    def test_time_series_indexes(self, tmp_path):
+        db_path = make_db(tmp_path)
+        from leo_health.db.schema import finalize_indexes
+        conn = sqlite3.connect(db_path)
+        finalize_indexes(conn)
+        indexes = {r[0] for r in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='index'"
+        ).fetchall()}
+        for table in ("heart_rate", "hrv", "sleep", "workouts",
+                      "whoop_recovery", "whoop_strain", "oura_readiness"):
+            assert f"idx_{table}_recorded_at" in indexes
+        assert "idx_sleep_start" in indexes
+        assert {"idx_heart_rate_metric_day_ts", "idx_hrv_day_source_ts_value",
+                "idx_sleep_source_stage_ts"} <= indexes
+
+    def test_secondary_indexes_deferred_until_first_ingest(self, tmp_path):
+        db_path = make_db(tmp_path)
+        conn = sqlite3.connect(db_path)
+        names = lambda: {r[0] for r in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='index'")}
+        assert "idx_heart_rate_recorded_at" not in names()
+        assert "idx_heart_rate_unique" in names()
+        from leo_health.db.ingest import ingest_fitbit
+        ingest_fitbit({"hrv": [{"source": "fitbit", "metric": "hrv_rmssd", "value": 40.0,
+                                "recorded_at": "2024-01-01"}]}, db_path)
+        assert "idx_heart_rate_recorded_at" in names()
+        conn.close()
+
+    def test_connection_uses_wal(self, tmp_path):
+        db_path = make_db(tmp_path)
+        from leo_health.db.schema import get_connection
+        conn = get_connection(db_path)
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA temp_store").fetchone()[0] == 2
+        assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == 5000
+        conn.close()
+
     def test_db_directory_permissions(self, tmp_path):
         db_path = str(tmp_path / "subdir" / "test.db")
         from leo_health.db.schema import create_schema
@@ -42,6 +80,34 @@ class TestSchema:
         dir_stat = oct(os.stat(os.path.dirname(db_path)).st_mode)[-3:]
         assert dir_stat == "700"
 
+    def test_sleep_duration_filled_on_insert(self, tmp_path):
+        db_path = make_db(tmp_path)
+        conn = sqlite3.connect(db_path)
+        conn.execute("INSERT INTO sleep (source, stage, start, end, recorded_at) VALUES "
+                     "('apple_health', 'in_bed', '2024-01-01T23:00:00-08:00', "
+                     "'2024-01-02T06:30:00-08:00', '2024-01-02T06:30:00-08:00')")
+        conn.execute("INSERT INTO sleep (source, stage, recorded_at) "
+                     "VALUES ('whoop', 'asleep', '2024-01-02T07:00:00')")
+        conn.commit()
+        hours = [r[0] for r in conn.execute("SELECT duration_hours FROM sleep ORDER BY id")]
+        conn.close()
+        assert round(hours[0], 4) == 7.5
+        assert hours[1] is None
+
+    def test_get_stats_counts_rows(self, tmp_path):
+        db_path = make_db(tmp_path)
+        conn = sqlite3.connect(db_path)
+        conn.execute("INSERT INTO hrv (source, metric, value, recorded_at) "
+                     "VALUES ('whoop', 'hrv_rmssd', 55.0, '2024-01-01')")
+        conn.execute("DROP TABLE oura_readiness")
+        conn.commit()
+        conn.close()
+        from leo_health.db.schema import get_stats
+        stats = get_stats(db_path)
+        assert stats["hrv"] == 1
+        assert stats["heart_rate"] == 0
+        assert stats["oura_readiness"] == 0
+
 
 class TestIngest:
     def test_ingest_heart_rate(self, tmp_path):
@@ -57,6 +123,157 @@ class TestIngest:
         result = ingest_apple_health(data, db_path)
         assert result["heart_rate"] == 1
 
+    def test_reingest_does_not_duplicate(self, tmp_path):
+        db_path = make_db(tmp_path)
+        from leo_health.db.ingest import ingest_apple_health
+        data = {
+            "heart_rate": [
+                {"source": "apple_health", "metric": "heart_rate", "value": 72.0,
+                 "recorded_at": "2024-01-01T08:00:00", "device": None},
+                {"source": "apple_health", "metric": "heart_rate", "value": 75.0,
+                 "recorded_at": "2024-01-01T08:00:00", "device": None},
+            ],
+            "hrv": [], "sleep": [],
+            "workouts": [
+                {"source": "apple_health", "activity": "running",
+                 "recorded_at": "2024-01-01T07:00:00", "end": "2024-01-01T07:30:00"}
+            ],
+        }
+        ingest_apple_health(data, db_path)
+        ingest_apple_health(data, db_path)
+        conn = sqlite3.connect(db_path)
+        assert conn.execute("SELECT COUNT(*) FROM heart_rate").fetchone()[0] == 2
+        assert conn.execute("SELECT COUNT(*) FROM workouts").fetchone()[0] == 1
+        conn.close()
+
+    def test_ingest_workout_routes(self, tmp_path):
+        db_path = make_db(tmp_path)
+        from leo_health.db.ingest import ingest_apple_health
+        data = {
+            "heart_rate": [], "hrv": [], "sleep": [], "workouts": [],
+            "routes": [
+                {"workout_start": "2024-01-01T08:00:00", "timestamp": "2024-01-01T08:00:05Z",
+                 "latitude": 37.77, "longitude": -122.41, "altitude_m": 12.0}
+            ],
+        }
+        result = ingest_apple_health(data, db_path)
+        assert result["workout_routes"] == 1
+        conn = sqlite3.connect(db_path)
+        assert conn.execute("SELECT COUNT(*) FROM workout_routes").fetchone()[0] == 1
+
+    def test_ingest_apple_health_zip_pipelines_chunks(self, tmp_path):
+        import zipfile
+        db_path = make_db(tmp_path)
+        from leo_health.db.ingest import ingest_apple_health_zip
+        records = "".join(
+            f' <Record type="HKQuantityTypeIdentifierHeartRate" sourceName="Apple Watch"'
+            f' startDate="2024-01-15 08:{i:02d}:00 -0800" value="{60 + i}"/>\n'
+            for i in range(5))
+        xml = f'<?xml version="1.0"?>\n<HealthData>\n{records}</HealthData>\n'
+        gpx = ('<gpx xmlns="http://www.topografix.com/GPX/1/1"><trk><trkseg>'
+               '<trkpt lat="37.7" lon="-122.4"><time>2024-01-15T15:00:00Z</time></trkpt>'
+               '</trkseg></trk></gpx>')
+        zip_path = tmp_path / "export.zip"
+        with zipfile.ZipFile(zip_path, "w") as zf:
+            zf.writestr("apple_health_export/export.xml", xml)
+            zf.writestr("apple_health_export/workout-routes/route_2024-01-15_07-00-00.gpx", gpx)
+        counts = ingest_apple_health_zip(str(zip_path), db_path)
+        assert counts["heart_rate"] == 5
+        assert counts["workout_routes"] == 1
+        assert counts["sleep"] == 0
+
+        bad_zip = tmp_path / "bad.zip"
+        with zipfile.ZipFile(bad_zip, "w") as zf:
+            zf.writestr("notes.txt", "")
+        with pytest.raises(FileNotFoundError):
+            ingest_apple_health_zip(str(bad_zip), db_path)
+
+    def test_bulk_ingest_rebuilds_dropped_indexes(self, tmp_path):
+        db_path = make_db(tmp_path)
+        from leo_health.db.ingest import ingest_apple_health
+        from leo_health.db.schema import REBUILDABLE_INDEXES
+        data = {"heart_rate": [
+            {"source": "apple_health", "metric": "heart_rate", "value": 60.0 + i,
+             "recorded_at": f"2024-01-01T08:00:{i:02d}"} for i in range(3)]}
+        assert ingest_apple_health(data, db_path)["heart_rate"] == 3
+        conn = sqlite3.connect(db_path)
+        names = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='index'")}
+        conn.close()
+        assert {name for _, name, _ in REBUILDABLE_INDEXES} <= names
+        assert "idx_sleep_unique" in names
+
+    def test_bulk_ingest_error_rolls_back_indexes(self, tmp_path):
+        db_path = make_db(tmp_path)
+        from leo_health.db.schema import bulk_ingest, finalize_indexes, get_connection
+        conn = get_connection(db_path)
+        finalize_indexes(conn)
+        conn.commit()
+        conn.execute("BEGIN IMMEDIATE")
+        with pytest.raises(ValueError, match="boom"):
+            with bulk_ingest(conn, {"heart_rate"}):
+                raise ValueError("boom")
+        conn.rollback()
+        names = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='index'")}
+        conn.close()
+        assert "idx_heart_rate_recorded_at" in names
+
+    def test_ingest_all_writes_through_one_transaction(self, tmp_path, monkeypatch):
+        db_path = make_db(tmp_path)
+        from leo_health.db import ingest
+        parsed = {"recovery": [{"source": "whoop", "recorded_at": "2024-01-01",
+                                "recovery_score": 80.0}],
+                  "sleep": [{"source": "whoop", "stage": "asleep", "recorded_at": None}]}
+        monkeypatch.setattr(ingest, "_parse_source", lambda module, func, path: parsed)
+        results = ingest.ingest_all(whoop_csv="whoop.csv", db_path=db_path)
+        assert results["whoop"]["whoop_recovery"] == 1
+        assert results["whoop"]["sleep"] == 0
+        conn = sqlite3.connect(db_path)
+        assert conn.execute("SELECT COUNT(*) FROM whoop_recovery").fetchone()[0] == 1
+        conn.close()
+
+    def test_ingest_all_reports_sources_in_argument_order(self, tmp_path, monkeypatch, capsys):
+        db_path = make_db(tmp_path)
+        from leo_health.db import ingest
+        parsed = {"whoop": {"recovery": [{"source": "whoop", "recorded_at": "2024-01-01",
+                                          "recovery_score": 80.0}]},
+                  "oura": {}}
+        # Oura finishes parsing first, but Whoop is still reported first
+        monkeypatch.setattr(ingest, "_parse_all",
+                            lambda jobs: iter([(job, parsed[job[0]]) for job in reversed(jobs)]))
+        ingest.ingest_all(whoop_csv="whoop.csv", oura_csv="oura.csv", db_path=db_path)
+        assert capsys.readouterr().out.splitlines() == [
+            "Parsing Whoop CSV: whoop.csv",
+            "  ✓ 1 records ingested",
+            "Parsing Oura CSV: oura.csv",
+            "  ✓ 0 records ingested",
+        ]
+
+    def test_ingest_oura_counts_only_its_own_tables(self, tmp_path):
+        db_path = make_db(tmp_path)
+        from leo_health.db.ingest import ingest_oura
+        stats = ingest_oura({"readiness": [], "sleep": [], "heart_rate": [], "hrv": [],
+                             "workouts": [{"source": "oura"}]}, db_path=db_path)
+        assert set(stats) == {"oura_readiness", "sleep", "heart_rate", "hrv"}
+        conn = sqlite3.connect(db_path)
+        assert conn.execute("SELECT COUNT(*) FROM workouts").fetchone()[0] == 0
+        conn.close()
+
+    def test_analyze_writes_planner_stats(self, tmp_path):
+        db_path = make_db(tmp_path)
+        from leo_health.db.ingest import ingest_apple_health, _analyze
+        data = {
+            "heart_rate": [
+                {"source": "apple_health", "metric": "heart_rate", "value": 60.0 + i,
+                 "unit": "count/min", "recorded_at": f"2024-01-01T08:00:{i:02d}"}
+                for i in range(10)
+            ],
+        }
+        ingest_apple_health(data, db_path)
+        _analyze(db_path)
+        conn = sqlite3.connect(db_path)
+        rows = conn.execute("SELECT tbl FROM sqlite_stat1 WHERE tbl = 'heart_rate'").fetchall()
+        assert rows
+
     def test_ingest_rejects_unknown_table(self, tmp_path):
         db_path = make_db(tmp_path)
         conn = sqlite3.connect(db_path)
@@ -74,6 +291,42 @@ class TestIngest:
         count = _insert_many(conn, "heart_rate", rows)
         assert count == 1
 
+    def test_insert_many_missing_keys_bind_null(self, tmp_path):
+        db_path = make_db(tmp_path)
+        conn = sqlite3.connect(db_path)
+        from leo_health.db.ingest import _insert_many
+        rows = [{"source": "apple_health", "metric": "heart_rate", "value": 72.0,
+                 "recorded_at": "2024-01-01T08:00:00", "device": "Apple Watch"},
+                {"source": "apple_health", "metric": "heart_rate", "value": 74.0,
+                 "recorded_at": "2024-01-01T08:01:00"}]
+        assert _insert_many(conn, "heart_rate", rows) == 2
+        devices = [r[0] for r in conn.execute("SELECT device FROM heart_rate ORDER BY value")]
+        assert devices == ["Apple Watch", None]
+
+    def test_insert_many_keeps_columns_missing_from_first_row(self, tmp_path):
+        db_path = make_db(tmp_path)
+        conn = sqlite3.connect(db_path)
+        from leo_health.db.ingest import _insert_many
+        rows = [{"source": "apple_health", "metric": "heart_rate", "value": 72.0,
+                 "recorded_at": "2024-01-01T08:00:00"},
+                {"source": "apple_health", "metric": "heart_rate", "value": 74.0,
+                 "recorded_at": "2024-01-01T08:01:00", "device": "Apple Watch"},
+                {"source": "apple_health", "metric": "heart_rate", "value": 76.0,
+                 "recorded_at": "2024-01-01T08:02:00"}]
+        assert _insert_many(conn, "heart_rate", rows) == 3
+        devices = [r[0] for r in conn.execute("SELECT device FROM heart_rate ORDER BY value")]
+        assert devices == [None, "Apple Watch", None]
+
+    def test_insert_many_batches_a_generator(self, tmp_path, monkeypatch):
+        db_path = make_db(tmp_path)
+        conn = sqlite3.connect(db_path)
+        from leo_health.db import ingest
+        monkeypatch.setattr(ingest, "_BATCH_ROWS", 2)
+        rows = ({"source": "apple_health", "metric": "heart_rate", "value": 60.0 + i,
+                 "recorded_at": f"2024-01-01T08:0{i}:00"} for i in range(5))
+        assert ingest._insert_many(conn, "heart_rate", rows) == 5
+        assert conn.execute("SELECT COUNT(*) FROM heart_rate").fetchone()[0] == 5
+
     def test_insert_many_empty_rows(self, tmp_path):
         db_path = make_db(tmp_path)
         conn = sqlite3.connect(db_path)
@@ -81,25 +334,388 @@ class TestIngest:
         result = _insert_many(conn, "heart_rate", [])
         assert result == 0
 
+    def test_insert_many_tuples(self, tmp_path):
+        db_path = make_db(tmp_path)
+        conn = sqlite3.connect(db_path)
+        from leo_health.db.ingest import _insert_many_tuples
+        cols = ("source", "metric", "value", "recorded_at")
+        rows = (("apple_health", "heart_rate", 60.0 + i, f"2024-01-01T08:0{i}:00")
+                for i in range(3))
+        assert _insert_many_tuples(conn, "heart_rate", cols, rows) == 3
+        assert conn.execute("SELECT COUNT(*) FROM heart_rate").fetchone()[0] == 3
+        with pytest.raises(ValueError, match="Unknown columns"):
+            _insert_many_tuples(conn, "heart_rate", ("value", "id; DROP TABLE x"), [])
+
+
+class TestAppleHealthParser:
+    def test_iso_fast_path_matches_strptime(self):
+        from datetime import datetime
+        from leo_health.parsers.apple_health import _iso
+        for raw in ("2024-01-15 08:30:00 -0800", "2024-06-01 23:59:59 +0000",
+                    "2024-03-10 01:02:03 +0530"):
+            expected = datetime.strptime(raw, "%Y-%m-%d %H:%M:%S %z").isoformat()
+            assert _iso(raw) == expected
+
+    def test_iso_fallback_formats(self):
+        from leo_health.parsers.apple_health import _iso
+        assert _iso("2024-01-15") == "2024-01-15T00:00:00"
+        assert _iso("2024-01-15 08:30:00") == "2024-01-15T08:30:00"
+        assert _iso("") == ""
+        # Shapes the strptime formats reject stay as-is on every Python
+        assert _iso("20240115") == "20240115"
+        assert _iso("2024-01-15 08:30") == "2024-01-15 08:30"
+
+    def test_fitbit_iso_matches_strptime(self):
+        from datetime import datetime
+        from leo_health.parsers.fitbit import _iso, _memo_iso
+        iso = _memo_iso()
+        for raw, fmt in (("2024-01-15T07:11:00.000", "%Y-%m-%dT%H:%M:%S.%f"),
+                         ("2024-01-15T23:30:30.250", "%Y-%m-%dT%H:%M:%S.%f"),
+                         ("2024-01-15T23:30:30", "%Y-%m-%dT%H:%M:%S"),
+                         ("2024-01-15", "%Y-%m-%d")):
+            assert _iso(raw) == datetime.strptime(raw, fmt).isoformat()
+            assert iso(raw) == iso(raw) == _iso(raw)
+        assert _iso("20240115T071100") == "20240115T071100"
+        assert _iso("2024-01-15T07:11") == "2024-01-15T07:11"
+
+    def test_parse_export_zip(self, tmp_path):
+        import zipfile
+        from leo_health.parsers.apple_health import parse
+        xml = (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<HealthData locale="en_US">\n'
+            ' <Record type="HKQuantityTypeIdentifierHeartRate" sourceName="Apple Watch"'
+            ' unit="count/min" startDate="2024-01-15 08:30:00 -0800" value="62">\n'
+            '  <MetadataEntry key="HKMetadataKeyHeartRateMotionContext" value="0"/>\n'
+            ' </Record>\n'
+            ' <Correlation type="HKCorrelationTypeIdentifierBloodPressure">\n'
+            '  <Record type="HKQuantityTypeIdentifierHeartRate" sourceName="Cuff"'
+            ' startDate="2024-01-15 09:00:00 -0800" value="70"/>\n'
+            ' </Correlation>\n'
+            ' <Workout workoutActivityType="HKWorkoutActivityTypeRunning" duration="30"'
+            ' sourceName="Apple Watch" startDate="2024-01-15 07:00:00 -0800"'
+            ' endDate="2024-01-15 07:30:00 -0800"/>\n'
+            '</HealthData>\n'
+        )
+        zip_path = tmp_path / "export.zip"
+        with zipfile.ZipFile(zip_path, "w") as zf:
+            zf.writestr("apple_health_export/export.xml", xml)
+        data = parse(str(zip_path))
+        assert [r["value"] for r in data["heart_rate"]] == [62.0, 70.0]
+        assert data["heart_rate"][0]["recorded_at"] == "2024-01-15T08:30:00-08:00"
+        assert len(data["workouts"]) == 1
+
+    def test_gpx_empty_and_malformed_return_empty(self):
+        from leo_health.parsers.apple_health import _parse_gpx
+        assert _parse_gpx(b"", "2024-01-01T08:00:00") == []
+        assert _parse_gpx(b"not valid xml", "2024-01-01T08:00:00") == []
+        assert _parse_gpx(b"<gpx><trk>", "2024-01-01T08:00:00") == []
+
+    def test_gpx_track_points(self):
+        from leo_health.parsers.apple_health import _parse_gpx
+        gpx = (
+            b'<?xml version="1.0" encoding="UTF-8"?>\n'
+            b'<gpx version="1.1" xmlns="http://www.topografix.com/GPX/1/1"><trk><trkseg>'
+            b'<trkpt lat="37.77" lon="-122.41"><ele>12.5</ele>'
+            b'<time>2024-01-01T16:00:05Z</time></trkpt>'
+            b'<trkpt lat="37.78" lon="-122.42"></trkpt>'
+            b'</trkseg></trk></gpx>'
+        )
+        points = _parse_gpx(gpx, "2024-01-01T08:00:00")
+        assert [(p["latitude"], p["longitude"]) for p in points] == [(37.77, -122.41), (37.78, -122.42)]
+        assert points[0]["altitude_m"] == 12.5
+        assert points[0]["timestamp"] == "2024-01-01T16:00:05Z"
+        assert points[1]["timestamp"] == "2024-01-01T08:00:00"
+        assert points[1]["altitude_m"] is None
+
+    def test_gpx_fast_scan_matches_tree(self):
+        from leo_health.parsers.apple_health import _parse_gpx, _parse_gpx_fast, _parse_gpx_tree
+        gpx = (
+            b'<gpx xmlns="http://www.topografix.com/GPX/1/1"><trk><trkseg>'
+            b'<trkpt lon="-122.41" lat="37.77"><ele>12.5</ele><time>2024-01-01T16:00:05Z</time>'
+            b'<extensions><speed>2.1</speed></extensions></trkpt>'
+            b'</trkseg></trk></gpx>'
+        )
+        assert _parse_gpx_fast(gpx, "") == _parse_gpx_tree(gpx, "")
+        assert _parse_gpx_fast(gpx, "")[0]["longitude"] == -122.41
+        self_closing = (b'<gpx xmlns="http://www.topografix.com/GPX/1/1"><trk><trkseg>'
+                        b'<trkpt lat="37.77" lon="-122.41"/></trkseg></trk></gpx>')
+        assert _parse_gpx_fast(self_closing, "") == _parse_gpx_tree(self_closing, "")
+        assert len(_parse_gpx(self_closing, "")) == 1
+
+    def test_gpx_fast_scan_self_closing_comments_and_truncation(self):
+        from leo_health.parsers.apple_health import _parse_gpx, _parse_gpx_fast, _parse_gpx_tree
+        head = b'<gpx xmlns="http://www.topografix.com/GPX/1/1"><trk><trkseg>'
+        tail = b'</trkseg></trk></gpx>'
+        mixed = (head + b'<trkpt lat="1.0" lon="2.0"/>'
+                 b'<trkpt lat="3.0" lon="4.0"><time>2024-01-01T16:00:05Z</time></trkpt>' + tail)
+        assert _parse_gpx_fast(mixed, "") == _parse_gpx_tree(mixed, "")
+        assert [p["latitude"] for p in _parse_gpx(mixed, "")] == [1.0, 3.0]
+
+        commented = (head + b'<!-- <trkpt lat="9.0" lon="9.0"></trkpt> -->'
+                     b'<trkpt lat="1.0" lon="2.0"></trkpt>' + tail)
+        assert _parse_gpx_fast(commented, "") is None
+        assert [p["latitude"] for p in _parse_gpx(commented, "")] == [1.0]
+
+        truncated = head + b'<trkpt lat="1.0" lon="2.0"></trkpt><trkpt lat="3.0" lon='
+        assert _parse_gpx_fast(truncated, "") is None
+        assert _parse_gpx(truncated, "") == []
+        unbalanced = head + b'<trkpt lat="1.0" lon="2.0"></trkpt><trkpt lat="3.0">' + tail
+        assert _parse_gpx_fast(unbalanced, "") is None
+        assert _parse_gpx(unbalanced, "") == []
+
+
+    def test_gpx_fast_scan_agrees_with_tree_on_odd_files(self):
+        from leo_health.parsers.apple_health import _parse_gpx, _parse_gpx_fast, _parse_gpx_tree
+        pt = b'<trkpt lat="1.0" lon="2.0"><ele>3</ele><time>2024-01-01T16:00:05Z</time></trkpt>'
+
+        def gpx(root=b'<gpx xmlns="http://www.topografix.com/GPX/1/1">', body=pt):
+            return root + b"<trk><trkseg>" + body + b"</trkseg></trk></gpx>"
+
+        cases = [
+            gpx(),
+            gpx(root=b"<gpx>"),
+            gpx(root=b'<gpx xmlns="http://www.topografix.com/GPX/1/0">'),
+            gpx(body=pt.replace(b"</time>", b"</ele>")),
+            gpx(body=pt.replace(b"Z</time>", b"Z&amp;</time>")),
+            gpx(body=pt.replace(b"<ele>3</ele>", b"<ele></ele>")),
+            gpx(body=pt.replace(b"<ele>3</ele>", b"<ele>high</ele>")),
+            gpx(body=pt.replace(b"2024-01-01T16:00:05Z", b"")),
+            gpx(body=pt.replace(b"<trkpt", b'<trkpt xmlns="urn:other"')),
+            gpx(body=pt.replace(b'lon="2.0"', b"lon=2.0")),
+            gpx(body=pt + b"</trkseg><trkseg>"),
+        ]
+        for content in cases:
+            fast = _parse_gpx_fast(content, "")
+            tree = _parse_gpx_tree(content, "")
+            assert fast is None or fast == tree, content
+            assert _parse_gpx(content, "") == tree, content
+        assert _parse_gpx_fast(cases[0], "") is not None
+        assert _parse_gpx(cases[1], "") == _parse_gpx(cases[2], "") == []
+        assert _parse_gpx(cases[5], "")[0]["altitude_m"] is None
+        assert _parse_gpx(cases[6], "")[0]["altitude_m"] is None
+        assert _parse_gpx(cases[7], "")[0]["timestamp"] == ""
 
 class TestSecurity:
     def test_days_param_defaults_on_invalid(self):
-        def parse_days(raw):
-            try:
-                d = int(raw)
-                if d < 1 or d > 3650:
-                    return 30
-                return d
-            except (ValueError, TypeError):
-                return 30
+        from leo_health.dashboard import _parse_days as parse_days
 
         assert parse_days("abc") == 30
         assert parse_days("0") == 30
         assert parse_days("9999") == 30
         assert parse_days("7") == 7
         assert parse_days("30") == 30
+        assert parse_days("3650") == 3650
+        assert parse_days(" 7") == 30
+        assert parse_days(None) == 30
 
 
+class TestDashboard:
+    def test_api_cache_reuses_body_until_db_changes(self, tmp_path, monkeypatch):
+        import leo_health.dashboard as dash
+        db_path = make_db(tmp_path)
+        monkeypatch.setattr(dash, "DB_PATH", db_path)
+        monkeypatch.setattr(dash, "_api_cache", {})
+        calls = []
+
+        def fn():
+            calls.append(1)
+            return {"n": len(calls)}
+
+        assert dash._cached_json(("/api/test", 7), 300, fn) == b'{"n":1}'
+        assert dash._cached_json(("/api/test", 7), 300, fn) == b'{"n":1}'
+        assert len(calls) == 1
+
+        conn = sqlite3.connect(db_path)
+        conn.execute("INSERT INTO hrv (source, metric, value, recorded_at) "
+                     "VALUES ('apple_health', 'hrv_sdnn', 50, '2024-01-01T08:00:00')")
+        conn.commit()
+        conn.close()
+        assert dash._cached_json(("/api/test", 7), 300, fn) == b'{"n":2}'
+
+    def test_api_sleep_apple_merges_overlaps_and_prefers_watch(self, tmp_path, monkeypatch):
+        import leo_health.dashboard as dash
+        db_path = make_db(tmp_path)
+        monkeypatch.setattr(dash, "DB_PATH", db_path)
+        monkeypatch.setattr(dash, "_pool", queue.LifoQueue())
+        monkeypatch.setattr(dash, "_since", lambda days: "2000-01-01")
+        conn = sqlite3.connect(db_path)
+        conn.executemany(
+            "INSERT INTO sleep (source, device, stage, start, end, recorded_at) "
+            "VALUES ('apple_health', ?, ?, ?, ?, '2024-01-02T07:00:00')",
+            [("Apple Watch", "asleepdeep", "2024-01-02 01:00:00", "2024-01-02 02:00:00"),
+             ("Apple Watch", "asleepdeep", "2024-01-02 01:30:00", "2024-01-02 02:30:00"),
+             ("Apple Watch", "asleepcore", "2024-01-02 03:00:00", "2024-01-02 04:00:00"),
+             ("Apple Watch", "asleepunspecified", "2024-01-02 00:00:00", "2024-01-02 07:00:00"),
+             ("AutoSleep", "asleepdeep", "2024-01-02 01:00:00", "2024-01-02 05:00:00")])
+        conn.commit()
+        conn.close()
+        rows = dash.api_sleep(30)
+        assert len(rows) == 1
+        assert rows[0]["device"] == "Apple Watch"
+        assert rows[0]["deep"] == 1.5
+        assert rows[0]["light"] == 1.0
+
+    def test_chart_window_cuts_off_on_local_timestamp(self, tmp_path, monkeypatch):
+        import leo_health.dashboard as dash
+        from leo_health.db.schema import finalize_indexes
+        db_path = make_db(tmp_path)
+        monkeypatch.setattr(dash, "DB_PATH", db_path)
+        monkeypatch.setattr(dash, "_pool", queue.LifoQueue())
+        monkeypatch.setattr(dash, "_since", lambda days: "2024-01-05")
+        conn = sqlite3.connect(db_path)
+        finalize_indexes(conn)
+        conn.executemany(
+            "INSERT INTO heart_rate (source, metric, value, recorded_at) "
+            "VALUES ('apple_health', 'resting_heart_rate', ?, ?)",
+            [(50, "2024-01-04T22:00:00-05:00"),    # UTC 01-05, local day before the window
+             (60, "2024-01-05T01:00:00+09:00"),    # UTC 01-04, local day inside the window
+             (70, "2024-01-05T12:00:00-05:00")])
+        conn.commit()
+        conn.close()
+        assert dash.api_resting_hr(1) == [{"date": "2024-01-04", "value": 60.0},
+                                          {"date": "2024-01-05", "value": 70.0}]
+
+    def test_startup_migrate_creates_schema_indexes(self, tmp_path, monkeypatch):
+        import leo_health.dashboard as dash
+        from leo_health.db.schema import REBUILDABLE_INDEXES
+        db_path = make_db(tmp_path)
+        monkeypatch.setattr(dash, "DB_PATH", db_path)
+        monkeypatch.setattr(dash, "_pool", queue.LifoQueue())
+        dash._startup_migrate()
+        conn = sqlite3.connect(db_path)
+        names = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='index'")}
+        conn.close()
+        assert {name for _, name, _ in REBUILDABLE_INDEXES} <= names
+
+    def test_summary_rollup_picks_up_new_rows(self, tmp_path, monkeypatch):
+        import leo_health.dashboard as dash
+        db_path = make_db(tmp_path)
+        monkeypatch.setattr(dash, "DB_PATH", db_path)
+        monkeypatch.setattr(dash, "_pool", queue.LifoQueue())
+        monkeypatch.setattr(dash, "_since", lambda days: "2024-01-01")
+        conn = sqlite3.connect(db_path)
+        conn.execute("INSERT INTO hrv (source, metric, value, recorded_at) "
+                     "VALUES ('apple_health', 'hrv_sdnn', 40, '2024-01-05T08:00:00')")
+        conn.commit()
+        assert dash.api_summary()["hrv"] == 40.0
+        conn.execute("INSERT INTO hrv (source, metric, value, recorded_at) "
+                     "VALUES ('apple_health', 'hrv_sdnn', 60, '2024-01-05T09:00:00')")
+        conn.commit()
+        assert dash.api_summary()["hrv"] == 50.0
+        days = conn.execute("SELECT day, hrv_n FROM daily_summary").fetchall()
+        conn.close()
+        assert days == [("2024-01-05", 2)]
+
+    def test_incremental_summary_matches_full_rebuild(self, tmp_path, monkeypatch):
+        import leo_health.dashboard as dash
+        db_path = make_db(tmp_path)
+        monkeypatch.setattr(dash, "DB_PATH", db_path)
+        monkeypatch.setattr(dash, "_pool", queue.LifoQueue())
+        conn = sqlite3.connect(db_path)
+        insert = ("INSERT INTO hrv (source, metric, value, recorded_at) "
+                  "VALUES ('whoop', 'hrv_rmssd', ?, ?)")
+        conn.execute(insert, (50, "2024-01-04T22:00:00-05:00"))
+        conn.commit()
+        dash._refresh_summary()
+        conn.executemany(insert, [(70, "2024-01-05T08:00:00"), (30, "2024-01-04T23:00:00-05:00")])
+        conn.commit()
+        dash._refresh_summary()
+        query = "SELECT day, hrv_n, hrv_sum FROM daily_summary ORDER BY day"
+        incremental = conn.execute(query).fetchall()
+        dash.rebuild_summary()
+        assert conn.execute(query).fetchall() == incremental == [
+            ("2024-01-04", 2, 80.0), ("2024-01-05", 1, 70.0)]
+        conn.close()
+
+    def test_summary_window_matches_recorded_at_cutoff(self, tmp_path, monkeypatch):
+        import leo_health.dashboard as dash
+        db_path = make_db(tmp_path)
+        monkeypatch.setattr(dash, "DB_PATH", db_path)
+        monkeypatch.setattr(dash, "_pool", queue.LifoQueue())
+        monkeypatch.setattr(dash, "_since", {7: "2024-01-05", 15: "2024-01-01"}.get)
+        conn = sqlite3.connect(db_path)
+        conn.executemany(
+            "INSERT INTO hrv (source, metric, value, recorded_at) "
+            "VALUES ('apple_health', 'hrv_sdnn', ?, ?)",
+            [(10, "2024-01-04T22:00:00-05:00"),    # UTC 01-05, local day before the week
+             (30, "2024-01-05T01:00:00+09:00"),    # UTC 01-04, local day inside the week
+             (50, "2024-01-06T08:00:00")])
+        conn.commit()
+        expected = [conn.execute("SELECT ROUND(AVG(value),1) FROM hrv WHERE recorded_at>=?",
+                                 (since,)).fetchone()[0] for since in ("2024-01-05", "2024-01-01")]
+        conn.close()
+        summary = dash.api_summary()
+        assert expected == [40.0, 30.0]
+        assert summary["hrv"] == 40.0
+        assert summary["hrv_trend"] == dash._trend_pct(40.0, 30.0)
+
+    def test_q_json_matches_q(self, tmp_path, monkeypatch):
+        import json
+        import leo_health.dashboard as dash
+        db_path = make_db(tmp_path)
+        monkeypatch.setattr(dash, "DB_PATH", db_path)
+        monkeypatch.setattr(dash, "_pool", queue.LifoQueue())
+        conn = sqlite3.connect(db_path)
+        conn.executemany("INSERT INTO heart_rate (source, metric, value, recorded_at) "
+                         "VALUES ('apple_health', 'heart_rate', ?, ?)",
+                         [(60, "2024-01-01T08:00:00"), (80, "2024-01-01T09:00:00"),
+                          (70, "2024-01-02T08:00:00")])
+        conn.commit()
+        conn.close()
+        sql = ("SELECT date(recorded_at) AS date, AVG(value) AS avg, NULL AS \"end\" "
+               "FROM heart_rate WHERE date(recorded_at)>=? GROUP BY 1 ORDER BY 1 DESC")
+        body = dash._q_json(sql, ("2024-01-01",))
+        assert isinstance(body, bytes)
+        assert json.loads(body) == dash._q(sql, ("2024-01-01",))
+        assert dash._q_json(sql, ("2030-01-01",)) == b"[]"
+
+    def test_lttb_keeps_endpoints_and_spikes(self):
+        from leo_health.dashboard import _lttb
+        xs = list(range(1000))
+        ys = [100.0] * 1000
+        ys[437] = 190.0
+        keep = _lttb(xs, ys, 50)
+        assert len(keep) == 50
+        assert keep[0] == 0 and keep[-1] == 999
+        assert 437 in keep
+        assert keep == sorted(set(keep))
+        assert _lttb(xs[:10], ys[:10], 50) == list(range(10))
+
+    def test_read_txn_shares_one_connection(self, tmp_path, monkeypatch):
+        import leo_health.dashboard as dash
+        db_path = make_db(tmp_path)
+        monkeypatch.setattr(dash, "DB_PATH", db_path)
+        monkeypatch.setattr(dash, "_pool", queue.LifoQueue())
+        with dash.read_txn():
+            c = dash._conn()
+            assert c.in_transaction
+            assert dash._q("SELECT 1 AS one") == [{"one": 1}]
+            with dash.read_txn():
+                assert dash._conn() is c
+        assert not c.in_transaction
+        assert dash._pool.get_nowait() is c
+
+    def test_workout_detail_combines_hr_and_route(self, tmp_path, monkeypatch):
+        import leo_health.dashboard as dash
+        db_path = make_db(tmp_path)
+        monkeypatch.setattr(dash, "DB_PATH", db_path)
+        monkeypatch.setattr(dash, "_pool", queue.LifoQueue())
+        conn = sqlite3.connect(db_path)
+        conn.execute("INSERT INTO heart_rate (source, metric, value, recorded_at) "
+                     "VALUES ('apple_health', 'heart_rate', 140, '2024-03-01T07:10:00')")
+        conn.executemany("INSERT INTO workout_routes (workout_start, timestamp, latitude, longitude) "
+                         "VALUES ('2024-03-01T07:00:00', ?, ?, -122.0)",
+                         [("2024-03-01T07:00:00", 37.0), ("2024-03-01T07:10:00", 37.02)])
+        conn.commit()
+        conn.close()
+        detail = dash.api_workout_detail("2024-03-01T07:00:00", "2024-03-01T08:00:00")
+        assert [r["value"] for r in detail["hr"]] == [140.0]
+        assert len(detail["route"]) == 2
+        assert detail["splits"] == dash._route_splits(detail["route"])
+        assert dash.api_workout_detail("2024-03-01T07:00:00", "2024-03-01T08:00:00",
+                                       route=False)["route"] == []
+
 class TestWatcher:
     def test_file_hash_returns_sha256(self, tmp_path):
         from leo_health.watcher import _file_hash
@@ -124,3 +740,12 @@ class TestWatcher:
         f1.write_bytes(b"same content")
         f2.write_bytes(b"same content")
         assert _file_hash(str(f1)) == _file_hash(str(f2))
+
+    def test_file_hash_changes_when_file_modified(self, tmp_path):
+        from leo_health.watcher import _file_hash
+        f = tmp_path / "export.zip"
+        f.write_bytes(b"first")
+        before = _file_hash(str(f))
+        f.write_bytes(b"second export")
+        os.utime(f, ns=(1_700_000_000_000_000_000, 1_700_000_000_000_000_000))
+        assert _file_hash(str(f)) != before